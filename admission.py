@@ -0,0 +1,188 @@
+import math
+import time
+import asyncio
+import threading
+from collections import Counter, deque
+from typing import Callable, Dict, Optional
+
+
+class Waiter:
+    """A queued request: called back with on_admit once it holds a slot, or on_drop if it never will."""
+    __slots__ = ("session_id", "deadline", "on_admit", "on_drop", "state")
+
+    def __init__(self, session_id: str, deadline: float, on_admit: Callable, on_drop: Callable):
+        self.session_id = session_id
+        self.deadline = deadline
+        self.on_admit = on_admit
+        self.on_drop = on_drop
+        self.state = "queued"  # -> admitted | dropped | cancelled
+
+
+class AdmissionController:
+    """
+    Caps concurrent chat replies globally and per session.
+    Requests that cannot start immediately wait in a bounded FIFO queue with
+    a deadline. A waiter is dropped instead of admitted when its deadline
+    can no longer be met given the recent average service time, and new
+    requests are rejected up front when the estimated wait already exceeds
+    their deadline, so overload turns into fast rejections rather than
+    everyone timing out.
+    """
+    def __init__(self, max_concurrent: int = 8, max_per_session: int = 1, max_queue: int = 50,
+                 initial_service_seconds: float = 3.0):
+        self.max_concurrent = max_concurrent
+        self.max_per_session = max_per_session
+        self.max_queue = max_queue
+        self.active = 0
+        self.sessions = Counter()
+        self._queue = deque()
+        self._lock = threading.Lock()
+        # Exponentially weighted average of how long an admitted request holds its slot
+        self.service_seconds = initial_service_seconds
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "dropped": 0}
+
+    def _can_start(self, session_id: str) -> bool:
+        return self.active < self.max_concurrent and self.sessions[session_id] < self.max_per_session
+
+    def _start(self, session_id: str):
+        self.active += 1
+        self.sessions[session_id] += 1
+        self.stats["admitted"] += 1
+
+    def saturated(self) -> bool:
+        """True when every slot is taken."""
+        return self.active >= self.max_concurrent
+
+    def estimated_wait(self) -> float:
+        """Seconds until a request queued now would start."""
+        return (len(self._queue) // self.max_concurrent + 1) * self.service_seconds if self.active >= self.max_concurrent else 0.0
+
+    def retry_after(self) -> int:
+        """Retry-After seconds to hand to rejected clients."""
+        return max(1, math.ceil(self.estimated_wait()))
+
+    def _has_startable_waiter(self) -> bool:
+        # Waiters held back only by their own session's limit don't queue ahead of other sessions
+        return any(self.sessions[w.session_id] < self.max_per_session for w in self._queue)
+
+    def try_acquire(self, session_id: str) -> bool:
+        """Take a slot now if one is free and no waiter that could use it is queued ahead."""
+        with self._lock:
+            if not self._has_startable_waiter() and self._can_start(session_id):
+                self._start(session_id)
+                return True
+            return False
+
+    def enqueue(self, session_id: str, timeout: float, on_admit: Callable, on_drop: Callable) -> Optional[Waiter]:
+        """
+        Queue a request for up to `timeout` seconds. Returns None (rejected)
+        when the queue is full or the estimated wait is already too long;
+        otherwise on_admit / on_drop is called exactly once later, from the
+        thread that frees the slot. If a slot is free right away, on_admit
+        runs before this returns.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = self._expire(now)
+            if len(self._queue) >= self.max_queue or self.estimated_wait() + self.service_seconds > timeout:
+                self.stats["rejected"] += 1
+                waiter = None
+            else:
+                waiter = Waiter(session_id, now + timeout, on_admit, on_drop)
+                self._queue.append(waiter)
+            ready = self._dispatch(now)
+            if waiter is not None and waiter.state == "queued":
+                self.stats["queued"] += 1
+        self._notify(expired, ready)
+        return waiter
+
+    def cancel(self, waiter: Waiter) -> bool:
+        """Withdraw a queued waiter. False if it was already admitted (the caller then owns a slot)."""
+        with self._lock:
+            if waiter.state != "queued":
+                return False
+            waiter.state = "cancelled"
+            self._queue.remove(waiter)
+            return True
+
+    def _abandon(self, waiter: Waiter) -> bool:
+        """Stop waiting; True if the waiter was admitted meanwhile (so it holds a slot)."""
+        if self.cancel(waiter):
+            with self._lock:
+                self.stats["dropped"] += 1
+            return False
+        return waiter.state == "admitted"
+
+    def release(self, session_id: str, started: Optional[float] = None):
+        """Free a slot (and feed its duration into the service-time average), then admit waiters."""
+        now = time.monotonic()
+        with self._lock:
+            self.active -= 1
+            self.sessions[session_id] -= 1
+            if self.sessions[session_id] <= 0:
+                del self.sessions[session_id]
+            if started is not None:
+                self.service_seconds = 0.8 * self.service_seconds + 0.2 * (now - started)
+            expired = self._expire(now)
+            ready = self._dispatch(now)
+        self._notify(expired, ready)
+
+    def _expire(self, now: float):
+        """Remove waiters that would miss their deadline even if started now."""
+        expired = [w for w in self._queue if w.deadline < now + self.service_seconds]
+        for waiter in expired:
+            waiter.state = "dropped"
+            self._queue.remove(waiter)
+            self.stats["dropped"] += 1
+        return expired
+
+    def _dispatch(self, now: float):
+        """Admit queued waiters, oldest first, skipping sessions that are at their limit."""
+        ready = []
+        for waiter in list(self._queue):
+            if self.active >= self.max_concurrent:
+                break
+            if self.sessions[waiter.session_id] >= self.max_per_session:
+                continue
+            self._queue.remove(waiter)
+            waiter.state = "admitted"
+            self._start(waiter.session_id)
+            ready.append(waiter)
+        return ready
+
+    @staticmethod
+    def _notify(expired, ready):
+        # Callbacks run outside the lock; they may send messages or start work
+        for waiter in expired:
+            waiter.on_drop()
+        for waiter in ready:
+            waiter.on_admit()
+
+    async def acquire(self, session_id: str, timeout: float) -> bool:
+        """Async admission for request handlers: True once a slot is held, False if rejected or dropped."""
+        if self.try_acquire(session_id):
+            return True
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(admitted):
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(admitted))
+
+        waiter = self.enqueue(session_id, timeout, lambda: resolve(True), lambda: resolve(False))
+        if waiter is None:
+            return False
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return self._abandon(waiter)
+        except asyncio.CancelledError:
+            # Client went away; a slot granted in the meantime goes back
+            if self._abandon(waiter):
+                self.release(session_id)
+            raise
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "active": self.active, "queue_depth": len(self._queue),
+                    "service_seconds": round(self.service_seconds, 3),
+                    "estimated_wait_seconds": round(self.estimated_wait(), 2)}
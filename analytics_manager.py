@@ -1,19 +1,150 @@
+import os
+import re
 import sqlite3
+import time
+import queue
+import logging
+import threading
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Callable
+
+from latency import bucket_for, percentiles
+
+logger = logging.getLogger(__name__)
+
+QUESTION_NORMALIZE_RE = re.compile(r"\s+")
+
+# Token prices (USD per million) for cost estimates; defaults are Groq's llama-3.1-8b-instant list prices
+PROMPT_PRICE_PER_MTOK = float(os.getenv("LLM_PROMPT_PRICE_PER_MTOK", "0.05"))
+COMPLETION_PRICE_PER_MTOK = float(os.getenv("LLM_COMPLETION_PRICE_PER_MTOK", "0.08"))
+
+
+class AnalyticsWriter:
+    """
+    Background SQLite writer.
+    Events are queued by the request path (never blocking) and written by one
+    thread on a single long-lived WAL-mode connection, in batches via
+    `executemany`, whenever `batch_size` events are waiting or
+    `flush_interval` seconds have passed. When the queue is full, events are
+    dropped and counted instead of stalling requests.
+    """
+    def __init__(self, db_path: str, handlers: Dict[str, Callable], max_queue: int = 10000,
+                 batch_size: int = 200, flush_interval: float = 1.0):
+        self.db_path = db_path
+        self.handlers = handlers  # kind -> fn(cursor, rows)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._flush_requests = []
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "batches": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind: str, row: tuple) -> bool:
+        """Queue an event. Returns False (and counts a drop) if the queue is full."""
+        try:
+            self._queue.put_nowait((kind, row))
+            self.stats["enqueued"] += 1
+            return True
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+
+    def _drain(self, first=None):
+        batch = [first] if first is not None else []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch):
+        by_kind = {}
+        for kind, row in batch:
+            by_kind.setdefault(kind, []).append(row)
+        try:
+            cursor = conn.cursor()
+            for kind, rows in by_kind.items():
+                self.handlers[kind](cursor, rows)
+            conn.commit()
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            conn.rollback()
+            self.stats["errors"] += 1
+            logger.error(f"Analytics batch write failed ({len(batch)} events): {e}")
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        deadline = time.monotonic() + self.flush_interval
+        pending = []
+        while True:
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=min(timeout, 0.1))
+                pending.extend(self._drain(item))
+            except queue.Empty:
+                pass
+
+            flush_now = bool(self._flush_requests) or self._stop.is_set()
+            if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline or flush_now):
+                while pending:
+                    self._write(conn, pending[:self.batch_size])
+                    pending = pending[self.batch_size:]
+                    if flush_now:
+                        pending.extend(self._drain())
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+            if flush_now and self._queue.empty() and not pending:
+                with self._flush_lock:
+                    events, self._flush_requests = self._flush_requests, []
+                for event in events:
+                    event.set()
+                if self._stop.is_set():
+                    break
+        conn.close()
+
+    def flush(self, timeout: float = 5.0):
+        """Block until everything queued so far has been written."""
+        if not self._thread.is_alive():
+            return
+        event = threading.Event()
+        with self._flush_lock:
+            self._flush_requests.append(event)
+        event.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Write out remaining events and stop the writer thread."""
+        self._stop.set()
+        self._thread.join(timeout)
+
 
 class AnalyticsManager:
     """
     Track and analyze chat conversations and performance metrics.
+    Writes go through a background AnalyticsWriter; reads query SQLite directly.
     """
     def __init__(self, db_path="analytics.db"):
         self.db_path = db_path
         self._initialize_db()
+        self.writer = AnalyticsWriter(db_path, {
+            "conversation": self._write_conversations,
+            "latency": self._write_latencies,
+            "tokens": self._write_token_usage,
+        })
     
     def _initialize_db(self):
-        """Create analytics tables."""
+        """Create analytics tables, rollups and indexes."""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        # Must precede table creation to take effect; lets retention give pruned space back
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
         
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS conversations (
@@ -34,99 +165,384 @@ class AnalyticsManager:
                 satisfaction_score REAL DEFAULT 0
             )
         """)
+        # Latency sums so avg_response_time can be maintained incrementally
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(daily_stats)")}
+        for column in ("response_time_sum", "response_time_count"):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE daily_stats ADD COLUMN {column} INTEGER DEFAULT 0")
+
+        # Rollups below are updated by the writer in the same transaction as the raw rows
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS hourly_stats (
+                hour TEXT PRIMARY KEY,
+                total_conversations INTEGER DEFAULT 0,
+                response_time_sum INTEGER DEFAULT 0,
+                response_time_count INTEGER DEFAULT 0
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS question_stats (
+                date DATE NOT NULL,
+                question_key TEXT NOT NULL,
+                question TEXT NOT NULL,
+                count INTEGER DEFAULT 0,
+                PRIMARY KEY (date, question_key)
+            )
+        """)
+
+        # Per-stage latency histograms: one counter per (hour, stage, platform, bucket)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS latency_stats (
+                hour TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER DEFAULT 0,
+                PRIMARY KEY (hour, stage, platform, bucket)
+            )
+        """)
+
+        # One row per LLM call, plus a daily rollup by stage / model / platform / tool path
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TIMESTAMP NOT NULL,
+                session_id TEXT,
+                platform TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                model TEXT NOT NULL,
+                tool_path TEXT NOT NULL,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS token_stats (
+                date DATE NOT NULL,
+                stage TEXT NOT NULL,
+                model TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                tool_path TEXT NOT NULL,
+                calls INTEGER DEFAULT 0,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                PRIMARY KEY (date, stage, model, platform, tool_path)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_usage_session ON llm_usage(session_id)")
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations(timestamp)")
         
         conn.commit()
+
+        # One-off backfill for databases created before the rollups existed
+        has_rows = cursor.execute("SELECT 1 FROM conversations LIMIT 1").fetchone()
+        has_rollups = cursor.execute("SELECT 1 FROM hourly_stats LIMIT 1").fetchone()
         conn.close()
+        if has_rows and not has_rollups:
+            self.rebuild_rollups()
+
+    @staticmethod
+    def normalize_question(message: str) -> str:
+        """Grouping key for "most asked": case, spacing and trailing punctuation ignored."""
+        return QUESTION_NORMALIZE_RE.sub(" ", (message or "").lower()).strip(" ?!.")[:200]
     
     def track_conversation(self, user_message: str, bot_response: str, response_time_ms: int = 0):
-        """Log a conversation."""
+        """Log a conversation (queued; written in the background)."""
+        # Stamp at enqueue time (UTC, same format as CURRENT_TIMESTAMP) so batching doesn't skew it
+        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        self.writer.submit("conversation", (user_message, bot_response, timestamp, response_time_ms))
+
+    @classmethod
+    def _write_conversations(cls, cursor, rows):
+        cursor.executemany("""
+            INSERT INTO conversations (user_message, bot_response, timestamp, response_time_ms)
+            VALUES (?, ?, ?, ?)
+        """, rows)
+        cls._update_rollups(cursor, rows)
+
+    @classmethod
+    def _update_rollups(cls, cursor, rows):
+        """Fold a batch of (user_message, bot_response, timestamp, response_time_ms) rows into the rollups."""
+        hours, days, questions = {}, {}, {}
+        for user_message, _, timestamp, response_time_ms in rows:
+            timed = 1 if response_time_ms and response_time_ms > 0 else 0
+            latency = response_time_ms if timed else 0
+            for bucket, key in ((hours, timestamp[:13]), (days, timestamp[:10])):
+                total = bucket.setdefault(key, [0, 0, 0])
+                total[0] += 1
+                total[1] += latency
+                total[2] += timed
+
+            question_key = cls.normalize_question(user_message)
+            if question_key:
+                entry = questions.setdefault((timestamp[:10], question_key), [user_message.strip()[:200], 0])
+                entry[1] += 1
+
+        cursor.executemany("""
+            INSERT INTO hourly_stats (hour, total_conversations, response_time_sum, response_time_count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(hour) DO UPDATE SET
+                total_conversations = total_conversations + excluded.total_conversations,
+                response_time_sum = response_time_sum + excluded.response_time_sum,
+                response_time_count = response_time_count + excluded.response_time_count
+        """, [(hour, *totals) for hour, totals in hours.items()])
+
+        cursor.executemany("""
+            INSERT INTO daily_stats (date, total_conversations, response_time_sum, response_time_count, avg_response_time)
+            VALUES (?, ?, ?, ?, CASE WHEN ? > 0 THEN 1.0 * ? / ? ELSE 0 END)
+            ON CONFLICT(date) DO UPDATE SET
+                total_conversations = total_conversations + excluded.total_conversations,
+                response_time_sum = response_time_sum + excluded.response_time_sum,
+                response_time_count = response_time_count + excluded.response_time_count,
+                avg_response_time = CASE WHEN response_time_count + excluded.response_time_count > 0
+                    THEN 1.0 * (response_time_sum + excluded.response_time_sum)
+                         / (response_time_count + excluded.response_time_count)
+                    ELSE 0 END
+        """, [(date, n, total, timed, timed, total, timed) for date, (n, total, timed) in days.items()])
+
+        cursor.executemany("""
+            INSERT INTO question_stats (date, question_key, question, count)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(date, question_key) DO UPDATE SET count = count + excluded.count
+        """, [(date, key, question, count) for (date, key), (question, count) in questions.items()])
+
+    def track_latency(self, stage: str, platform: str, duration_ms: float):
+        """Record one stage timing (queued; stored as a histogram bucket count)."""
+        hour = datetime.utcnow().strftime("%Y-%m-%d %H")
+        self.writer.submit("latency", (hour, stage, platform or "unknown", bucket_for(duration_ms)))
+
+    @staticmethod
+    def _write_latencies(cursor, rows):
+        counts = {}
+        for row in rows:
+            counts[row] = counts.get(row, 0) + 1
+        cursor.executemany("""
+            INSERT INTO latency_stats (hour, stage, platform, bucket, count)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(hour, stage, platform, bucket) DO UPDATE SET count = count + excluded.count
+        """, [(*key, count) for key, count in counts.items()])
+
+    def track_tokens(self, stage: str, model: str, platform: str, tool_path: str, session_id: str,
+                     prompt_tokens: int, completion_tokens: int):
+        """Record token usage of one LLM call (queued)."""
+        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        self.writer.submit("tokens", (timestamp, session_id, platform or "unknown", stage, model,
+                                      tool_path or "direct", prompt_tokens or 0, completion_tokens or 0))
+
+    @staticmethod
+    def _write_token_usage(cursor, rows):
+        cursor.executemany("""
+            INSERT INTO llm_usage (timestamp, session_id, platform, stage, model, tool_path, prompt_tokens, completion_tokens)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        totals = {}
+        for timestamp, _, platform, stage, model, tool_path, prompt_tokens, completion_tokens in rows:
+            total = totals.setdefault((timestamp[:10], stage, model, platform, tool_path), [0, 0, 0])
+            total[0] += 1
+            total[1] += prompt_tokens
+            total[2] += completion_tokens
+        cursor.executemany("""
+            INSERT INTO token_stats (date, stage, model, platform, tool_path, calls, prompt_tokens, completion_tokens)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(date, stage, model, platform, tool_path) DO UPDATE SET
+                calls = calls + excluded.calls,
+                prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                completion_tokens = completion_tokens + excluded.completion_tokens
+        """, [(*key, *total) for key, total in totals.items()])
+
+    @staticmethod
+    def estimate_cost(prompt_tokens: int, completion_tokens: int) -> float:
+        """Estimated USD cost at the configured per-million-token prices."""
+        return round((prompt_tokens * PROMPT_PRICE_PER_MTOK + completion_tokens * COMPLETION_PRICE_PER_MTOK) / 1e6, 6)
+
+    def rebuild_rollups(self):
+        """
+        Recompute the conversation rollups from the raw conversations table.
+        Only days still present in the live table are rebuilt; rollups for
+        days already archived by retention (analytics_retention.py) are kept.
+        """
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO conversations (user_message, bot_response, response_time_ms)
-            VALUES (?, ?, ?)
-        """, (user_message, bot_response, response_time_ms))
-        
+        first_day = cursor.execute("SELECT DATE(MIN(timestamp)) FROM conversations").fetchone()[0]
+        if first_day is None:
+            conn.close()
+            return
+        cursor.execute("DELETE FROM hourly_stats WHERE hour >= ?", (first_day,))
+        cursor.execute("DELETE FROM daily_stats WHERE date >= ?", (first_day,))
+        cursor.execute("DELETE FROM question_stats WHERE date >= ?", (first_day,))
+        rows = cursor.execute("""
+            SELECT user_message, '', strftime('%Y-%m-%d %H:%M:%S', timestamp), COALESCE(response_time_ms, 0)
+            FROM conversations
+            WHERE timestamp IS NOT NULL
+        """)
+        while True:
+            batch = rows.fetchmany(5000)
+            if not batch:
+                break
+            self._update_rollups(conn.cursor(), batch)
         conn.commit()
         conn.close()
-    
-    def get_total_conversations(self, days: int = 7) -> int:
-        """Get total conversations in last N days."""
-        conn = sqlite3.connect(self.db_path)
+
+    def flush(self):
+        """Wait until queued analytics events are written."""
+        self.writer.flush()
+
+    def close(self):
+        """Flush and stop the background writer (call on shutdown)."""
+        self.writer.close()
+
+    def get_writer_stats(self) -> Dict:
+        """Queue/writer counters, including events dropped on overflow."""
+        return dict(self.writer.stats, queued=self.writer._queue.qsize())
+
+    # Reads below only touch the rollup tables, so their cost is bounded by the
+    # window (at most 24 * days hourly rows), not by conversation history.
+
+    @staticmethod
+    def _hour_cutoff(days: int) -> str:
+        return (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d %H")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def _total_conversations(self, cursor, days: int) -> int:
+        cursor.execute("""
+            SELECT COALESCE(SUM(total_conversations), 0) FROM hourly_stats
+            WHERE hour >= ?
+        """, (self._hour_cutoff(days),))
+        return cursor.fetchone()[0]
+
+    def _most_asked_questions(self, cursor, limit: int) -> List[Dict]:
+        cursor.execute("""
+            SELECT MIN(question), SUM(count) as total
+            FROM question_stats
+            WHERE date >= date('now', '-30 days')
+            GROUP BY question_key
+            ORDER BY total DESC
+            LIMIT ?
+        """, (limit,))
+        return [{"question": row[0], "count": row[1]} for row in cursor.fetchall()]
+
+    def _avg_response_time(self, cursor) -> float:
+        cursor.execute("""
+            SELECT SUM(response_time_sum), SUM(response_time_count)
+            FROM hourly_stats
+            WHERE hour >= ?
+        """, (self._hour_cutoff(7),))
+        total, count = cursor.fetchone()
+        return round(total / count, 2) if count else 0
+
+    def _daily_stats(self, cursor, days: int) -> List[Dict]:
+        cursor.execute("""
+            SELECT date, total_conversations
+            FROM daily_stats
+            WHERE date >= date('now', ? || ' days')
+            ORDER BY date DESC
+        """, (f'-{days}',))
+        return [{"date": row[0], "count": row[1]} for row in cursor.fetchall()]
+
+    def get_latency_percentiles(self, days: int = 1) -> Dict:
+        """p50/p95/p99 per stage, overall and per platform, for the last N days."""
+        conn = self._connect()
         cursor = conn.cursor()
-        
-        since_date = datetime.now() - timedelta(days=days)
-        
         cursor.execute("""
-            SELECT COUNT(*) FROM conversations
-            WHERE timestamp >= ?
-        """, (since_date,))
-        
-        count = cursor.fetchone()[0]
+            SELECT stage, platform, bucket, SUM(count)
+            FROM latency_stats
+            WHERE hour >= ?
+            GROUP BY stage, platform, bucket
+        """, (self._hour_cutoff(days),))
+        rows = cursor.fetchall()
+        conn.close()
+
+        series = {}
+        for stage, platform, bucket, count in rows:
+            by_platform = series.setdefault(stage, {})
+            by_platform.setdefault("all", {})
+            by_platform["all"][bucket] = by_platform["all"].get(bucket, 0) + count
+            by_platform.setdefault(platform, {})[bucket] = count
+        return {
+            stage: {platform: percentiles(buckets.items()) for platform, buckets in by_platform.items()}
+            for stage, by_platform in sorted(series.items())
+        }
+
+    def get_token_usage(self, days: int = 7) -> Dict:
+        """Token totals and estimated cost by day, by intent (tool path) and by stage."""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        def grouped(column):
+            cursor.execute(f"""
+                SELECT {column}, SUM(calls), SUM(prompt_tokens), SUM(completion_tokens)
+                FROM token_stats
+                WHERE date >= date('now', ? || ' days')
+                GROUP BY {column}
+                ORDER BY SUM(prompt_tokens) + SUM(completion_tokens) DESC
+            """, (f'-{days}',))
+            return [{
+                column: key, "calls": calls, "prompt_tokens": prompt, "completion_tokens": completion,
+                "avg_tokens_per_call": round((prompt + completion) / calls, 1) if calls else 0,
+                "estimated_cost_usd": self.estimate_cost(prompt, completion)
+            } for key, calls, prompt, completion in cursor.fetchall()]
+
+        usage = {"by_day": grouped("date"), "by_intent": grouped("tool_path"), "by_stage": grouped("stage")}
+        usage["by_day"].sort(key=lambda row: row["date"], reverse=True)
+        conn.close()
+        return usage
+
+    def get_session_token_usage(self, session_id: str) -> Dict:
+        """Token totals for one chat session."""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(completion_tokens), 0)
+            FROM llm_usage WHERE session_id = ?
+        """, (session_id,))
+        calls, prompt, completion = cursor.fetchone()
+        conn.close()
+        return {"session_id": session_id, "calls": calls, "prompt_tokens": prompt, "completion_tokens": completion,
+                "estimated_cost_usd": self.estimate_cost(prompt, completion)}
+
+    def get_total_conversations(self, days: int = 7) -> int:
+        """Get total conversations in last N days."""
+        conn = self._connect()
+        count = self._total_conversations(conn.cursor(), days)
         conn.close()
         return count
     
     def get_most_asked_questions(self, limit: int = 10) -> List[Dict]:
         """Get most frequently asked questions."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT user_message, COUNT(*) as count
-            FROM conversations
-            WHERE timestamp >= datetime('now', '-30 days')
-            GROUP BY LOWER(TRIM(user_message))
-            ORDER BY count DESC
-            LIMIT ?
-        """, (limit,))
-        
-        rows = cursor.fetchall()
+        conn = self._connect()
+        questions = self._most_asked_questions(conn.cursor(), limit)
         conn.close()
-        
-        return [{"question": row[0], "count": row[1]} for row in rows]
+        return questions
     
     def get_avg_response_time(self) -> float:
         """Get average response time in milliseconds."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT AVG(response_time_ms)
-            FROM conversations
-            WHERE response_time_ms > 0
-            AND timestamp >= datetime('now', '-7 days')
-        """)
-        
-        avg = cursor.fetchone()[0] or 0
+        conn = self._connect()
+        avg = self._avg_response_time(conn.cursor())
         conn.close()
-        return round(avg, 2)
+        return avg
     
     def get_daily_stats(self, days: int = 7) -> List[Dict]:
         """Get daily conversation counts."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT DATE(timestamp) as date, COUNT(*) as count
-            FROM conversations
-            WHERE timestamp >= datetime('now', ? || ' days')
-            GROUP BY DATE(timestamp)
-            ORDER BY date DESC
-        """, (f'-{days}',))
-        
-        rows = cursor.fetchall()
+        conn = self._connect()
+        stats = self._daily_stats(conn.cursor(), days)
         conn.close()
-        
-        return [{"date": row[0], "count": row[1]} for row in rows]
+        return stats
     
     def get_dashboard_stats(self) -> Dict:
-        """Get summary stats for dashboard."""
-        return {
-            "today": self.get_total_conversations(1),
-            "week": self.get_total_conversations(7),
-            "month": self.get_total_conversations(30),
-            "avg_response_time": self.get_avg_response_time(),
-            "most_asked": self.get_most_asked_questions(5),
-            "daily_trend": self.get_daily_stats(7)
+        """Get summary stats for dashboard (one connection, rollup tables only)."""
+        conn = self._connect()
+        cursor = conn.cursor()
+        stats = {
+            "today": self._total_conversations(cursor, 1),
+            "week": self._total_conversations(cursor, 7),
+            "month": self._total_conversations(cursor, 30),
+            "avg_response_time": self._avg_response_time(cursor),
+            "most_asked": self._most_asked_questions(cursor, 5),
+            "daily_trend": self._daily_stats(cursor, 7)
         }
+        conn.close()
+        return stats
@@ -0,0 +1,217 @@
+"""
+Analytics retention: archive old raw rows, compact old histograms, reclaim space.
+
+Rows in `conversations` and `llm_usage` older than the retention window are
+appended to monthly gzip'd JSON Lines files (e.g. analytics_archive/conversations-2025-01.jsonl.gz)
+and then deleted from the live database. Their counts are already in the
+rollup tables (daily/hourly/question/token stats), which are kept. Hourly
+latency histograms past the window are merged into one row per day. Freed
+pages are returned to the filesystem with incremental vacuum.
+
+Databases created before auto_vacuum was enabled need a one-time full VACUUM
+to switch modes. That rewrites the whole file under an exclusive lock, so the
+background job never does it; run it offline with --convert-vacuum while the
+app is stopped. Until then, free pages stay in the file and are reused.
+
+Usage:
+    python analytics_retention.py --days 90
+    python analytics_retention.py --convert-vacuum     # once, with the app stopped
+    python analytics_retention.py --search "refund"   # grep the archive offline
+"""
+import os
+import gzip
+import json
+import time
+import sqlite3
+import argparse
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB = "analytics.db"
+DEFAULT_RETENTION_DAYS = int(os.getenv("ANALYTICS_RETENTION_DAYS", "90"))
+DEFAULT_ARCHIVE_DIR = os.getenv("ANALYTICS_ARCHIVE_DIR", "analytics_archive")
+ARCHIVED_TABLES = ("conversations", "llm_usage")
+BATCH_SIZE = 5000
+VACUUM_PAGES_PER_STEP = 2000
+
+
+def ensure_incremental_vacuum(conn: sqlite3.Connection) -> bool:
+    """Switch the database to auto_vacuum=INCREMENTAL (one full VACUUM if it was created without it)."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def archive_path(archive_dir: str, table: str, month: str) -> str:
+    return os.path.join(archive_dir, f"{table}-{month}.jsonl.gz")
+
+
+def archive_table(conn: sqlite3.Connection, table: str, cutoff: str, archive_dir: str) -> int:
+    """
+    Move rows with timestamp < cutoff into monthly archive files, oldest first.
+    Each batch is appended (a new gzip member) and flushed to disk before its
+    rows are deleted, so a crash can at worst archive a batch twice; every
+    line carries the row id for de-duplication.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    conn.row_factory = sqlite3.Row
+    moved = 0
+    while True:
+        rows = conn.execute(f"""
+            SELECT * FROM {table}
+            WHERE timestamp < ?
+            ORDER BY id
+            LIMIT ?
+        """, (cutoff, BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(str(row["timestamp"])[:7], []).append(dict(row))
+        for month, records in by_month.items():
+            with gzip.open(archive_path(archive_dir, table, month), "at", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+        conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(row["id"],) for row in rows])
+        conn.commit()
+        moved += len(rows)
+    conn.row_factory = None
+    return moved
+
+
+def compact_latency(conn: sqlite3.Connection, cutoff_day: str) -> int:
+    """Merge hourly latency histogram rows before cutoff_day into one row per day."""
+    old = conn.execute("SELECT COUNT(*) FROM latency_stats WHERE hour < ? AND length(hour) > 10",
+                       (cutoff_day,)).fetchone()[0]
+    if not old:
+        return 0
+    conn.execute("""
+        INSERT INTO latency_stats (hour, stage, platform, bucket, count)
+        SELECT substr(hour, 1, 10), stage, platform, bucket, SUM(count)
+        FROM latency_stats
+        WHERE hour < ? AND length(hour) > 10
+        GROUP BY substr(hour, 1, 10), stage, platform, bucket
+        ON CONFLICT(hour, stage, platform, bucket) DO UPDATE SET count = count + excluded.count
+    """, (cutoff_day,))
+    conn.execute("DELETE FROM latency_stats WHERE hour < ? AND length(hour) > 10", (cutoff_day,))
+    conn.commit()
+    return old
+
+
+def apply_retention(db_path: str = DEFAULT_DB, retention_days: int = DEFAULT_RETENTION_DAYS,
+                    archive_dir: str = DEFAULT_ARCHIVE_DIR, convert_vacuum: bool = False) -> Dict:
+    """
+    Archive and prune everything older than `retention_days` (cut at a UTC day
+    boundary). `convert_vacuum` allows the one-time full VACUUM; offline only.
+    """
+    started = time.time()
+    cutoff_day = (datetime.utcnow() - timedelta(days=retention_days)).strftime("%Y-%m-%d")
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        converted = ensure_incremental_vacuum(conn) if convert_vacuum else False
+        incremental = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        archived = {table: archive_table(conn, table, cutoff_day, archive_dir) for table in ARCHIVED_TABLES}
+        compacted = compact_latency(conn, cutoff_day)
+
+        # Release free pages in steps so the write lock is held only briefly each time
+        freed = remaining = conn.execute("PRAGMA freelist_count").fetchone()[0] if incremental else 0
+        while remaining:
+            conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})").fetchall()
+            conn.commit()
+            left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if left >= remaining:
+                break
+            remaining = left
+    finally:
+        conn.close()
+    if not incremental:
+        logger.info(f"{db_path} is not in auto_vacuum=INCREMENTAL mode; run "
+                    f"`python analytics_retention.py --convert-vacuum` offline to reclaim space")
+
+    stats = {"cutoff": cutoff_day, "archived": archived, "latency_rows_compacted": compacted,
+             "pages_freed": freed, "converted_to_incremental_vacuum": converted,
+             "elapsed_s": round(time.time() - started, 2)}
+    logger.info(f"🗄️ Analytics retention: {stats}")
+    return stats
+
+
+def iter_archive(archive_dir: str = DEFAULT_ARCHIVE_DIR, table: str = "conversations",
+                 month: Optional[str] = None) -> Iterator[Dict]:
+    """Yield archived rows (optionally for one YYYY-MM), de-duplicated by id."""
+    prefix = f"{table}-{month}" if month else f"{table}-"
+    if not os.path.isdir(archive_dir):
+        return
+    for name in sorted(os.listdir(archive_dir)):
+        if not (name.startswith(prefix) and name.endswith(".jsonl.gz")):
+            continue
+        seen = set()
+        with gzip.open(os.path.join(archive_dir, name), "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record["id"] not in seen:
+                    seen.add(record["id"])
+                    yield record
+
+
+class RetentionJob:
+    """Runs apply_retention in a background thread once per interval."""
+    def __init__(self, db_path: str = DEFAULT_DB, retention_days: int = DEFAULT_RETENTION_DAYS,
+                 archive_dir: str = DEFAULT_ARCHIVE_DIR, interval_seconds: int = 24 * 3600):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.archive_dir = archive_dir
+        self.interval = interval_seconds
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.last_run = apply_retention(self.db_path, self.retention_days, self.archive_dir)
+            except Exception as e:
+                logger.error(f"Analytics retention failed: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self.retention_days <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="analytics-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Archive and prune old analytics rows.")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--days", type=int, default=DEFAULT_RETENTION_DAYS, help="Keep this many days live")
+    parser.add_argument("--archive-dir", default=DEFAULT_ARCHIVE_DIR)
+    parser.add_argument("--convert-vacuum", action="store_true",
+                        help="Switch an old database to incremental vacuum (full VACUUM; stop the app first)")
+    parser.add_argument("--search", help="Print archived conversations containing this text and exit")
+    parser.add_argument("--month", help="Limit --search to one month (YYYY-MM)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.search:
+        needle = args.search.lower()
+        for row in iter_archive(args.archive_dir, "conversations", args.month):
+            if needle in row["user_message"].lower() or needle in row["bot_response"].lower():
+                print(f"[{row['timestamp']}] {row['user_message']}\n    -> {row['bot_response'][:200]}")
+    else:
+        print(json.dumps(apply_retention(args.db, args.days, args.archive_dir, args.convert_vacuum), indent=2))
@@ -0,0 +1,249 @@
+"""
+Retrieval quality and latency benchmark for the RAG collection.
+
+Builds labeled query -> chunk pairs from data/faqs.txt, data/products.txt and
+(with --crawled) the crawled pages already in chroma_db, pads the collection
+with distractor chunks up to each target size, and for every HNSW setting
+reports recall@k, MRR, ANN recall against exact search, build time and query
+latency. Embeddings are computed once and reused for every configuration.
+
+    python bench_retrieval.py --sizes 0,5000,20000 --M 8,16,32 --ef-search 10,50,100
+    python bench_retrieval.py --crawled --queries labeled.jsonl --json
+
+Labeled query files are JSON Lines: {"query": "...", "relevant": ["faq_3", ...]}
+(chunk ids as written by ingest_local.py / the crawler).
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+
+import numpy as np
+
+from rag import RAGHandler
+from latency import percentile
+from ingest_pipeline import iter_file_paragraphs
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+PAREN_RE = re.compile(r"\s*\(.*?\)")
+STOPWORDS = {"a", "an", "the", "is", "are", "do", "does", "you", "your", "i", "my", "we", "our", "of", "to",
+             "for", "in", "on", "how", "what", "should", "can", "it", "and", "or", "with"}
+UPSERT_BATCH = 5000
+
+
+def _keywords(text):
+    words = re.findall(r"[a-z0-9-]+", text.lower())
+    return " ".join(w for w in words if w not in STOPWORDS)
+
+
+def faq_pairs(path):
+    """Each Q/A block is one chunk; its question, verbatim and as bare keywords, are the queries."""
+    chunks, pairs = {}, []
+    for i, chunk in enumerate(iter_file_paragraphs(path)):
+        chunk_id = f"faq_{i}"
+        chunks[chunk_id] = chunk
+        question = next((line[2:].strip() for line in chunk.splitlines() if line.startswith("Q:")), None)
+        if question:
+            pairs.append((question, {chunk_id}))
+            pairs.append((_keywords(question), {chunk_id}))
+    return chunks, pairs
+
+
+def product_pairs(path):
+    """Each product block is one chunk; queries ask for it by name and by what it does."""
+    chunks, pairs = {}, []
+    for i, chunk in enumerate(iter_file_paragraphs(path)):
+        chunk_id = f"product_{i}"
+        chunks[chunk_id] = chunk
+        fields = dict(line.split(":", 1) for line in chunk.splitlines() if ":" in line)
+        name = fields.get("Product", "").strip()
+        description = fields.get("Description", "").strip()
+        if name:
+            pairs.append((f"Do you have {PAREN_RE.sub('', name)}?", {chunk_id}))
+        if description:
+            pairs.append((f"something {_keywords(SENTENCE_RE.split(description)[0])}", {chunk_id}))
+    return chunks, pairs
+
+
+def crawled_pairs(persistence_path, limit=500):
+    """Crawled chunks from the live collection; the page title (first chunk) or lead sentence is the query."""
+    rag = RAGHandler(persistence_path)
+    found = rag.collection.get(include=["documents", "metadatas"])
+    chunks, pairs = {}, []
+    for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"]):
+        if not str((metadata or {}).get("source", "")).startswith("http"):
+            continue
+        chunks[chunk_id] = text
+        title = (metadata or {}).get("title")
+        if chunk_id.endswith("_0") and title and title != "No Title":
+            query = title
+        else:
+            query = " ".join(SENTENCE_RE.split(text.strip())[0].split()[:15])
+        if len(pairs) < limit and query:
+            pairs.append((query, {chunk_id}))
+    return chunks, pairs
+
+
+def load_queries(path):
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                pairs.append((record["query"], set(record["relevant"])))
+    return pairs
+
+
+def distractors(chunks, count, seed=7):
+    """Filler chunks stitched from real sentences, so they are near the labeled ones in embedding space."""
+    sentences = [s for text in chunks.values() for s in SENTENCE_RE.split(text.replace("\n", " ")) if len(s) > 20]
+    rng = random.Random(seed)
+    return {f"distractor_{i}": " ".join(rng.sample(sentences, min(3, len(sentences))))
+            for i in range(count)}
+
+
+def embed_all(rag, texts, batch_size=256):
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(rag.embed(texts[start:start + batch_size]))
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def exact_top_k(doc_vectors, query_vectors, k):
+    """Brute-force L2 neighbours (Chroma's default space) as ANN ground truth."""
+    distances = ((query_vectors ** 2).sum(1)[:, None] - 2 * query_vectors @ doc_vectors.T
+                 + (doc_vectors ** 2).sum(1)[None, :])
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def score(results, pairs, exact, k):
+    recall = mrr = ann = 0.0
+    for ids, (_, relevant), truth in zip(results, pairs, exact):
+        recall += len(relevant & set(ids[:k])) / len(relevant)
+        rank = next((i + 1 for i, chunk_id in enumerate(ids[:k]) if chunk_id in relevant), None)
+        mrr += 1 / rank if rank else 0
+        ann += len(set(ids[:k]) & set(truth)) / k
+    n = len(pairs) or 1
+    return round(recall / n, 4), round(mrr / n, 4), round(ann / n, 4)
+
+
+def run_config(rag, name, ids, documents, doc_vectors, query_vectors, M, ef_construction, ef_search, k):
+    collection = rag.use_collection(name, M, ef_construction, ef_search)
+    started = time.perf_counter()
+    for start in range(0, len(ids), UPSERT_BATCH):
+        end = start + UPSERT_BATCH
+        collection.upsert(ids=ids[start:end], documents=documents[start:end],
+                          embeddings=doc_vectors[start:end].tolist())
+    build_s = time.perf_counter() - started
+
+    results, latencies = [], []
+    for vector in query_vectors:
+        started = time.perf_counter()
+        found = collection.query(query_embeddings=[vector.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append(found["ids"][0])
+    rag.client.delete_collection(name)
+    return results, sorted(latencies), build_s
+
+
+def parse_ints(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure RAG recall and latency across HNSW settings.")
+    parser.add_argument("--sizes", default="0,2000,10000", help="Distractor chunks added on top of the labeled corpus")
+    parser.add_argument("--M", default="16", help="HNSW M values")
+    parser.add_argument("--ef-construction", default="100", help="HNSW ef_construction values")
+    parser.add_argument("--ef-search", default="10,50,100", help="HNSW ef_search values")
+    parser.add_argument("--k", type=int, default=3, help="Results per query (the app uses 3)")
+    parser.add_argument("--crawled", action="store_true", help="Include crawled pages from the live collection")
+    parser.add_argument("--chroma-path", default=os.path.join(BASE_DIR, "chroma_db"))
+    parser.add_argument("--queries", action="append", default=[], help="Extra labeled JSONL queries (repeatable)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    chunks, pairs = {}, []
+    for loader, path in ((faq_pairs, os.path.join(BASE_DIR, "data", "faqs.txt")),
+                         (product_pairs, os.path.join(BASE_DIR, "data", "products.txt"))):
+        more_chunks, more_pairs = loader(path)
+        chunks.update(more_chunks)
+        pairs += more_pairs
+    if args.crawled:
+        more_chunks, more_pairs = crawled_pairs(args.chroma_path)
+        chunks.update(more_chunks)
+        pairs += more_pairs
+    for path in args.queries:
+        pairs += load_queries(path)
+    pairs = [(query, relevant & chunks.keys()) for query, relevant in pairs if relevant & chunks.keys()]
+    if not pairs:
+        print("No labeled queries found.")
+        return 1
+
+    rag = RAGHandler(persistence_path=None, collection_name="bench_retrieval")
+    if rag.embedding_fn is None:
+        print("No local embedding model available (sentence-transformers).")
+        return 1
+
+    sizes = parse_ints(args.sizes)
+    chunks.update(distractors(chunks, max(sizes)))
+    all_ids = list(chunks)
+    labeled = len(all_ids) - max(sizes)
+    print(f"Embedding {len(all_ids)} chunks and {len(pairs)} queries...")
+    doc_vectors = embed_all(rag, [chunks[i] for i in all_ids])
+    embed_ms = []
+    for query, _ in pairs:
+        started = time.perf_counter()
+        rag.embed([query])
+        embed_ms.append((time.perf_counter() - started) * 1000)
+    query_vectors = embed_all(rag, [query for query, _ in pairs])
+
+    rows = []
+    for size in sizes:
+        ids = all_ids[:labeled + size]
+        documents = [chunks[i] for i in ids]
+        exact = [[ids[j] for j in row] for row in exact_top_k(doc_vectors[:len(ids)], query_vectors, args.k)]
+        recall, mrr, _ = score(exact, pairs, exact, args.k)
+        rows.append({"chunks": len(ids), "M": "exact", "ef_construction": "-", "ef_search": "-",
+                     "recall_at_k": recall, "mrr": mrr, "ann_recall": 1.0,
+                     "build_s": None, "p50_ms": None, "p95_ms": None})
+        for M, ef_construction, ef_search in itertools.product(
+                parse_ints(args.M), parse_ints(args.ef_construction), parse_ints(args.ef_search)):
+            name = f"bench_{size}_{M}_{ef_construction}_{ef_search}"
+            results, latencies, build_s = run_config(rag, name, ids, documents, doc_vectors[:len(ids)],
+                                                     query_vectors, M, ef_construction, ef_search, args.k)
+            recall, mrr, ann = score(results, pairs, exact, args.k)
+            rows.append({"chunks": len(ids), "M": M, "ef_construction": ef_construction, "ef_search": ef_search,
+                         "recall_at_k": recall, "mrr": mrr, "ann_recall": ann, "build_s": round(build_s, 2),
+                         "p50_ms": round(percentile(latencies, 0.50), 2),
+                         "p95_ms": round(percentile(latencies, 0.95), 2)})
+            if not args.json:
+                print(f"  {name}: recall@{args.k}={recall} mrr={mrr} ann={ann}")
+
+    embed_p50 = round(percentile(sorted(embed_ms), 0.50), 2)
+    if args.json:
+        print(json.dumps({"queries": len(pairs), "k": args.k, "embed_p50_ms": embed_p50, "results": rows}, indent=2))
+        return 0
+
+    print(f"\n{len(pairs)} labeled queries, k={args.k}, query embedding p50 {embed_p50} ms")
+    header = (f"{'Chunks':>7} {'M':>5} {'efC':>5} {'efS':>5} {'Recall@k':>9} {'MRR':>7} "
+              f"{'ANN rec':>8} {'Build s':>8} {'p50 ms':>7} {'p95 ms':>7}")
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['chunks']:>7} {str(r['M']):>5} {str(r['ef_construction']):>5} {str(r['ef_search']):>5} "
+              f"{r['recall_at_k']:>9} {r['mrr']:>7} {r['ann_recall']:>8} {str(r['build_s'] or '-'):>8} "
+              f"{str(r['p50_ms'] or '-'):>7} {str(r['p95_ms'] or '-'):>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Local stand-ins for Groq and WooCommerce used by benchmark.py.
+
+- Stub LLM: OpenAI-compatible /v1/chat/completions with configurable latency,
+  usage accounting, tool calls chosen from the user message, and SSE streaming.
+- Stub Woo: /wp-json/wc/v3/products (search, include, _fields, status,
+  modified_after, pagination headers) and /orders/{id} over a synthetic catalog.
+- Stub WATI: /api/v1/sendSessionMessage/{waId}, handing every outgoing
+  WhatsApp message to a callback so replies can be timed.
+
+The tool choice (`pick_tool`) and store responses (`query_products`,
+`stub_order`) are plain functions, so replay.py uses them in-process.
+
+Run standalone:
+    python bench_stubs.py --llm-port 9101 --woo-port 9102 --llm-latency-ms 300
+"""
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ORDER_RE = re.compile(r"\b(\d{3,})\b")
+PRODUCT_WORDS = ("price", "product", "buy", "stock", "have", "sell", "catalog", "toothpaste", "soap", "gift")
+KNOWLEDGE_WORDS = ("ingredient", "benefit", "policy", "shipping", "company", "how", "what")
+CART_WORDS = ("add to cart", "i'll take", "buy it")
+SEARCH_TERMS = ("toothpaste", "soap", "gift", "brush", "wash", "kit")
+# Every final answer from the stub LLM starts with this
+STUB_REPLY = "Here is what I found for you."
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text or "") // 4)
+
+
+def pick_tool(message: str):
+    """Deterministic tool choice mimicking what the model does for common intents."""
+    lower = message.lower()
+    order = ORDER_RE.search(lower)
+    if "order" in lower and order:
+        return "check_order_status", {"order_id": order.group(1)}
+    if any(word in lower for word in CART_WORDS):
+        return "manage_cart", {"action": "add", "product_id": "1001", "quantity": 1}
+    if any(word in lower for word in PRODUCT_WORDS):
+        terms = [term for term in SEARCH_TERMS if term in lower]
+        return "search_store_products", {"query": terms[0] if terms else ""}
+    if any(word in lower for word in KNOWLEDGE_WORDS):
+        return "search_knowledge_base", {"query": message[:80]}
+    return None, None
+
+
+def create_llm_app(latency_ms: float = 300, ms_per_token: float = 2, reply_tokens: int = 80,
+                   jitter: float = 0.2, tool_calls: bool = True) -> FastAPI:
+    app = FastAPI()
+    app.state.calls = 0
+
+    async def wait(tokens):
+        delay = (latency_ms + ms_per_token * tokens) / 1000
+        await asyncio.sleep(max(0.0, random.uniform(delay * (1 - jitter), delay * (1 + jitter))))
+
+    @app.post("/v1/chat/completions")
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        messages = body.get("messages", [])
+        model = body.get("model", "stub-model")
+        prompt_tokens = sum(_approx_tokens(str(m.get("content", ""))) for m in messages if isinstance(m, dict))
+        user_text = next((m.get("content", "") for m in reversed(messages)
+                          if isinstance(m, dict) and m.get("role") == "user"), "")
+        has_tool_results = any(isinstance(m, dict) and m.get("role") == "tool" for m in messages)
+
+        message = {"role": "assistant", "content": None}
+        finish_reason = "stop"
+        tool, args = pick_tool(user_text) if (tool_calls and body.get("tools") and not has_tool_results) else (None, None)
+        if tool:
+            message["tool_calls"] = [{"id": f"call_{uuid.uuid4().hex[:8]}", "type": "function",
+                                      "function": {"name": tool, "arguments": json.dumps(args)}}]
+            finish_reason = "tool_calls"
+            completion_tokens = 20
+        else:
+            message["content"] = ((STUB_REPLY + " ") * (reply_tokens // 7 + 1)).strip()
+            completion_tokens = reply_tokens
+
+        await wait(completion_tokens)
+        created = int(time.time())
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+
+        if body.get("stream") and not tool:
+            async def events():
+                for word in message["content"].split(" "):
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                             "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(ms_per_token / 1000)
+                done = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+                yield f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        return {"id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}], "usage": usage}
+
+    return app
+
+
+def synthetic_catalog(size: int = 200):
+    names = ["Herbal Toothpaste", "Charcoal Soap", "Aloe Body Wash", "Gift Set", "Travel Kit", "Bamboo Brush"]
+    now = datetime.utcnow()
+    catalog = []
+    for i in range(size):
+        pid = 1001 + i
+        name = f"{names[i % len(names)]} {i // len(names) + 1}"
+        catalog.append({
+            "id": pid, "name": name, "slug": name.lower().replace(" ", "-"), "sku": f"RZ-{pid}",
+            "status": "publish", "type": "simple",
+            "permalink": f"https://store.example/product/{pid}/",
+            "price": f"{19 + i % 40}.00", "regular_price": f"{25 + i % 40}.00", "sale_price": "", "on_sale": False,
+            "stock_status": "instock" if i % 9 else "outofstock",
+            "short_description": f"<p>{name} short description.</p>",
+            "description": "<p>" + f"{name} made with natural ingredients. " * 20 + "</p>",
+            "categories": [{"id": i % 5, "name": f"Category {i % 5}", "slug": f"category-{i % 5}"}],
+            "tags": [], "images": [{"id": pid, "src": f"https://store.example/img/{pid}.jpg"}],
+            "date_created": (now - timedelta(days=400)).strftime("%Y-%m-%dT%H:%M:%S"),
+            "date_modified": (now - timedelta(days=i % 30)).strftime("%Y-%m-%dT%H:%M:%S"),
+            "meta_data": [{"id": j, "key": f"_meta_{j}", "value": "x" * 40} for j in range(10)],
+        })
+    return catalog
+
+
+def query_products(catalog, q):
+    """
+    /products over the synthetic catalog for query params `q` (include,
+    search, status, modified_after, per_page, page, _fields).
+    Returns (page of products, total matches, total pages).
+    """
+    products = catalog
+    if q.get("include"):
+        ids = {int(x) for x in str(q["include"]).split(",") if x.strip().isdigit()}
+        products = [p for p in products if p["id"] in ids]
+    if q.get("search"):
+        term = q["search"].lower()
+        products = [p for p in products if term in p["name"].lower()]
+    if q.get("status") not in (None, "any"):
+        products = [p for p in products if p["status"] == q["status"]]
+    if q.get("modified_after"):
+        products = [p for p in products if p["date_modified"] > q["modified_after"][:19]]
+
+    per_page = min(int(q.get("per_page", 10)), 100)
+    page = int(q.get("page", 1))
+    total = len(products)
+    fields = set(q["_fields"].split(",")) if q.get("_fields") else None
+    body = [{k: v for k, v in p.items() if k in fields} if fields else p
+            for p in products[(page - 1) * per_page:page * per_page]]
+    return body, total, max(1, -(-total // per_page))
+
+
+def stub_order(catalog, order_id: int):
+    """An order resource for any ID (None for IDs ending in 0, which don't exist)."""
+    if order_id % 10 == 0:
+        return None
+    return {"id": order_id, "status": "processing", "currency": "AED", "total": "147.00",
+            "date_created": "2025-01-01T10:00:00",
+            "line_items": [{"name": catalog[order_id % len(catalog)]["name"], "quantity": 2}]}
+
+
+def create_woo_app(catalog_size: int = 200, latency_ms: float = 80, jitter: float = 0.2) -> FastAPI:
+    app = FastAPI()
+    catalog = synthetic_catalog(catalog_size)
+    by_id = {p["id"]: p for p in catalog}
+
+    async def wait():
+        delay = latency_ms / 1000
+        await asyncio.sleep(max(0.0, random.uniform(delay * (1 - jitter), delay * (1 + jitter))))
+
+    @app.get("/wp-json/wc/v3/products")
+    async def list_products(request: Request):
+        await wait()
+        body, total, pages = query_products(catalog, request.query_params)
+        return JSONResponse(body, headers={"X-WP-Total": str(total), "X-WP-TotalPages": str(pages)})
+
+    @app.get("/wp-json/wc/v3/products/{product_id}")
+    async def get_product(product_id: int):
+        await wait()
+        product = by_id.get(product_id)
+        return product if product else JSONResponse({"code": "woocommerce_rest_product_invalid_id"}, status_code=404)
+
+    @app.get("/wp-json/wc/v3/orders/{order_id}")
+    async def get_order(order_id: int):
+        await wait()
+        order = stub_order(catalog, order_id)
+        return order if order else JSONResponse({"code": "woocommerce_rest_shop_order_invalid_id"}, status_code=404)
+
+    return app
+
+
+def create_wati_app(on_message=None) -> FastAPI:
+    """`on_message(wa_id, text)` is called for every message the app sends."""
+    app = FastAPI()
+    app.state.sent = 0
+
+    @app.post("/api/v1/sendSessionMessage/{wa_id}")
+    async def send_session_message(wa_id: str, request: Request):
+        app.state.sent += 1
+        if on_message:
+            on_message(wa_id, request.query_params.get("messageText", ""))
+        return {"result": True}
+
+    return app
+
+
+class StubServer:
+    """Runs an ASGI app with uvicorn in a background thread."""
+    def __init__(self, app, port: int, host: str = "127.0.0.1"):
+        self.url = f"http://{host}:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self, timeout: float = 10):
+        self.thread.start()
+        deadline = time.time() + timeout
+        while not self.server.started:
+            if time.time() > deadline:
+                raise RuntimeError(f"Stub server on {self.url} did not start")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(5)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Groq and WooCommerce stubs.")
+    parser.add_argument("--llm-port", type=int, default=9101)
+    parser.add_argument("--woo-port", type=int, default=9102)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--woo-latency-ms", type=float, default=80)
+    parser.add_argument("--catalog-size", type=int, default=200)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    llm = StubServer(create_llm_app(args.llm_latency_ms), args.llm_port).start()
+    woo = StubServer(create_woo_app(args.catalog_size, args.woo_latency_ms), args.woo_port).start()
+    print(f"Stub LLM:  GROQ_BASE_URL={llm.url}/v1")
+    print(f"Stub Woo:  WOO_URL={woo.url}")
+    print("Press CTRL+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        llm.stop()
+        woo.stop()
@@ -0,0 +1,316 @@
+"""
+Load-test the chat server against local Groq / WooCommerce stubs.
+
+Starts bench_stubs (unless --target is given), launches `uvicorn main:app`
+pointed at them in a scratch directory, then drives /api/test-chat and
+/webhook at a fixed concurrency and reports req/s and p50/p95/p99 latency.
+
+/webhook answers before any work is done, so its p50/p95/p99 are ack latency
+only. With the stubs, the WhatsApp replies arrive at the stub WATI server and
+are matched back to their messages: `completed` counts answers from the LLM,
+and completion_p50/p95/p99 time each message until that answer was sent.
+Against --target there is no stub WATI and only acks are measured.
+
+    python benchmark.py --requests 500 --concurrency 20
+    python benchmark.py --save-baseline main          # store results
+    python benchmark.py --compare main                # fail on p95 regression
+    python benchmark.py --target http://localhost:8003 --endpoints test-chat
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import deque
+from datetime import datetime
+
+import httpx
+
+from latency import percentile
+from bench_stubs import STUB_REPLY, StubServer, create_llm_app, create_wati_app, create_woo_app
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINES = os.path.join(BASE_DIR, "benchmark_baselines.json")
+
+# Message mix roughly matching production intents
+MESSAGES = [
+    "What toothpaste do you have?",
+    "Show me your gift sets",
+    "How much is the charcoal soap?",
+    "Where is my order 4521?",
+    "What are the ingredients in the herbal toothpaste?",
+    "What is your shipping policy?",
+    "Add to cart please",
+    "Hello",
+    "Do you sell travel kits?",
+    "What are the benefits of aloe?",
+]
+
+
+class ReplyTracker:
+    """
+    Matches replies seen by the stub WATI server to webhook messages. A
+    session's messages are answered in order, so each final answer (text
+    starting with STUB_REPLY) completes the oldest open message of its waId.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = {}
+        self.latencies = []
+        self.expected = 0
+
+    def expect(self, wa_id):
+        started = time.perf_counter()
+        with self._lock:
+            self._open.setdefault(wa_id, deque()).append(started)
+            self.expected += 1
+        return started
+
+    def withdraw(self, wa_id, started):
+        """The message was not accepted, so no answer will come."""
+        with self._lock:
+            self._open[wa_id].remove(started)
+            self.expected -= 1
+
+    def on_message(self, wa_id, text):
+        if not text.startswith(STUB_REPLY):
+            return  # status, queue and apology messages
+        with self._lock:
+            pending = self._open.get(wa_id)
+            if pending:
+                self.latencies.append((time.perf_counter() - pending.popleft()) * 1000)
+
+    def wait(self, timeout):
+        """Wait until every accepted message is answered (or `timeout` passes)."""
+        deadline = time.time() + timeout
+        while len(self.latencies) < self.expected and time.time() < deadline:
+            time.sleep(0.2)
+
+
+def summarize(latencies_ms, errors, elapsed_s, rejected=0, queued=0, completions=None, expected=0):
+    latencies = sorted(latencies_ms)
+    total = len(latencies) + errors + rejected
+    summary = {
+        "requests": total,
+        "errors": errors,
+        "rejected": rejected,
+        "req_per_s": round(total / elapsed_s, 1) if elapsed_s else 0,
+        "p50_ms": round(percentile(latencies, 0.50), 1),
+        "p95_ms": round(percentile(latencies, 0.95), 1),
+        "p99_ms": round(percentile(latencies, 0.99), 1),
+        "max_ms": round(latencies[-1], 1) if latencies else 0,
+    }
+    if completions is not None:
+        done = sorted(completions)
+        summary.update({
+            "queued": queued,
+            "completed": len(done),
+            "incomplete": expected - len(done),
+            "completion_p50_ms": round(percentile(done, 0.50), 1),
+            "completion_p95_ms": round(percentile(done, 0.95), 1),
+            "completion_p99_ms": round(percentile(done, 0.99), 1),
+        })
+    return summary
+
+
+async def drive(base_url, endpoint, total, concurrency, unique, tracker=None, completion_timeout=60):
+    """
+    Send `total` requests with at most `concurrency` in flight. For /webhook,
+    the JSON status decides the outcome (it is HTTP 200 even for errors and
+    rejections); with a `tracker`, replies are then awaited and timed.
+    """
+    latencies, errors, rejected, queued = [], 0, 0, 0
+    counter = iter(range(total))
+    rng = random.Random(42)
+
+    def payload(i):
+        text = rng.choice(MESSAGES)
+        if unique:
+            text = f"{text} (#{i})"  # defeat the response cache
+        if endpoint == "webhook":
+            return "/webhook", {"waId": f"97150{i % 500:07d}", "text": text}
+        return "/api/test-chat", {"message": text, "session_id": f"bench_{i % 200}"}
+
+    async def worker(client):
+        nonlocal errors, rejected, queued
+        for i in counter:
+            path, body = payload(i)
+            started = time.perf_counter()
+            expected = tracker.expect(body["waId"]) if tracker and endpoint == "webhook" else None
+            status = "error"
+            try:
+                response = await client.post(path, json=body)
+                if response.status_code == 429:
+                    status = "rejected"  # shed by admission control
+                elif response.status_code < 400:
+                    status = response.json().get("status", "received") if endpoint == "webhook" else "ok"
+            except (httpx.HTTPError, ValueError):
+                pass
+            if expected is not None and status not in ("received", "queued"):
+                tracker.withdraw(body["waId"], expected)
+            if status == "rejected":
+                rejected += 1
+            elif status not in ("ok", "received", "queued"):
+                errors += 1
+            else:
+                queued += status == "queued"
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    if endpoint != "webhook":
+        return summarize(latencies, errors, elapsed, rejected)
+    if tracker is None:
+        return dict(summarize(latencies, errors, elapsed, rejected), queued=queued, latency="ack only")
+    await asyncio.to_thread(tracker.wait, completion_timeout)
+    return summarize(latencies, errors, elapsed, rejected, queued, list(tracker.latencies), tracker.expected)
+
+
+def start_app(port, llm_url, woo_url, wati_url, workdir):
+    """Run the real app (uvicorn main:app) against the stubs, with its databases in `workdir`."""
+    env = dict(os.environ,
+               GROQ_API_KEY="bench", GROQ_BASE_URL=f"{llm_url}/v1",
+               WOO_URL=woo_url, WOO_KEY="ck_bench", WOO_SECRET="cs_bench",
+               WATI_TOKEN="bench", WATI_API_ENDPOINT=wati_url,
+               PYTHONPATH=BASE_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120  # first start loads the embedding model
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with code {process.returncode}")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("App did not become ready in time")
+
+
+def load_baselines(path):
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Print deltas vs a baseline; returns False if any p95 regressed beyond tolerance."""
+    ok = True
+    for endpoint, current in results.items():
+        previous = baseline.get("results", {}).get(endpoint)
+        if not previous:
+            print(f"  {endpoint}: no baseline")
+            continue
+        for key in ("req_per_s", "p50_ms", "p95_ms", "p99_ms", "completion_p50_ms", "completion_p95_ms"):
+            if key not in previous or key not in current:
+                continue
+            before, after = previous[key], current[key]
+            change = (after - before) / before * 100 if before else 0
+            print(f"  {endpoint:10} {key:18} {before:>9} -> {after:>9} ({change:+.1f}%)")
+        for key in ("p95_ms", "completion_p95_ms"):
+            if previous.get(key) and current.get(key, 0) > previous[key] * (1 + tolerance):
+                print(f"  ❌ {endpoint} {key} regressed more than {tolerance:.0%}")
+                ok = False
+        if current.get("incomplete"):
+            print(f"  ❌ {endpoint}: {current['incomplete']} accepted messages were never answered")
+            ok = False
+    return ok
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chat server against local stubs.")
+    parser.add_argument("--requests", type=int, default=300, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--endpoints", default="test-chat,webhook", help="Comma-separated: test-chat, webhook")
+    parser.add_argument("--unique", action="store_true", help="Make every message unique (no response-cache hits)")
+    parser.add_argument("--target", help="Benchmark an already running server instead of starting one")
+    parser.add_argument("--app-port", type=int, default=9100)
+    parser.add_argument("--llm-port", type=int, default=9101)
+    parser.add_argument("--woo-port", type=int, default=9102)
+    parser.add_argument("--wati-port", type=int, default=9103)
+    parser.add_argument("--completion-timeout", type=float, default=60,
+                        help="Seconds to wait for webhook replies after the last request")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--woo-latency-ms", type=float, default=80)
+    parser.add_argument("--catalog-size", type=int, default=200)
+    parser.add_argument("--baselines", default=DEFAULT_BASELINES)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 regression for --compare")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stubs, process, workdir, tracker = [], None, None, None
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+        else:
+            tracker = ReplyTracker()
+            stubs = [StubServer(create_llm_app(args.llm_latency_ms), args.llm_port).start(),
+                     StubServer(create_woo_app(args.catalog_size, args.woo_latency_ms), args.woo_port).start(),
+                     StubServer(create_wati_app(tracker.on_message), args.wati_port).start()]
+            workdir = tempfile.mkdtemp(prefix="bench_")
+            process, base_url = start_app(args.app_port, stubs[0].url, stubs[1].url, stubs[2].url, workdir)
+
+        results = {}
+        for endpoint in [e.strip() for e in args.endpoints.split(",") if e.strip()]:
+            print(f"▶ {endpoint}: {args.requests} requests @ concurrency {args.concurrency}")
+            results[endpoint] = asyncio.run(drive(base_url, endpoint, args.requests, args.concurrency, args.unique,
+                                                  tracker, args.completion_timeout))
+            print("  " + json.dumps(results[endpoint]))
+    finally:
+        if process:
+            process.terminate()
+            process.wait(10)
+        for stub in stubs:
+            stub.stop()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    run = {"timestamp": datetime.utcnow().isoformat(timespec="seconds"), "git": git_revision(),
+           "config": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "compare", "baselines")},
+           "results": results}
+    baselines = load_baselines(args.baselines)
+
+    ok = True
+    if args.compare:
+        if args.compare not in baselines:
+            print(f"No baseline named '{args.compare}' in {args.baselines}")
+            return 1
+        print(f"Compared with baseline '{args.compare}' ({baselines[args.compare].get('git')}):")
+        ok = compare(results, baselines[args.compare], args.tolerance)
+
+    if args.save_baseline:
+        baselines[args.save_baseline] = run
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Saved baseline '{args.save_baseline}' to {args.baselines}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
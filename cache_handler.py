@@ -2,14 +2,23 @@ import json
 import hashlib
 from datetime import datetime, timedelta
 
+from metrics import RESPONSE_CACHE_REQUESTS
+
+_HITS = RESPONSE_CACHE_REQUESTS.labels("hit")
+_MISSES = RESPONSE_CACHE_REQUESTS.labels("miss")
+
 class ResponseCache:
     """
     Simple in-memory cache for AI responses to reduce OpenAI API calls.
     Cache expires after 5 minutes to keep data fresh.
+    `max_entries` bounds the cache (least recently used entries are evicted);
+    `clock` lets replay.py run it on recorded timestamps.
     """
-    def __init__(self, ttl_minutes=5):
+    def __init__(self, ttl_minutes=5, max_entries=None, clock=datetime.now):
         self.cache = {}
         self.ttl = timedelta(minutes=ttl_minutes)
+        self.max_entries = max_entries
+        self.clock = clock
     
     def _generate_key(self, message: str) -> str:
         """Generate a cache key from the user message."""
@@ -21,20 +30,29 @@ class ResponseCache:
         if key in self.cache:
             cached_data = self.cache[key]
             # Check if still valid
-            if datetime.now() < cached_data['expires']:
+            if self.clock() < cached_data['expires']:
+                _HITS.inc()
+                if self.max_entries:
+                    # Re-insert to keep dict order = recency order
+                    self.cache[key] = self.cache.pop(key)
                 return cached_data['response']
             else:
                 # Expired, remove
                 del self.cache[key]
+        _MISSES.inc()
         return None
     
     def set(self, message: str, response: str):
         """Cache a response."""
         key = self._generate_key(message)
+        self.cache.pop(key, None)
         self.cache[key] = {
             'response': response,
-            'expires': datetime.now() + self.ttl
+            'expires': self.clock() + self.ttl
         }
+        if self.max_entries:
+            while len(self.cache) > self.max_entries:
+                del self.cache[next(iter(self.cache))]
     
     def clear(self):
         """Clear all cached responses."""
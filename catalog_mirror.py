@@ -0,0 +1,234 @@
+import re
+import time
+import base64
+import hashlib
+import hmac
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _tokens(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def verify_webhook_signature(body: bytes, signature: Optional[str], secret: Optional[str]) -> bool:
+    """
+    Check WooCommerce's X-WC-Webhook-Signature header
+    (base64 HMAC-SHA256 of the raw body, keyed with the webhook secret).
+    Without a secret nothing verifies.
+    """
+    if not secret or not signature:
+        return False
+    expected = base64.b64encode(hmac.new(secret.encode(), body, hashlib.sha256).digest())
+    return hmac.compare_digest(expected, signature.encode())
+
+
+class CatalogMirror:
+    """
+    In-memory replica of the WooCommerce catalog.
+    A full paginated sync runs at startup; afterwards the mirror is kept fresh
+    by product webhooks (created/updated/deleted) and a periodic
+    `modified_after` poll that catches anything the webhooks missed.
+    Searches are answered from an inverted token index without touching the store.
+    """
+    def __init__(self, woo, poll_interval: int = 300, max_results: int = 10):
+        self.woo = woo
+        self.poll_interval = poll_interval
+        self.max_results = max_results
+
+        self.products: Dict[int, Dict[str, Any]] = {}
+        self._index: Dict[str, set] = {}      # token -> product ids
+        self._name_tokens: Dict[int, set] = {}
+        self._haystack: Dict[int, str] = {}   # lowercased searchable text, for substring fallback
+        self._sorted_ids: List[int] = []      # newest first, like the REST API default
+        self._rank: Dict[int, int] = {}
+        self._lock = threading.RLock()
+
+        self.ready = False
+        self.last_sync: Optional[str] = None
+        self.stats = {"full_syncs": 0, "polls": 0, "webhook_events": 0, "sync_errors": 0}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Index maintenance ---
+
+    def _searchable_fields(self, product: Dict[str, Any]) -> List[str]:
+        return [
+            product.get("name", ""),
+            product.get("sku", ""),
+            TAG_RE.sub(" ", product.get("short_description", "") or ""),
+            TAG_RE.sub(" ", product.get("description", "") or ""),
+            " ".join(c.get("name", "") for c in product.get("categories", [])),
+            " ".join(t.get("name", "") for t in product.get("tags", [])),
+        ]
+
+    def _unindex(self, product_id: int):
+        old = self.products.pop(product_id, None)
+        if old is None:
+            return
+        for token in set(_tokens(self._haystack.pop(product_id, ""))):
+            ids = self._index.get(token)
+            if ids:
+                ids.discard(product_id)
+                if not ids:
+                    del self._index[token]
+        self._name_tokens.pop(product_id, None)
+
+    def _index_product(self, product: Dict[str, Any]):
+        product_id = product["id"]
+        self._unindex(product_id)
+        if product.get("status", "publish") != "publish":
+            return
+        haystack = " ".join(self._searchable_fields(product)).lower()
+        self.products[product_id] = product
+        self._haystack[product_id] = haystack
+        self._name_tokens[product_id] = set(_tokens(product.get("name", "")))
+        for token in set(_tokens(haystack)):
+            self._index.setdefault(token, set()).add(product_id)
+
+    def _resort(self):
+        self._sorted_ids = sorted(
+            self.products,
+            key=lambda pid: (self.products[pid].get("date_created") or "", pid),
+            reverse=True
+        )
+        self._rank = {pid: i for i, pid in enumerate(self._sorted_ids)}
+
+    def upsert(self, product: Dict[str, Any]):
+        """Insert or replace a product (drops it if it is no longer published)."""
+        with self._lock:
+            self._index_product(product)
+            self._resort()
+
+    def remove(self, product_id: int):
+        with self._lock:
+            self._unindex(int(product_id))
+            self._resort()
+
+    # --- Queries ---
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Products matching every query token, name matches ranked first.
+        Falls back to substring matching (e.g. partial words, SKUs).
+        """
+        limit = limit or self.max_results
+        tokens = _tokens(query)
+        if not tokens:
+            return self.list_products(limit)
+
+        with self._lock:
+            candidate_sets = [self._index.get(t, set()) for t in tokens]
+            matches = set.intersection(*candidate_sets) if all(candidate_sets) else set()
+            if not matches:
+                needle = query.lower().strip()
+                matches = {pid for pid, text in self._haystack.items() if needle in text}
+
+            ranked = sorted(
+                matches,
+                key=lambda pid: (-len(self._name_tokens.get(pid, set()).intersection(tokens)), self._rank.get(pid, 0))
+            )
+            return [self.products[pid] for pid in ranked[:limit]]
+
+    def list_products(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Newest products first (same order as the REST API default)."""
+        limit = limit or self.max_results
+        with self._lock:
+            return [self.products[pid] for pid in self._sorted_ids[:limit]]
+
+    def get(self, product_id) -> Optional[Dict[str, Any]]:
+        try:
+            return self.products.get(int(product_id))
+        except (TypeError, ValueError):
+            return None
+
+    # --- Sync ---
+
+    @staticmethod
+    def _now_iso(margin_seconds: int = 60) -> str:
+        # Step back a little so edits racing with the sync are picked up by the next poll
+        return datetime.fromtimestamp(time.time() - margin_seconds, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+    def full_sync(self):
+        """Replace the mirror with a fresh paginated copy of the catalog."""
+        started = self._now_iso()
+        products = list(self.woo.iter_products())
+        with self._lock:
+            self.products.clear()
+            self._index.clear()
+            self._name_tokens.clear()
+            self._haystack.clear()
+            for product in products:
+                self._index_product(product)
+            self._resort()
+            self.last_sync = started
+            self.ready = True
+            self.stats["full_syncs"] += 1
+        logger.info(f"🗂️ Catalog mirror synced: {len(self.products)} products")
+
+    def poll_changes(self):
+        """Apply products modified since the last sync; unpublished or trashed ones are dropped."""
+        if not self.last_sync:
+            return self.full_sync()
+        started = self._now_iso()
+        changed = 0
+        # "any" excludes trashed products, so ask for those separately
+        for status in ("any", "trash"):
+            for product in self.woo.iter_products(status=status, modified_after=self.last_sync):
+                self.upsert(product)
+                changed += 1
+        self.last_sync = started
+        self.stats["polls"] += 1
+        if changed:
+            logger.info(f"🗂️ Catalog mirror applied {changed} polled changes")
+
+    def apply_webhook(self, topic: str, payload: Dict[str, Any]) -> bool:
+        """
+        Apply a WooCommerce product webhook. Returns False for topics or
+        payloads the mirror does not handle (e.g. the ping sent on webhook creation).
+        """
+        if not isinstance(payload, dict) or "id" not in payload:
+            return False
+        if topic in ("product.created", "product.updated", "product.restored"):
+            self.upsert(payload)
+        elif topic == "product.deleted":
+            self.remove(payload["id"])
+        else:
+            return False
+        self.stats["webhook_events"] += 1
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.ready:
+                    self.poll_changes()
+                else:
+                    self.full_sync()
+            except Exception as e:
+                self.stats["sync_errors"] += 1
+                logger.error(f"Catalog mirror sync failed: {e}")
+            self._stop.wait(self.poll_interval if self.ready else min(self.poll_interval, 30))
+
+    def start(self):
+        """Start the background sync thread (full sync, then periodic polls)."""
+        if self._thread or not self.woo.wcapi:
+            return
+        self._thread = threading.Thread(target=self._run, name="catalog-mirror", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, products=len(self.products), ready=self.ready, last_sync=self.last_sync)
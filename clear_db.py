@@ -1,12 +1,20 @@
 from rag import RAGHandler
 import os
 
+CRAWL_STATE_DB = "crawl_state.db"
+
 def main():
     print("Initializing RAG Handler...")
     rag = RAGHandler()
     
     print("Resetting Collection (Wiping old data)...")
     rag.reset_collection()
+
+    # Crawl state describes what is in the collection; drop it too so the next
+    # crawl re-ingests every page instead of skipping "unchanged" ones.
+    if os.path.exists(CRAWL_STATE_DB):
+        os.remove(CRAWL_STATE_DB)
+        print("Crawl state cleared.")
     
     # We will purposely NOT re-ingest the dummy products.txt file.
     # We will rely on the Crawler for fresh data or the User might run crawler.py next.
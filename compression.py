@@ -0,0 +1,58 @@
+import gzip
+import json
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+try:
+    import brotli  # Optional: smaller payloads for browsers that accept "br"
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_BYTES = 512
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """Pick br > gzip > identity from an Accept-Encoding header (honouring q=0)."""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    if brotli and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0 or accepted.get("*", 0) > 0:
+        return "gzip"
+    return "identity"
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def compressed_json(request: Request, data, status_code: int = 200) -> Response:
+    """
+    Serialize `data` as compact JSON and compress it for the client
+    (brotli if installed and accepted, else gzip). Small bodies are sent as-is.
+    """
+    body = json.dumps(jsonable_encoder(data, exclude_none=True), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    headers = {"Vary": "Accept-Encoding"}
+
+    encoding = choose_encoding(request.headers.get("accept-encoding", "")) if len(body) >= MIN_COMPRESS_BYTES else "identity"
+    if encoding != "identity":
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
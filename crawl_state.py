@@ -0,0 +1,230 @@
+import sqlite3
+import json
+import time
+from typing import Dict, List, Optional, Any
+
+
+class CrawlStateManager:
+    """
+    Persistent crawl state: one row per URL with its content hash, HTTP
+    validators, last-seen time and an adaptive revisit interval learned from
+    how often the page actually changes.
+    """
+    MIN_INTERVAL = 3600            # 1 hour
+    MAX_INTERVAL = 30 * 86400      # 30 days
+    DEFAULT_INTERVAL = 86400       # 1 day
+
+    def __init__(self, db_path="crawl_state.db"):
+        self.db_path = db_path
+        self._initialize_db()
+
+    def _initialize_db(self):
+        """Create crawl state table."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                links TEXT,
+                status TEXT DEFAULT 'active',
+                first_seen REAL,
+                last_seen REAL,
+                last_changed REAL,
+                check_count INTEGER DEFAULT 0,
+                change_count INTEGER DEFAULT 0,
+                revisit_interval REAL,
+                next_crawl_at REAL,
+                simhash TEXT,
+                duplicate_of TEXT,
+                in_sitemap INTEGER DEFAULT 0
+            )
+        """)
+        # Columns added after the first release
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(pages)")}
+        for column in ("simhash", "duplicate_of"):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE pages ADD COLUMN {column} TEXT")
+        if "in_sitemap" not in columns:
+            cursor.execute("ALTER TABLE pages ADD COLUMN in_sitemap INTEGER DEFAULT 0")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pages_next_crawl ON pages (status, next_crawl_at)")
+
+        conn.commit()
+        conn.close()
+
+    def get_page(self, url: str) -> Optional[Dict[str, Any]]:
+        """Get the stored state for a URL."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        conn.close()
+        if not row:
+            return None
+        page = dict(row)
+        page["links"] = json.loads(page["links"]) if page["links"] else []
+        return page
+
+    def known_urls(self) -> set:
+        """All URLs that have been crawled before (including removed ones)."""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT url FROM pages").fetchall()
+        conn.close()
+        return {row[0] for row in rows}
+
+    def get_index(self) -> Dict[str, Dict[str, Any]]:
+        """Lightweight {url: {status, last_seen, in_sitemap}} map for planning a recrawl."""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT url, status, last_seen, in_sitemap FROM pages").fetchall()
+        conn.close()
+        return {url: {"status": status, "last_seen": last_seen, "in_sitemap": bool(in_sitemap)}
+                for url, status, last_seen, in_sitemap in rows}
+
+    def set_sitemap_urls(self, urls):
+        """Remember which tracked pages the current sitemap lists."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE pages SET in_sitemap = 0 WHERE in_sitemap = 1")
+        conn.executemany("UPDATE pages SET in_sitemap = 1 WHERE url = ?", [(url,) for url in urls])
+        conn.commit()
+        conn.close()
+
+    def get_fingerprints(self) -> List[tuple]:
+        """(url, simhash) of active, non-duplicate pages, to seed the near-duplicate index."""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(
+            "SELECT url, simhash FROM pages WHERE status = 'active' AND simhash IS NOT NULL AND duplicate_of IS NULL"
+        ).fetchall()
+        conn.close()
+        return [(url, int(fingerprint, 16)) for url, fingerprint in rows]
+
+    def due_urls(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[str]:
+        """Active URLs whose revisit time has passed, most overdue first."""
+        now = now or time.time()
+        query = "SELECT url FROM pages WHERE status = 'active' AND next_crawl_at <= ? ORDER BY next_crawl_at"
+        params = [now]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def mark_due(self, urls: List[str]):
+        """Force URLs to be revisited on the next run (e.g. sitemap lastmod moved)."""
+        if not urls:
+            return
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "UPDATE pages SET next_crawl_at = 0 WHERE url = ? AND status = 'active'",
+            [(url,) for url in urls]
+        )
+        conn.commit()
+        conn.close()
+
+    def record_fetch(self, url: str, content_hash: Optional[str], etag: Optional[str] = None,
+                     last_modified: Optional[str] = None, links: Optional[List[str]] = None,
+                     fingerprint: Optional[int] = None, duplicate_of: Optional[str] = None) -> bool:
+        """
+        Record a successful fetch. `content_hash` of None means the server
+        answered 304 Not Modified. Returns True if the content changed (or is new),
+        or if the page was a near-duplicate before and no longer is (it was
+        never ingested, so it has to be now).
+        `fingerprint` is the page's SimHash; `duplicate_of` names the page it
+        near-duplicates, if any.
+        The revisit interval halves on change and grows 1.5x when unchanged.
+        """
+        now = time.time()
+        page = self.get_page(url)
+        in_sitemap = page["in_sitemap"] if page else 0
+
+        if page is None:
+            changed = True
+            interval = self.DEFAULT_INTERVAL
+            first_seen, check_count, change_count, last_changed = now, 0, 0, now
+        else:
+            changed = content_hash is not None and (
+                content_hash != page["content_hash"] or (page["duplicate_of"] is not None and duplicate_of is None)
+            )
+            interval = page["revisit_interval"] or self.DEFAULT_INTERVAL
+            interval = interval / 2 if changed else interval * 1.5
+            first_seen = page["first_seen"]
+            check_count = page["check_count"]
+            change_count = page["change_count"]
+            last_changed = now if changed else page["last_changed"]
+            if content_hash is None:
+                content_hash = page["content_hash"]
+            etag = etag or page["etag"]
+            last_modified = last_modified or page["last_modified"]
+            if links is None:
+                links = page["links"]
+            if content_hash == page["content_hash"]:
+                # 304 / unchanged: keep the previous fingerprint and duplicate status
+                if fingerprint is None and page["simhash"]:
+                    fingerprint = int(page["simhash"], 16)
+                    duplicate_of = page["duplicate_of"]
+
+        interval = min(max(interval, self.MIN_INTERVAL), self.MAX_INTERVAL)
+
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            INSERT OR REPLACE INTO pages
+                (url, content_hash, etag, last_modified, links, status, first_seen, last_seen,
+                 last_changed, check_count, change_count, revisit_interval, next_crawl_at,
+                 simhash, duplicate_of, in_sitemap)
+            VALUES (?, ?, ?, ?, ?, 'active', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            url, content_hash, etag, last_modified, json.dumps(links or []), first_seen, now,
+            last_changed, check_count + 1, change_count + (1 if changed else 0), interval, now + interval,
+            f"{fingerprint:016x}" if fingerprint is not None else None, duplicate_of, in_sitemap
+        ))
+        conn.commit()
+        conn.close()
+        return changed
+
+    def forget_content(self, urls: List[str]):
+        """
+        Drop the stored content hash and validators of pages whose ingestion
+        failed, so the next crawl fetches them in full and ingests them again.
+        """
+        if not urls:
+            return
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "UPDATE pages SET content_hash = NULL, etag = NULL, last_modified = NULL, next_crawl_at = 0 "
+            "WHERE url = ?",
+            [(url,) for url in urls]
+        )
+        conn.commit()
+        conn.close()
+
+    def mark_removed(self, url: str) -> bool:
+        """Mark a URL as gone (404/410). Returns True if it was previously active."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.execute(
+            "UPDATE pages SET status = 'removed', content_hash = NULL, next_crawl_at = NULL "
+            "WHERE url = ? AND status = 'active'",
+            (url,)
+        )
+        conn.commit()
+        removed = cursor.rowcount > 0
+        conn.close()
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Summary of tracked pages."""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT status, COUNT(*) FROM pages GROUP BY status").fetchall()
+        due = conn.execute(
+            "SELECT COUNT(*) FROM pages WHERE status = 'active' AND next_crawl_at <= ?", (time.time(),)
+        ).fetchone()[0]
+        duplicates = conn.execute(
+            "SELECT COUNT(*) FROM pages WHERE status = 'active' AND duplicate_of IS NOT NULL"
+        ).fetchone()[0]
+        conn.close()
+        stats = {status: count for status, count in rows}
+        stats["due"] = due
+        stats["duplicates"] = duplicates
+        return stats
@@ -1,85 +1,333 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+import os
 import time
+import hashlib
+import asyncio
+import argparse
+from collections import deque
+from urllib.parse import urljoin, urlparse
+
+import httpx
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+
 from rag import RAGHandler
+from ingest_pipeline import IngestionPipeline
+from crawl_state import CrawlStateManager
+from dedup import NearDuplicateIndex, canonicalize_url, simhash
 
-# Configuration
-START_URL = "https://yourwebsite.com"
-MAX_PAGES = 50  # Limit to 50 pages for this initial run to be fast
-DELAY = 1  # Seconds between requests
+load_dotenv()
 
-# Initialize State
-visited_urls = set()
-queue = [START_URL]
-rag = RAGHandler()
+# Defaults (override via CLI flags or CRAWL_* environment variables)
+DEFAULT_START_URL = os.getenv("CRAWL_START_URL", "https://yourwebsite.com")
+DEFAULT_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "50"))
+DEFAULT_DELAY = float(os.getenv("CRAWL_DELAY", "1"))  # Min seconds between requests to the same host
+DEFAULT_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "8"))
+DEFAULT_PER_HOST = int(os.getenv("CRAWL_PER_HOST", "2"))
+DEFAULT_STATE_DB = os.getenv("CRAWL_STATE_DB", "crawl_state.db")
+DEFAULT_DUP_DISTANCE = int(os.getenv("CRAWL_DUP_DISTANCE", "3"))  # Max SimHash bit distance for near-duplicates (-1 disables)
 
-def is_valid_url(url):
-    parsed = urlparse(url)
-    return bool(parsed.netloc) and bool(parsed.scheme) and "yourwebsite.com" in parsed.netloc
+USER_AGENT = "RZBBot/1.0"
+
+
+def clean_text(page):
+    """
+    Extract readable text and title from HTML.
+    `page` may be raw HTML or an already-parsed BeautifulSoup document
+    (which is modified in place).
+    """
+    soup = page if isinstance(page, BeautifulSoup) else BeautifulSoup(page, 'html.parser')
+    title = soup.title.string if soup.title and soup.title.string else "No Title"
 
-def clean_text(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
     # Remove script and style elements
     for script in soup(["script", "style", "nav", "footer", "header"]):
         script.extract()
-        
+
     text = soup.get_text(separator='\n')
-    
+
     # Break into lines and remove leading and trailing space on each
     lines = (line.strip() for line in text.splitlines())
     # Break multi-headlines into a line each
     chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
     # Drop blank lines
     text = '\n'.join(chunk for chunk in chunks if chunk)
-    return text, soup.title.string if soup.title else "No Title"
-
-def crawl():
-    count = 0
-    while queue and count < MAX_PAGES:
-        current_url = queue.pop(0)
-        
-        if current_url in visited_urls:
-            continue
-            
-        print(f"Crawling ({count+1}/{MAX_PAGES}): {current_url}")
-        visited_urls.add(current_url)
-        
-        try:
-            response = requests.get(current_url, headers={"User-Agent": "RZBBot/1.0"}, timeout=10)
-            if response.status_code != 200:
-                print(f"Failed to fetch {current_url}: {response.status_code}")
-                continue
-                
-            # Content Type Check
-            if "text/html" not in response.headers.get("Content-Type", ""):
-                print(f"Skipping non-HTML: {current_url}")
+    return text, title
+
+
+def parse_page(html_content, base_url):
+    """
+    Parse a page once: collect outgoing links, then extract the cleaned text.
+    Returns (text, title, links).
+    """
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # Links first - clean_text strips nav/footer, which hold most internal links
+    links = []
+    for link in soup.find_all('a', href=True):
+        # Normalize: fragments, sorting/tracking params, trailing slash
+        links.append(canonicalize_url(urljoin(base_url, link['href'])))
+
+    text, title = clean_text(soup)
+    return text, title, links
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def chunk_id_prefix(url):
+    """Stable chunk-id prefix per URL so re-ingestion overwrites in place."""
+    return "page_" + hashlib.md5(url.encode('utf-8')).hexdigest()
+
+
+class Crawler:
+    """
+    Async site crawler.
+    - Frontier is a deque plus a `seen` set (O(1) push/pop/membership).
+    - Per-host concurrency cap and minimum delay between requests to a host.
+    - One pooled keep-alive HTTP client for all requests.
+    - With a CrawlStateManager, ETag / Last-Modified validators and content
+      hashes are persisted: recrawls send conditional GETs, unchanged pages
+      are not re-embedded, and chunks of changed or removed pages are
+      invalidated in the collection.
+    - URLs are canonicalized and pages whose cleaned text is a near-duplicate
+      (SimHash within `dedup.max_distance` bits) of an already-ingested page
+      are skipped, so archive/sort/variation copies don't bloat the index.
+    - `seeds` replaces the start URL as the initial frontier; with
+      `skip_known`, links to already-tracked pages are not followed (the
+      recrawl scheduler decides when those are due).
+    """
+    def __init__(self, start_url=DEFAULT_START_URL, max_pages=DEFAULT_MAX_PAGES, delay=DEFAULT_DELAY,
+                 concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, state=None,
+                 pipeline=None, seeds=None, skip_known=False, dedup=None):
+        start_url = canonicalize_url(start_url)
+        self.start_url = start_url
+        self.max_pages = max_pages
+        self.delay = delay
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.state = state
+        self.pipeline = pipeline
+        self.dedup = dedup
+        self.allowed_host = urlparse(start_url).netloc
+
+        if dedup and state:
+            for url, fingerprint in state.get_fingerprints():
+                dedup.add(fingerprint, url)
+
+        seeds = [canonicalize_url(url) for url in seeds] if seeds is not None else [start_url]
+        self.frontier = deque(seeds)
+        self.seen = set(seeds)
+        if skip_known and state:
+            self.seen |= state.known_urls()
+        self.count = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        self.changed = 0
+        self.removed = 0
+        self.duplicates = 0
+        self._active = 0
+
+        self._host_slots = {}
+        self._host_next_at = {}
+        self._host_locks = {}
+        self._ingest_lock = asyncio.Lock()
+
+    def is_valid_url(self, url):
+        parsed = urlparse(url)
+        return bool(parsed.netloc) and parsed.scheme in ("http", "https") and parsed.netloc == self.allowed_host
+
+    def enqueue(self, url):
+        url = canonicalize_url(url)
+        if url not in self.seen and self.is_valid_url(url):
+            self.seen.add(url)
+            self.frontier.append(url)
+
+    async def _wait_for_host(self, host):
+        """Enforce the per-host politeness delay."""
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            next_at = self._host_next_at.get(host, now)
+            if next_at > now:
+                await asyncio.sleep(next_at - now)
+            self._host_next_at[host] = time.monotonic() + self.delay
+
+    async def fetch(self, client, url):
+        host = urlparse(url).netloc
+        slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+        headers = {}
+        cached = (self.state.get_page(url) if self.state else None) or {}
+        if cached.get("duplicate_of"):
+            # Near-duplicates are fetched in full so a 304 can't keep a stale
+            # duplicate status after the original changed or disappeared
+            cached = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        async with slots:
+            await self._wait_for_host(host)
+            return await client.get(url, headers=headers)
+
+    async def process(self, client, url):
+        response = await self.fetch(client, url)
+
+        if response.status_code == 304:
+            self.not_modified += 1
+            print(f"Not modified: {url}")
+            if self.state:
+                self.state.record_fetch(url, None)
+                # No body to parse; follow the links seen last time
+                for link in self.state.get_page(url)["links"]:
+                    self.enqueue(link)
+            return
+        if response.status_code in (404, 410):
+            print(f"Gone ({response.status_code}): {url}")
+            if self.dedup:
+                self.dedup.remove(url)
+            if self.state and self.state.mark_removed(url):
+                self.removed += 1
+                await self._invalidate(url)
+            return
+        if response.status_code != 200:
+            print(f"Failed to fetch {url}: {response.status_code}")
+            return
+
+        # Content Type Check
+        if "text/html" not in response.headers.get("Content-Type", ""):
+            print(f"Skipping non-HTML: {url}")
+            return
+
+        if self.count >= self.max_pages:
+            return
+        self.count += 1
+        print(f"Crawled ({self.count}/{self.max_pages}): {url}")
+
+        content, title, links = parse_page(response.content, str(response.url))
+        for link in links:
+            self.enqueue(link)
+
+        fingerprint = simhash(content)
+        duplicate_of = None
+        if self.dedup and content:
+            duplicate_of = (self.dedup.find(fingerprint, exclude=url) if self.state
+                            else self.dedup.check_and_add(fingerprint, url))
+
+        if self.state:
+            changed = self.state.record_fetch(
+                url,
+                content_hash(content),
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                links=sorted({link for link in links if self.is_valid_url(link)}),
+                fingerprint=fingerprint,
+                duplicate_of=duplicate_of
+            )
+            if self.dedup:
+                # Keep the index in step with what is stored for this URL
+                if duplicate_of or not content:
+                    self.dedup.remove(url)
+                elif changed:
+                    self.dedup.replace(url, fingerprint)
+            if duplicate_of:
+                self.duplicates += 1
+                print(f"Near-duplicate of {duplicate_of}: {url}")
+                if changed:
+                    # May have been ingested before it became a copy
+                    await self._invalidate(url)
+                return
+            if not changed:
+                self.unchanged += 1
+                return
+            # Drop the previous version's chunks before ingesting the new one
+            await self._invalidate(url)
+        elif duplicate_of:
+            self.duplicates += 1
+            print(f"Near-duplicate of {duplicate_of}: {url}")
+            return
+        self.changed += 1
+
+        if self.pipeline and content:
+            # pipeline.add may block for backpressure; keep it off the event loop
+            async with self._ingest_lock:
+                await asyncio.to_thread(
+                    self.pipeline.add, content, {"source": url, "title": title}, chunk_id_prefix(url)
+                )
+
+    async def _invalidate(self, url):
+        """Remove a page's chunks from the collection."""
+        if self.pipeline:
+            await asyncio.to_thread(self.pipeline.rag.delete_source, url)
+
+    async def worker(self, client):
+        while self.count < self.max_pages:
+            if not self.frontier:
+                if self._active == 0:
+                    return
+                await asyncio.sleep(0.05)
                 continue
 
-            content, title = clean_text(response.content)
-            
-            # Ingest into RAG
-            rag.ingest_text(content, {"source": current_url, "title": title})
-            
-            # Find new links
-            soup = BeautifulSoup(response.content, 'html.parser')
-            for link in soup.find_all('a'):
-                href = link.get('href')
-                if href:
-                    full_url = urljoin(current_url, href)
-                    # Normalize: remove fragments
-                    full_url = full_url.split('#')[0]
-                    if is_valid_url(full_url) and full_url not in visited_urls and full_url not in queue:
-                        queue.append(full_url)
-            
-            count += 1
-            time.sleep(DELAY)
-            
-        except Exception as e:
-            print(f"Error crawling {current_url}: {e}")
+            url = self.frontier.popleft()
+            self._active += 1
+            try:
+                await self.process(client, url)
+            except Exception as e:
+                print(f"Error crawling {url}: {e}")
+            finally:
+                self._active -= 1
+
+    async def run(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        timeout = httpx.Timeout(10.0, connect=5.0)
+        async with httpx.AsyncClient(headers={"User-Agent": USER_AGENT}, limits=limits,
+                                     timeout=timeout, follow_redirects=True) as client:
+            await asyncio.gather(*(self.worker(client) for _ in range(self.concurrency)))
+        return self.count
+
+
+def crawl(start_url=DEFAULT_START_URL, max_pages=DEFAULT_MAX_PAGES, delay=DEFAULT_DELAY,
+          concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, state_db=DEFAULT_STATE_DB,
+          seeds=None, skip_known=False, dup_distance=DEFAULT_DUP_DISTANCE):
+    rag = RAGHandler()
+    state = CrawlStateManager(state_db) if state_db else None
+    dedup = NearDuplicateIndex(max_distance=dup_distance) if dup_distance >= 0 else None
+    # Pages are embedded in batches on a worker pool while crawling continues.
+    # Their content hash is recorded before the batch is written, so pages in a
+    # failed batch are forgotten and ingested again on the next crawl.
+    on_error = (lambda metadatas: state.forget_content(sorted({m["source"] for m in metadatas}))) if state else None
+    pipeline = IngestionPipeline(rag, on_error=on_error)
+    crawler = Crawler(start_url, max_pages, delay, concurrency, per_host, state=state,
+                      pipeline=pipeline, seeds=seeds, skip_known=skip_known, dedup=dedup)
+    try:
+        asyncio.run(crawler.run())
+    finally:
+        stats = pipeline.close()
+    print(
+        f"Crawled {crawler.count} pages: {crawler.changed} new/changed, {crawler.unchanged} unchanged, "
+        f"{crawler.not_modified} not modified, {crawler.removed} removed, "
+        f"{crawler.duplicates} near-duplicates skipped"
+    )
+    print(f"Ingested {stats['chunks']} chunks from {stats['documents']} pages in {stats['elapsed_s']}s ({stats['errors']} failed batches)")
+    return crawler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl a website into the RAG knowledge base.")
+    parser.add_argument("--start-url", default=DEFAULT_START_URL)
+    parser.add_argument("--max-pages", type=int, default=DEFAULT_MAX_PAGES)
+    parser.add_argument("--delay", type=float, default=DEFAULT_DELAY, help="Min seconds between requests to one host")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Total concurrent fetches")
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST, help="Concurrent fetches per host")
+    parser.add_argument("--state-db", default=DEFAULT_STATE_DB, help="Crawl state database (empty to disable)")
+    parser.add_argument("--dup-distance", type=int, default=DEFAULT_DUP_DISTANCE,
+                        help="Max SimHash bit distance treated as a near-duplicate (-1 disables)")
+    return parser.parse_args(argv)
+
 
 if __name__ == "__main__":
-    print(f"Starting crawl of {START_URL}...")
-    crawl()
+    args = parse_args()
+    print(f"Starting crawl of {args.start_url}...")
+    crawl(args.start_url, args.max_pages, args.delay, args.concurrency, args.per_host, args.state_db,
+          dup_distance=args.dup_distance)
     print("Crawl complete. Data ingested into ChromaDB.")
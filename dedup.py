@@ -0,0 +1,138 @@
+import re
+import hashlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that never change page content (tracking, sorting, cart actions)
+IGNORED_PARAMS = {
+    "orderby", "order", "per_page", "add-to-cart", "added-to-cart", "replytocom",
+    "fbclid", "gclid", "msclkid", "_wpnonce", "share", "view", "ref",
+    "min_price", "max_price", "rating_filter", "product_view",
+}
+# Prefixes: utm_* tracking, WooCommerce layered-nav filters and variation attributes
+IGNORED_PARAM_PREFIXES = ("utm_", "filter_", "query_type_", "attribute_")
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def canonicalize_url(url):
+    """
+    Normalize a URL so WooCommerce variants of one page collapse to one key:
+    lowercase scheme/host, no fragment, no default port, ignored query params
+    dropped, remaining params sorted, and a consistent trailing slash.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = parts.hostname.lower() if parts.hostname else ""
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    # WordPress permalinks end in "/"; treat "/shop" and "/shop/" as one page
+    last_segment = path.rsplit("/", 1)[-1]
+    if not path.endswith("/") and "." not in last_segment:
+        path += "/"
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in IGNORED_PARAMS and not key.lower().startswith(IGNORED_PARAM_PREFIXES)
+    ]
+    query.sort()
+
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def _hash64(token):
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text, shingle_size=3):
+    """
+    64-bit SimHash of word shingles. Near-identical texts get fingerprints
+    that differ in only a few bits.
+    """
+    words = WORD_RE.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = {" ".join(words)} if words else set()
+    else:
+        shingles = {" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)}
+    if not shingles:
+        return 0
+
+    hashes = [_hash64(s) for s in shingles]
+    half = len(hashes) / 2
+    fingerprint = 0
+    for bit in range(64):
+        if sum((h >> bit) & 1 for h in hashes) > half:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over 64-bit SimHash fingerprints, one per key (page URL).
+    The fingerprint is split into `bands` bands; any two fingerprints within
+    `max_distance` bits (max_distance < bands) share at least one band, so a
+    lookup only compares against candidates from the same buckets.
+    """
+    def __init__(self, max_distance=3, bands=4):
+        if max_distance >= bands:
+            raise ValueError("max_distance must be smaller than the number of bands")
+        self.max_distance = max_distance
+        self.bands = bands
+        self.band_bits = 64 // bands
+        self._mask = (1 << self.band_bits) - 1
+        self._buckets = {}
+        self._fingerprints = {}
+
+    @property
+    def size(self):
+        return len(self._fingerprints)
+
+    def _band_keys(self, fingerprint):
+        return [(i, (fingerprint >> (i * self.band_bits)) & self._mask) for i in range(self.bands)]
+
+    def find(self, fingerprint, exclude=None):
+        """Return the key of a stored near-duplicate other than `exclude`, or None."""
+        for band_key in self._band_keys(fingerprint):
+            for key, other in self._buckets.get(band_key, {}).items():
+                if key != exclude and hamming_distance(fingerprint, other) <= self.max_distance:
+                    return key
+        return None
+
+    def add(self, fingerprint, key):
+        """Index `fingerprint` under `key`, replacing the key's previous fingerprint."""
+        self.remove(key)
+        self._fingerprints[key] = fingerprint
+        for band_key in self._band_keys(fingerprint):
+            self._buckets.setdefault(band_key, {})[key] = fingerprint
+
+    def replace(self, key, fingerprint):
+        """Swap the fingerprint stored for `key` (e.g. after its content changed)."""
+        self.add(fingerprint, key)
+
+    def remove(self, key):
+        fingerprint = self._fingerprints.pop(key, None)
+        if fingerprint is None:
+            return
+        for band_key in self._band_keys(fingerprint):
+            bucket = self._buckets[band_key]
+            del bucket[key]
+            if not bucket:
+                del self._buckets[band_key]
+
+    def check_and_add(self, fingerprint, key):
+        """
+        Look up a fingerprint; if no other key is a near-duplicate, index it
+        under `key`, otherwise drop any fingerprint `key` had (a copy is not
+        an original). Returns the key of the existing near-duplicate, or None.
+        """
+        original = self.find(fingerprint, exclude=key)
+        if original is None:
+            self.add(fingerprint, key)
+        else:
+            self.remove(key)
+        return original
@@ -1,4 +1,5 @@
 from rag import RAGHandler
+from ingest_pipeline import IngestionPipeline
 import os
 
 def main():
@@ -9,11 +10,13 @@ def main():
     faqs_path = os.path.join(base_path, "data", "faqs.txt")
     products_path = os.path.join(base_path, "data", "products.txt")
     
-    print(f"Ingesting FAQs from {faqs_path}...")
-    rag.ingest_data(faqs_path, "faq")
-    
-    print(f"Ingesting Products from {products_path}...")
-    rag.ingest_data(products_path, "product")
+    # Both files share one pipeline so their batches embed concurrently
+    with IngestionPipeline(rag) as pipeline:
+        print(f"Ingesting FAQs from {faqs_path}...")
+        pipeline.add_file(faqs_path, "faq")
+
+        print(f"Ingesting Products from {products_path}...")
+        pipeline.add_file(products_path, "product")
     
     print("Done!")
 
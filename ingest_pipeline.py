@@ -0,0 +1,159 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def iter_paragraphs(lines):
+    """
+    Lazily split an iterable of lines into paragraph chunks (blocks separated
+    by blank lines), without holding the whole source in memory.
+    """
+    block = []
+    for line in lines:
+        if line.strip():
+            block.append(line.rstrip('\n'))
+        elif block:
+            yield '\n'.join(block).strip()
+            block = []
+    if block:
+        yield '\n'.join(block).strip()
+
+
+def iter_file_paragraphs(file_path):
+    """Stream paragraph chunks from a text file."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        yield from iter_paragraphs(f)
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion into the RAG collection.
+    Chunks are buffered into fixed-size batches, embedded on a worker pool and
+    upserted to Chroma in bulk. At most `max_pending` batches are in flight, so
+    producers (file readers, the crawler) block instead of buffering a whole site.
+    `on_error(metadatas)` is called with the metadata of every chunk in a
+    batch that failed to embed or upsert.
+    """
+    def __init__(self, rag, batch_size=64, workers=4, max_pending=8, report_every=10, on_error=None):
+        self.rag = rag
+        self.on_error = on_error
+        self.batch_size = batch_size
+        self.report_every = report_every
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._upsert_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._futures = []
+
+        self._docs = []
+        self._ids = []
+        self._metadatas = []
+
+        self.stats = {"documents": 0, "chunks": 0, "batches": 0, "errors": 0}
+        self._started = time.time()
+
+    def add(self, text, metadata, id_prefix=None):
+        """
+        Queue a document for ingestion. The text is split into paragraph chunks.
+        With `id_prefix`, chunk ids are `{id_prefix}_{i}` so re-ingesting the
+        same document overwrites its chunks instead of duplicating them.
+        """
+        chunks = [c.strip() for c in text.split('\n\n') if c.strip()]
+        if not chunks:
+            return
+        if id_prefix is None:
+            ids = [str(uuid.uuid4()) for _ in chunks]
+        else:
+            ids = [f"{id_prefix}_{i}" for i in range(len(chunks))]
+        self.add_chunks(chunks, ids, [metadata for _ in chunks])
+        with self._stats_lock:
+            self.stats["documents"] += 1
+
+    def add_chunks(self, chunks, ids, metadatas):
+        """Queue pre-split chunks with their ids and metadata."""
+        for chunk, chunk_id, metadata in zip(chunks, ids, metadatas):
+            self._docs.append(chunk)
+            self._ids.append(chunk_id)
+            self._metadatas.append(metadata)
+            if len(self._docs) >= self.batch_size:
+                self._submit()
+
+    def add_file(self, file_path, tag):
+        """Stream a paragraph-separated text file into the collection."""
+        if not os.path.exists(file_path):
+            print(f"File not found: {file_path}")
+            return
+        batch, ids = [], []
+        for i, chunk in enumerate(iter_file_paragraphs(file_path)):
+            batch.append(chunk)
+            ids.append(f"{tag}_{i}")
+            if len(batch) >= self.batch_size:
+                self.add_chunks(batch, ids, [{"source": tag} for _ in batch])
+                batch, ids = [], []
+        if batch:
+            self.add_chunks(batch, ids, [{"source": tag} for _ in batch])
+        with self._stats_lock:
+            self.stats["documents"] += 1
+
+    def _submit(self):
+        if not self._docs:
+            return
+        docs, ids, metadatas = self._docs, self._ids, self._metadatas
+        self._docs, self._ids, self._metadatas = [], [], []
+
+        # Backpressure: block the producer until a batch slot frees up
+        self._slots.acquire()
+        future = self._executor.submit(self._process_batch, docs, ids, metadatas)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures = [f for f in self._futures if not f.done()]
+        self._futures.append(future)
+
+    def _process_batch(self, docs, ids, metadatas):
+        try:
+            embeddings = self.rag.embed(docs)
+            with self._upsert_lock:
+                self.rag.upsert_chunks(docs, ids, metadatas, embeddings=embeddings)
+        except Exception as e:
+            print(f"Error ingesting batch of {len(docs)} chunks: {e}")
+            with self._stats_lock:
+                self.stats["errors"] += 1
+            if self.on_error:
+                self.on_error(metadatas)
+            return
+
+        with self._stats_lock:
+            self.stats["chunks"] += len(docs)
+            self.stats["batches"] += 1
+            batches = self.stats["batches"]
+        if self.report_every and batches % self.report_every == 0:
+            self.report()
+
+    def report(self):
+        """Print progress and throughput so far."""
+        elapsed = max(time.time() - self._started, 1e-6)
+        with self._stats_lock:
+            stats = dict(self.stats)
+        print(
+            f"Ingest: {stats['documents']} docs, {stats['chunks']} chunks in "
+            f"{stats['batches']} batches, {stats['errors']} errors, "
+            f"{stats['chunks'] / elapsed:.1f} chunks/s"
+        )
+
+    def close(self):
+        """Flush the last partial batch, wait for workers and return stats."""
+        self._submit()
+        for future in list(self._futures):
+            future.result()
+        self._executor.shutdown(wait=True)
+        elapsed = time.time() - self._started
+        self.report()
+        with self._stats_lock:
+            return dict(self.stats, elapsed_s=round(elapsed, 2))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
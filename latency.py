@@ -0,0 +1,59 @@
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Tuple
+
+# Log-scale latency buckets: each bucket is 10% wider than the previous one,
+# so any percentile read back from the histogram is within ~10% of the real
+# value while a (stage, platform) series needs at most ~130 counters.
+BUCKET_GROWTH = 1.1
+MAX_BUCKET = 133  # ~5 minutes
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+
+def bucket_for(duration_ms: float) -> int:
+    """Histogram bucket index for a duration in milliseconds."""
+    if duration_ms < 1:
+        return 0
+    return min(int(math.log(duration_ms) / _LOG_GROWTH) + 1, MAX_BUCKET)
+
+
+def bucket_upper_ms(bucket: int) -> float:
+    """Upper bound (ms) of a bucket; reported as the percentile value."""
+    return BUCKET_GROWTH ** bucket
+
+
+def percentiles(buckets: Iterable[Tuple[int, int]], quantiles=(0.5, 0.95, 0.99)) -> Dict[str, float]:
+    """p50/p95/p99 (ms) from (bucket, count) pairs, plus the sample count."""
+    counts = sorted(buckets)
+    total = sum(count for _, count in counts)
+    result = {"count": total}
+    for q in quantiles:
+        key = f"p{int(round(q * 100))}"
+        if not total:
+            result[key] = 0
+            continue
+        rank, seen = q * total, 0
+        for bucket, count in counts:
+            seen += count
+            if seen >= rank:
+                result[key] = round(bucket_upper_ms(bucket), 1)
+                break
+    return result
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list of raw samples (0 if empty)."""
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+@contextmanager
+def span(record: Callable[[str, str, float], None], stage: str, platform: str):
+    """Time the enclosed block and report it as `record(stage, platform, ms)`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, platform, (time.perf_counter() - start) * 1000)
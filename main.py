@@ -1,7 +1,10 @@
 import os
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, Request, BackgroundTasks
-from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
@@ -17,8 +20,21 @@ from prompts import SYSTEM_PROMPT
 from cache_handler import ResponseCache
 from settings_manager import SettingsManager
 from analytics_manager import AnalyticsManager
+from analytics_retention import RetentionJob
 from cart_manager import CartManager
 from memory_manager import MemoryManager
+from catalog_mirror import CatalogMirror, verify_webhook_signature
+from product_cache import ProductCache
+from order_cache import OrderStatusCache
+from render_cache import ProductRenderCache, PLACEHOLDER_IMAGE
+from compression import compressed_json
+from schemas import BotResponse
+from static_assets import AssetRegistry, IMMUTABLE_CACHE
+from admission import AdmissionController, Waiter
+from profiler import RequestProfiler, PROFILE_HEADER, to_collapsed, to_speedscope
+from latency import span
+from metrics import (REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, LLM_REQUEST_SECONDS, LLM_TOKENS,
+                     LLM_ERRORS, HTTP_IN_FLIGHT, BACKGROUND_TASKS_PENDING)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -42,27 +58,171 @@ rag = RAGHandler()
 woo = WooCommerceHandler()
 settings_manager = SettingsManager()
 analytics = AnalyticsManager()
+# Daily archive/prune of raw analytics rows older than ANALYTICS_RETENTION_DAYS (0 disables)
+analytics_retention = RetentionJob(analytics.db_path)
 cart_manager = CartManager()
 memory = MemoryManager()
+# Local replica of the store catalog (full sync at startup, then webhooks + polling)
+catalog = CatalogMirror(woo, poll_interval=int(os.getenv("CATALOG_POLL_SECONDS", "300")))
+WOO_WEBHOOK_SECRET = os.getenv("WOO_WEBHOOK_SECRET")
+# Local testing only: accept unsigned WooCommerce webhooks when no secret is set
+WOO_WEBHOOK_ALLOW_UNSIGNED = os.getenv("WOO_WEBHOOK_ALLOW_UNSIGNED", "").lower() in ("1", "true", "yes")
+# Product-by-ID cache for cart adds (concurrent misses share one include= request)
+product_cache = ProductCache(woo)
+# Repeat "where is my order" lookups are served from here; order webhooks keep it fresh
+order_cache = OrderStatusCache(woo, ttl_seconds=int(os.getenv("ORDER_CACHE_TTL_SECONDS", "60")))
+# LLM text and widget card per product version, rendered once
+render_cache = ProductRenderCache(woo)
+# Caps concurrent replies (globally and per session) with a bounded, deadline-aware queue
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "8")),
+    max_per_session=int(os.getenv("ADMISSION_MAX_PER_SESSION", "1")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "50"))
+)
+WEB_QUEUE_TIMEOUT = float(os.getenv("WEB_QUEUE_TIMEOUT_SECONDS", "15"))
+WHATSAPP_QUEUE_TIMEOUT = float(os.getenv("WHATSAPP_QUEUE_TIMEOUT_SECONDS", "120"))
+# Queued WhatsApp messages are answered here once admitted
+queued_replies = ThreadPoolExecutor(max_workers=admission.max_concurrent, thread_name_prefix="queued-reply")
+WEB_BUSY_MESSAGE = "We're getting a lot of messages right now. Please try again in a few seconds."
+WHATSAPP_QUEUED_MESSAGE = "⏳ We're getting a lot of messages right now. You're in the queue and we'll reply shortly."
+WHATSAPP_REJECTED_MESSAGE = "⏳ We're very busy right now and couldn't take your message. Please send it again in a few minutes."
+WHATSAPP_DROPPED_MESSAGE = "🙏 Sorry, we couldn't get to your message in time. Please send it again."
+
+# Values that are already counted elsewhere are read when /metrics is scraped
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+REGISTRY.callback("chatbot_sessions", "In-memory sessions by store.", ["store"],
+                  lambda: [(("cart",), len(cart_manager.carts)), (("memory",), len(memory.history))])
+REGISTRY.callback("chatbot_analytics_queue_depth", "Analytics events waiting for the background writer.", [],
+                  lambda: [((), analytics.get_writer_stats()["queued"])])
+REGISTRY.callback("chatbot_analytics_events_dropped_total", "Analytics events dropped because the queue was full.", [],
+                  lambda: [((), analytics.get_writer_stats()["dropped"])], kind="counter")
+REGISTRY.callback("chatbot_cache_events_total", "Product, order and render cache counters.", ["cache", "event"],
+                  lambda: [((name, event), value)
+                           for name, stats in (("product", product_cache.stats), ("order", order_cache.stats),
+                                               ("render", render_cache.stats))
+                           for event, value in list(stats.items())], kind="counter")
+REGISTRY.callback("chatbot_catalog_products", "Products in the local catalog mirror.", [],
+                  lambda: [((), catalog.get_stats().get("products", 0))])
+REGISTRY.callback("chatbot_admission_requests_total", "Chat requests by admission outcome.", ["outcome"],
+                  lambda: [((outcome,), value) for outcome, value in list(admission.stats.items())], kind="counter")
+REGISTRY.callback("chatbot_admission_slots", "Chat replies running and waiting for a slot.", ["state"],
+                  lambda: [(("active",), admission.active), (("queued",), admission.get_stats()["queue_depth"])])
+REGISTRY.callback("chatbot_woo_circuit_state", "WooCommerce circuit breaker (0 closed, 1 half-open, 2 open).", [],
+                  lambda: [((), BREAKER_STATES.get(woo.wcapi.breaker.state, 0))] if woo.wcapi else [])
+
+# On-demand request profiling (off unless PROFILE_TOKEN is set)
+profiler = RequestProfiler()
+
+# Widget JS and admin UI, loaded and precompressed once
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+assets = AssetRegistry()
+assets.load("chat-widget.js", os.path.join(BASE_DIR, "widget", "chat-widget.js"), "application/javascript")
+assets.load("dashboard.html", os.path.join(BASE_DIR, "admin", "dashboard.html"), "text/html; charset=utf-8")
 
 # Initialize Groq client (OpenAI-compatible)
 client = OpenAI(
     api_key=os.getenv("GROQ_API_KEY"),
-    base_url="https://api.groq.com/openai/v1"
+    base_url=os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
 )
 response_cache = ResponseCache(ttl_minutes=5)  # Cache responses for 5 minutes
 
 # Model Configuration
 MODEL_NAME = "llama-3.1-8b-instant"  # High speed, high rate limits 
 
-# ... (WATI Config remains same) ...
+# Metric children per reply stage, bound once: (latency, prompt tokens, completion tokens, errors)
+LLM_STAGE_METRICS = {
+    stage: (LLM_REQUEST_SECONDS.labels(stage, MODEL_NAME), LLM_TOKENS.labels(stage, MODEL_NAME, "prompt"),
+            LLM_TOKENS.labels(stage, MODEL_NAME, "completion"), LLM_ERRORS.labels(stage))
+    for stage in ("completion_1", "completion_2", "fallback_completion")
+}
+
+def create_completion(stage: str, **kwargs):
+    """Groq chat completion for one reply stage, recording latency, tokens and errors."""
+    latency, prompt_tokens, completion_tokens, errors = LLM_STAGE_METRICS[stage]
+    started = time.perf_counter()
+    try:
+        completion = client.chat.completions.create(model=MODEL_NAME, **kwargs)
+    except Exception:
+        errors.inc()
+        raise
+    latency.observe(time.perf_counter() - started)
+    usage = getattr(completion, "usage", None)
+    if usage:
+        prompt_tokens.inc(usage.prompt_tokens or 0)
+        completion_tokens.inc(usage.completion_tokens or 0)
+    return completion
+
+def account_tokens(completion, stage: str, platform: str, session_id: str, tool_path: str):
+    """
+    Store a completion's token usage in analytics, tagged with the tool path
+    ("direct", "search_store_products", "manage_cart+search_store_products",
+    "fallback", ...) so spend can be broken down by intent.
+    """
+    usage = getattr(completion, "usage", None)
+    if usage:
+        analytics.track_tokens(stage, getattr(completion, "model", None) or MODEL_NAME, platform, tool_path,
+                               session_id, usage.prompt_tokens, usage.completion_tokens)
+
+WATI_TOKEN = os.getenv("WATI_TOKEN")
+WATI_API_ENDPOINT = os.getenv("WATI_API_ENDPOINT", "").rstrip("/")
 
 # ... (Startup event remains commented or we can uncomment it, but crawler handles ingestion now) ...
 
+@app.on_event("startup")
+def start_catalog_sync():
+    catalog.start()
+
+@app.on_event("shutdown")
+def stop_catalog_sync():
+    catalog.stop()
+
+@app.on_event("shutdown")
+def flush_analytics():
+    # Write out queued conversation events before the process exits
+    analytics_retention.stop()
+    analytics.close()
+
+@app.on_event("startup")
+def start_analytics_retention():
+    analytics_retention.start()
+
+def stage_span(stage: str, platform: str):
+    """Time one stage of a reply into the analytics latency histograms."""
+    return span(analytics.track_latency, stage, platform)
+
+def search_products(query: str = ""):
+    """
+    Product search for the agent: answered from the local catalog mirror once
+    it has synced, falling back to the live store API until then.
+    """
+    if catalog.ready:
+        return catalog.search(query) if query else catalog.list_products()
+    products = woo.get_products(search_term=query) if query else woo.get_products()
+    product_cache.put_many(products)
+    return products
+
+def resolve_product(product_ref: str):
+    """
+    Resolve the product the model referred to: an ID is one mirror/cache
+    lookup; anything else (a name) falls back to search.
+    """
+    if str(product_ref).strip().isdigit():
+        return catalog.get(product_ref) or product_cache.get(product_ref)
+    matches = search_products(product_ref)
+    return matches[0] if matches else None
+
 class TestMessage(BaseModel):
     message: str
     session_id: Optional[str] = "web_demo"
 
+@app.middleware("http")
+async def track_in_flight(request: Request, call_next):
+    HTTP_IN_FLIGHT.inc()
+    try:
+        return await call_next(request)
+    finally:
+        HTTP_IN_FLIGHT.dec()
+
 @app.get("/")
 def read_root():
     return {"status": "active", "service": "AI WhatsApp Commerce Bot (Live Only)"}
@@ -172,14 +332,13 @@ TOOLS = [
     }
 ]
 
+TOOL_NAMES = {tool["function"]["name"] for tool in TOOLS}
+
+
+def tool_label(name: str) -> str:
+    """Tool name for metrics labels; anything the model made up is folded into 'unknown'."""
+    return name if name in TOOL_NAMES else "unknown"
 
-class BotResponse(BaseModel):
-    text: str
-    products: Optional[list] = []
-    order_details: Optional[dict] = None
-    quick_replies: Optional[list] = []
-    cart_state: Optional[dict] = None  # New field for cart UI updates
-    function_call: Optional[str] = None
 
 def generate_bot_response(user_message: str, session_id: str = "demo_user", platform: str = "whatsapp") -> BotResponse:
 
@@ -190,7 +349,8 @@ def generate_bot_response(user_message: str, session_id: str = "demo_user", plat
     # 1. Check Cache First (Save API Calls)
     # cache key now includes platform to differentiate formatting if needed, 
     # though for now we stick to one cache.
-    cached_response_str = response_cache.get(user_message)
+    with stage_span("cache_lookup", platform):
+        cached_response_str = response_cache.get(user_message)
     if cached_response_str:
         logger.info("💾 Returning cached response")
         # For simplicity in this iteration, cache stores just text. 
@@ -204,19 +364,23 @@ def generate_bot_response(user_message: str, session_id: str = "demo_user", plat
 
     try:
         # 2. First Call: Let AI decide if it needs tools
-        completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=messages,
-            tools=TOOLS,
-            tool_choice="auto",
-            parallel_tool_calls=False,  # Groq works better with sequential calls
-            temperature=0.7,
-            max_tokens=1024
-        )
+        with stage_span("completion_1", platform):
+            completion = create_completion(
+                "completion_1",
+                messages=messages,
+                tools=TOOLS,
+                tool_choice="auto",
+                parallel_tool_calls=False,  # Groq works better with sequential calls
+                temperature=0.7,
+                max_tokens=1024
+            )
         
         response_message = completion.choices[0].message
         tool_calls = response_message.tool_calls
 
+        tool_path = "+".join(sorted({tool_label(call.function.name) for call in tool_calls})) if tool_calls else "direct"
+        account_tokens(completion, "completion_1", platform, session_id, tool_path)
+
         # 3. If no tools needed, just return the text
         if not tool_calls:
             final_response = response_message.content
@@ -240,59 +404,57 @@ def generate_bot_response(user_message: str, session_id: str = "demo_user", plat
             
             logger.info(f"🤖 Executing Tool: {function_name} | Args: {args}")
 
-            if function_name == "search_store_products":
-                query = args.get("query", "")
-                products = woo.get_products(search_term=query) if query else woo.get_products()
-                if products:
-                    found_products = products[:5]
-                    tool_output = "FOUND LIVE PRODUCTS:\n"
-                    for p in products[:5]:
-                        tool_output += woo.format_product_for_chat(p) + "\n---\n"
-                else:
-                    tool_output = "No products found matching your request."
-
-            elif function_name == "check_order_status":
-                order_id = args.get("order_id")
-                order = woo.get_order_by_id(order_id)
-                if order:
-                    found_order = order
-                    tool_output = f"ORDER STATUS:\nID: {order['id']}\nStatus: {order['status']}\nTotal: {order['currency']} {order['total']}\nItems: {order['line_items']}"
-                else:
-                    tool_output = "Order not found. Please check the ID."
-
-            elif function_name == "search_knowledge_base":
-                query = args.get("query", "")
-                if not query:
-                    tool_output = "Please provide a topic to search."
-                else:
-                    docs = rag.query(query)
-                    tool_output = f"KNOWLEDGE BASE INFO:\n{docs}" if docs else "No relevant info found."
-
-            elif function_name == "manage_cart":
-                action = args.get("action")
-                p_id = args.get("product_id")
-                qty = args.get("quantity", 1)
-                # session_id passed from function signature
-
-                if action == "add" and p_id:
-                    try:
-                        prod_list = woo.get_products(search_term=p_id) 
-                        target_product = prod_list[0] if prod_list else None
-                        if target_product:
-                            cart_summary = cart_manager.add_item(session_id, target_product, qty)
-                            tool_output = f"Added {target_product['name']} to cart. Total: {cart_summary['total']}"
-                        else:
-                            tool_output = "Product not found to add to cart."
-                    except Exception as e:
-                        tool_output = f"Error adding to cart: {str(e)}"
-                elif action == "view":
-                    cart = cart_manager.get_cart_summary(session_id)
-                    tool_output = f"Cart contains {cart['count']} items. Total: {cart['total']}"
-                elif action == "clear":
-                    cart_manager.clear_cart(session_id)
-                    tool_output = "Cart cleared."
-                else:
-                    tool_output = f"Action {action} performed on cart."
+            with stage_span(f"tool.{tool_label(function_name)}", platform):
+                if function_name == "search_store_products":
+                    query = args.get("query", "")
+                    products = search_products(query)
+                    if products:
+                        found_products = products[:5]
+                        tool_output = "FOUND LIVE PRODUCTS:\n" + render_cache.llm_block(found_products)
+                    else:
+                        tool_output = "No products found matching your request."
+
+                elif function_name == "check_order_status":
+                    order_id = args.get("order_id")
+                    order = order_cache.get(order_id) if order_id else None
+                    if order:
+                        found_order = order
+                        tool_output = f"ORDER STATUS:\nID: {order['id']}\nStatus: {order['status']}\nTotal: {order['currency']} {order['total']}\nItems: {order['line_items']}"
+                    else:
+                        tool_output = "Order not found. Please check the ID."
+
+                elif function_name == "search_knowledge_base":
+                    query = args.get("query", "")
+                    if not query:
+                        tool_output = "Please provide a topic to search."
+                    else:
+                        docs = rag.query(query)
+                        tool_output = f"KNOWLEDGE BASE INFO:\n{docs}" if docs else "No relevant info found."
+
+                elif function_name == "manage_cart":
+                    action = args.get("action")
+                    p_id = args.get("product_id")
+                    qty = args.get("quantity", 1)
+                    # session_id passed from function signature
+
+                    if action == "add" and p_id:
+                        try:
+                            target_product = resolve_product(p_id)
+                            if target_product:
+                                cart_summary = cart_manager.add_item(session_id, target_product, qty)
+                                tool_output = f"Added {target_product['name']} to cart. Total: {cart_summary['total']}"
+                            else:
+                                tool_output = "Product not found to add to cart."
+                        except Exception as e:
+                            tool_output = f"Error adding to cart: {str(e)}"
+                    elif action == "view":
+                        cart = cart_manager.get_cart_summary(session_id)
+                        tool_output = f"Cart contains {cart['count']} items. Total: {cart['total']}"
+                    elif action == "clear":
+                        cart_manager.clear_cart(session_id)
+                        tool_output = "Cart cleared."
+                    else:
+                        tool_output = f"Action {action} performed on cart."
 
             # ADD PROPER TOOL MESSAGE (Standard OpenAI/Groq sequence)
             messages.append({
@@ -303,32 +465,35 @@ def generate_bot_response(user_message: str, session_id: str = "demo_user", plat
             })
 
         # 5. Second Call: Final response generation (STRICTLY TEXT ONLY)
-        final_completion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=messages,
-            tools=None 
-        )
+        with stage_span("completion_2", platform):
+            final_completion = create_completion(
+                "completion_2",
+                messages=messages,
+                tools=None 
+            )
+        account_tokens(final_completion, "completion_2", platform, session_id, tool_path)
         
         text = final_completion.choices[0].message.content or ""
         
-        # AGGRESSIVE CLEANING: Strip technical markers and artifacts
-        # Remove anything in between < > or { } that looks like code/JSON
-        text = re.sub(r'<[^>]*>', '', text)  # Remove all HTML-like tags
-        text = re.sub(r'\{[^{}]*"query"[^{}]*\}', '', text)  # Remove JSON queries
-        text = re.sub(r'\{[^{}]*"action"[^{}]*\}', '', text)  # Remove JSON actions
-        text = re.sub(r'search_store_products\(.*?\)', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'manage_cart\(.*?\)', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'search_knowledge_base\(.*?\)', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'check_order_status\(.*?\)', '', text, flags=re.IGNORECASE)
+        with stage_span("sanitize", platform):
+            # AGGRESSIVE CLEANING: Strip technical markers and artifacts
+            # Remove anything in between < > or { } that looks like code/JSON
+            text = re.sub(r'<[^>]*>', '', text)  # Remove all HTML-like tags
+            text = re.sub(r'\{[^{}]*"query"[^{}]*\}', '', text)  # Remove JSON queries
+            text = re.sub(r'\{[^{}]*"action"[^{}]*\}', '', text)  # Remove JSON actions
+            text = re.sub(r'search_store_products\(.*?\)', '', text, flags=re.IGNORECASE)
+            text = re.sub(r'manage_cart\(.*?\)', '', text, flags=re.IGNORECASE)
+            text = re.sub(r'search_knowledge_base\(.*?\)', '', text, flags=re.IGNORECASE)
+            text = re.sub(r'check_order_status\(.*?\)', '', text, flags=re.IGNORECASE)
         
-        # Remove common LLM artifacts if any leak
-        text = text.replace("Tool call:", "")
-        text = text.replace("Action:", "")
-        text = text.replace("Observation:", "")
+            # Remove common LLM artifacts if any leak
+            text = text.replace("Tool call:", "")
+            text = text.replace("Action:", "")
+            text = text.replace("Observation:", "")
         
-        # Final cleanup: remove double spaces/newlines
-        text = re.sub(r'\n\s*\n', '\n\n', text)
-        text = text.strip()
+            # Final cleanup: remove double spaces/newlines
+            text = re.sub(r'\n\s*\n', '\n\n', text)
+            text = text.strip()
 
         logger.info(f"✨ Final Cleaned Response: {text[:100]}...")
         
@@ -347,17 +512,8 @@ def generate_bot_response(user_message: str, session_id: str = "demo_user", plat
         # If any cart action happened, we want to send the latest state
         current_cart = cart_manager.get_cart_summary(session_id)
 
-        # Normalize products for UI (Web Widget)
-        sanitized_products = []
-        for p in found_products:
-            # Create a safe copy for UI
-            ui_p = p.copy()
-            # Ensure image_url is easily accessible
-            if p.get("images") and len(p["images"]) > 0:
-                ui_p["image_url"] = p["images"][0]["src"]
-            else:
-                ui_p["image_url"] = "https://placehold.co/100?text=No+Image"
-            sanitized_products.append(ui_p)
+        # Slim product cards for UI (Web Widget), precomputed per product version
+        sanitized_products = render_cache.cards(found_products)
 
         return BotResponse(
             text=final_response_text,
@@ -393,11 +549,9 @@ def generate_bot_response(user_message: str, session_id: str = "demo_user", plat
                 msg_lower = user_message.lower()
                 if any(word in msg_lower for word in ["product", "price", "buy", "stock", "have", "sell", "catalog"]):
                     try:
-                        products = woo.get_products()
+                        products = search_products()
                         if products:
-                            context += "=== Available Products ===\n"
-                            for p in products[:5]:
-                                context += woo.format_product_for_chat(p) + "\n---\n"
+                            context += "=== Available Products ===\n" + render_cache.llm_block(products[:5])
                     except:
                         pass
                 
@@ -407,12 +561,14 @@ def generate_bot_response(user_message: str, session_id: str = "demo_user", plat
                     {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {user_message}"}
                 ]
                 
-                fallback_completion = client.chat.completions.create(
-                    model=MODEL_NAME,
-                    messages=fallback_messages,
-                    temperature=0.7,
-                    max_tokens=1024
-                )
+                with stage_span("fallback_completion", platform):
+                    fallback_completion = create_completion(
+                        "fallback_completion",
+                        messages=fallback_messages,
+                        temperature=0.7,
+                        max_tokens=1024
+                    )
+                account_tokens(fallback_completion, "fallback_completion", platform, session_id, "fallback")
                 
                 return BotResponse(text=fallback_completion.choices[0].message.content)
                 
@@ -441,6 +597,7 @@ def process_message(wa_id: str, user_message: str):
     
     # 1. Immediate Feedback (Professional "Thinking" State)
     # We can be smart about this: simple heuristics to guess intents for the status message
+    lower_msg = user_message.lower()
     if any(word in lower_msg for word in ["order", "track", "package", "where", "status"]):
         status_msg = "🔍 Checking live order status, please wait a moment..."
     elif any(word in lower_msg for word in ["price", "cost", "stock", "have", "list", "buy", "product", "item", "catalog"]):
@@ -463,10 +620,10 @@ def process_message(wa_id: str, user_message: str):
     if bot_response.products:
         final_text += "\n\nProducts Mentioned:"
         for p in bot_response.products:
-            final_text += f"\n- {p.get('name')} ({p.get('price')} {p.get('currency')})"
+            final_text += f"\n- {p.name} ({p.price} {p.currency})"
             # Add Image Link for WhatsApp Preview
-            if p.get("images") and len(p["images"]) > 0:
-                final_text += f"\n  📷 {p['images'][0]['src']}"
+            if p.image_url and p.image_url != PLACEHOLDER_IMAGE:
+                final_text += f"\n  📷 {p.image_url}"
     
     send_whatsapp_message(wa_id, final_text)
     
@@ -474,6 +631,33 @@ def process_message(wa_id: str, user_message: str):
     response_time_ms = int((time.time() - start_time) * 1000)
     # Track conversation in background
     analytics.track_conversation(user_message, bot_response.text, response_time_ms)
+    analytics.track_latency("total", "whatsapp", response_time_ms)
+
+def process_message_task(wa_id: str, user_message: str, profile: bool = False):
+    """Background task wrapper for an admitted message; frees its admission slot when done."""
+    started = time.monotonic()
+    try:
+        with profiler.maybe("webhook", profile):
+            process_message(wa_id, user_message)
+    finally:
+        BACKGROUND_TASKS_PENDING.dec()
+        admission.release(wa_id, started)
+
+def queue_whatsapp_message(wa_id: str, user_message: str, profile: bool = False) -> Optional[Waiter]:
+    """
+    Queue a message that could not start right away. It is answered once a
+    slot frees up, or the user is asked to resend if its deadline passes.
+    Returns the waiter (already admitted if a slot was free), or None if the
+    queue would not take it.
+    """
+    def admitted():
+        BACKGROUND_TASKS_PENDING.inc()
+        queued_replies.submit(process_message_task, wa_id, user_message, profile)
+
+    def dropped():
+        queued_replies.submit(send_whatsapp_message, wa_id, WHATSAPP_DROPPED_MESSAGE)
+
+    return admission.enqueue(wa_id, WHATSAPP_QUEUE_TIMEOUT, admitted, dropped)
 
 @app.post("/webhook")
 async def wati_webhook(request: Request, background_tasks: BackgroundTasks):
@@ -492,31 +676,111 @@ async def wati_webhook(request: Request, background_tasks: BackgroundTasks):
             text = payload["text"]
             
             # Run processing in background to return 200 OK quickly
-            background_tasks.add_task(process_message, wa_id, text)
+            profile = profiler.should_profile(request.headers.get(PROFILE_HEADER))
+            if admission.try_acquire(wa_id):
+                BACKGROUND_TASKS_PENDING.inc()
+                background_tasks.add_task(process_message_task, wa_id, text, profile)
+            else:
+                # Overloaded (or this user's previous message is still being answered)
+                waiter = queue_whatsapp_message(wa_id, text, profile)
+                if waiter is None:
+                    logger.warning(f"Admission rejected message from {wa_id}: {admission.get_stats()}")
+                    background_tasks.add_task(send_whatsapp_message, wa_id, WHATSAPP_REJECTED_MESSAGE)
+                    return {"status": "rejected"}
+                # Only tell the user they're queued when it's load, not their own pending reply, holding them
+                if waiter.state == "queued" and admission.saturated():
+                    background_tasks.add_task(send_whatsapp_message, wa_id, WHATSAPP_QUEUED_MESSAGE)
+                return {"status": "queued"}
             
         return {"status": "received"}
     except Exception as e:
         logger.error(f"Webhook Error: {e}")
         return {"status": "error", "message": str(e)}
 
+@app.post("/webhooks/woocommerce")
+async def woocommerce_webhook(request: Request):
+    """
+    Receive WooCommerce webhooks: product.created / updated / deleted are
+    applied to the local catalog mirror, order.created / updated / deleted
+    refresh the order status cache.
+    """
+    if not WOO_WEBHOOK_SECRET and not WOO_WEBHOOK_ALLOW_UNSIGNED:
+        logger.warning("Rejected WooCommerce webhook: WOO_WEBHOOK_SECRET is not configured")
+        return JSONResponse(status_code=503, content={"status": "error", "message": "webhook secret not configured"})
+    body = await request.body()
+    signature = request.headers.get("X-WC-Webhook-Signature")
+    if WOO_WEBHOOK_SECRET and not verify_webhook_signature(body, signature, WOO_WEBHOOK_SECRET):
+        logger.warning("Rejected WooCommerce webhook with invalid signature")
+        return JSONResponse(status_code=401, content={"status": "error", "message": "invalid signature"})
+
+    topic = request.headers.get("X-WC-Webhook-Topic", "")
+    try:
+        payload = json.loads(body) if body else {}
+    except ValueError:
+        # WooCommerce sends a form-encoded ping ("webhook_id=...") when a webhook is created
+        return {"status": "ignored"}
+
+    if topic.startswith("order."):
+        if not isinstance(payload, dict) or "id" not in payload:
+            return {"status": "ignored"}
+        if topic == "order.deleted":
+            order_cache.invalidate(payload["id"])
+        else:
+            # The webhook body is the full order; refresh the cached status in place
+            order_cache.put(payload["id"], woo.trim_order(payload))
+        logger.info(f"📦 Applied WooCommerce webhook {topic} for order {payload['id']}")
+        return {"status": "applied"}
+
+    applied = catalog.apply_webhook(topic, payload)
+    if applied:
+        if topic == "product.deleted" or payload.get("status", "publish") != "publish":
+            product_cache.invalidate(payload["id"])
+        else:
+            product_cache.put(payload)
+        logger.info(f"🗂️ Applied WooCommerce webhook {topic} for product {payload.get('id')}")
+    return {"status": "applied" if applied else "ignored"}
+
 # --- Local Test Interface ---
 
-@app.post("/api/test-chat")
-async def test_chat(message: TestMessage):
+def generate_web_reply(user_message: str, session_id: str, profile: bool = False):
+    """Runs in the threadpool; returns the reply and the profile id (if profiled)."""
+    with profiler.maybe("test-chat", profile) as run:
+        response_data = generate_bot_response(user_message, session_id=session_id, platform="web")
+    return response_data, run.id if run else None
+
+@app.post("/api/test-chat", response_model=BotResponse)
+async def test_chat(message: TestMessage, request: Request):
     """
     Endpoint for local testing without WhatsApp.
+    Replies run under admission control: when overloaded the widget gets a
+    fast 429 with Retry-After instead of waiting until it times out.
     """
-    import time
     start_time = time.time()
-    
-    response_data = generate_bot_response(message.message, session_id=message.session_id, platform="web")
+
+    if not await admission.acquire(message.session_id, WEB_QUEUE_TIMEOUT):
+        logger.warning(f"Admission rejected web message from {message.session_id}: {admission.get_stats()}")
+        return JSONResponse(status_code=429, content={"text": WEB_BUSY_MESSAGE},
+                            headers={"Retry-After": str(admission.retry_after())})
+    started = time.monotonic()
+    try:
+        response_data, profile_id = await run_in_threadpool(
+            generate_web_reply, message.message, message.session_id,
+            profiler.should_profile(request.headers.get(PROFILE_HEADER))
+        )
+    finally:
+        admission.release(message.session_id, started)
     
     # Track analytics
     response_time_ms = int((time.time() - start_time) * 1000)
     # Track only text for simplicity in analytics
     analytics.track_conversation(message.message, response_data.text, response_time_ms)
+    analytics.track_latency("total", "web", response_time_ms)
     
-    return response_data
+    # Compact JSON, gzip/brotli compressed when the client accepts it
+    response = compressed_json(request, response_data)
+    if profile_id:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
 
 @app.get("/test", response_class=HTMLResponse)
 async def test_interface():
@@ -569,28 +833,50 @@ async def test_interface():
         </div>
 
         <!-- Load the Widget -->
-        <script src="/widget/chat-widget.js"></script>
+        <script src="/widget/chat-widget.WIDGET_FINGERPRINT.js"></script>
     </body>
     </html>
-    """
+    """.replace("WIDGET_FINGERPRINT", assets.get("chat-widget.js").fingerprint)
 
 # --- ADMIN PANEL API ROUTES ---
 
+@app.get("/widget/manifest.json")
+async def widget_manifest():
+    """Fingerprinted widget URL for embedders (the WordPress plugin caches this)."""
+    return JSONResponse(content={"chat-widget.js": assets.manifest("/widget")["chat-widget.js"]},
+                        headers={"Cache-Control": "public, max-age=300"})
+
 @app.get("/widget/chat-widget.js")
-async def serve_widget_js():
-    """Serve the chat widget JavaScript."""
-    import os
-    from fastapi.responses import FileResponse
-    widget_js_path = os.path.join(os.path.dirname(__file__), "widget", "chat-widget.js")
-    return FileResponse(widget_js_path, media_type="application/javascript")
+async def serve_widget_js(request: Request):
+    """Serve the chat widget JavaScript (stable URL; revalidates via ETag)."""
+    return assets.response(request, assets.get("chat-widget.js"), "public, max-age=300")
+
+@app.get("/widget/chat-widget.{fingerprint}.js")
+async def serve_widget_js_fingerprinted(fingerprint: str, request: Request):
+    """Fingerprinted widget URL, cacheable forever. An outdated fingerprint gets the current file, briefly cached."""
+    widget = assets.get("chat-widget.js")
+    cache_control = IMMUTABLE_CACHE if fingerprint == widget.fingerprint else "public, max-age=60"
+    return assets.response(request, widget, cache_control)
 
 @app.get("/admin", response_class=HTMLResponse)
-async def admin_dashboard():
-    """Serve the admin dashboard."""
-    import os
-    admin_html_path = os.path.join(os.path.dirname(__file__), "admin", "dashboard.html")
-    with open(admin_html_path, 'r', encoding='utf-8') as f:
-        return HTMLResponse(content=f.read())
+async def admin_dashboard(request: Request):
+    """Serve the admin dashboard (from memory; revalidated on each visit)."""
+    return assets.response(request, assets.get("dashboard.html"), "no-cache")
+
+WIDGET_CONFIG_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=600"
+
+@app.get("/api/widget-config")
+def get_widget_config(request: Request):
+    """
+    Public, cacheable subset of settings used by the storefront widget.
+    Answers If-None-Match with 304 while the settings version is unchanged.
+    """
+    body, etag = settings_manager.get_widget_config()
+    headers = {"ETag": etag, "Cache-Control": WIDGET_CONFIG_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/admin/settings")
 async def get_settings():
@@ -601,8 +887,8 @@ async def get_settings():
 async def update_settings(settings: Dict[str, Any]):
     """Update settings."""
     try:
-        settings_manager.update_settings(settings)
-        return {"status": "success", "message": "Settings updated successfully"}
+        version = settings_manager.update_settings(settings)
+        return {"status": "success", "message": "Settings updated successfully", "version": version}
     except Exception as e:
         logger.error(f"Error updating settings: {e}")
         return {"status": "error", "message": str(e)}
@@ -619,7 +905,59 @@ async def reset_settings():
 @app.get("/api/analytics/stats")
 async def get_analytics_stats():
     """Get analytics dashboard statistics."""
-    return analytics.get_dashboard_stats()
+    return dict(analytics.get_dashboard_stats(), writer=analytics.get_writer_stats(),
+                retention=analytics_retention.last_run, admission=admission.get_stats())
+
+@app.get("/api/analytics/latency")
+async def get_latency_stats(days: int = 1):
+    """p50/p95/p99 per reply stage (cache, completions, each tool, sanitize, total), overall and per platform."""
+    return analytics.get_latency_percentiles(days)
+
+@app.get("/api/analytics/tokens")
+async def get_token_stats(days: int = 7):
+    """LLM token usage and estimated cost by day, intent (tool path) and stage."""
+    return analytics.get_token_usage(days)
+
+@app.get("/api/analytics/tokens/session/{session_id}")
+async def get_session_token_stats(session_id: str):
+    """LLM token usage for one chat session."""
+    return analytics.get_session_token_usage(session_id)
+
+@app.get("/api/woo/metrics")
+async def get_woo_metrics():
+    """WooCommerce connection pool, latency and circuit-breaker metrics."""
+    return {"client": woo.get_metrics(), "catalog": catalog.get_stats(), "product_cache": product_cache.get_stats(),
+            "order_cache": order_cache.get_stats(), "render_cache": render_cache.get_stats()}
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request):
+    """Saved request profiles (requires the X-Profile-Token header)."""
+    if not profiler.enabled:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "profiling is disabled"})
+    if not profiler.authorized(request.headers.get(PROFILE_HEADER)):
+        return JSONResponse(status_code=401, content={"status": "error", "message": "invalid profile token"})
+    return {"profiles": profiler.list_profiles()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, request: Request, format: str = "collapsed"):
+    """Download one profile as collapsed stacks (flamegraph.pl) or speedscope JSON."""
+    if not profiler.enabled:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "profiling is disabled"})
+    if not profiler.authorized(request.headers.get(PROFILE_HEADER)):
+        return JSONResponse(status_code=401, content={"status": "error", "message": "invalid profile token"})
+    record = profiler.load(profile_id)
+    if not record:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "profile not found"})
+    if format == "speedscope":
+        return JSONResponse(to_speedscope(record), headers={
+            "Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'})
+    return Response(content=to_collapsed(record), media_type="text/plain", headers={
+        "Content-Disposition": f'attachment; filename="{profile_id}.collapsed.txt"'})
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape endpoint (text exposition format)."""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
 
 @app.post("/api/analytics/track")
 async def track_analytics(data: Dict[str, Any]):
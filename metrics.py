@@ -0,0 +1,217 @@
+"""
+Minimal Prometheus-compatible metrics (text exposition format 0.0.4).
+
+Recording is built for the request path: a labelled child is resolved once
+(`COUNTER.labels("hit")`) and then updating it is a list-index increment, with
+no locks and no allocation. Under heavy thread contention an increment can
+occasionally be lost; that is accepted for telemetry. Values that already
+exist elsewhere (cache stats, queue sizes, session counts) are not recorded
+at all but read through callbacks when /metrics is scraped.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = [0]
+
+    def inc(self, amount=1):
+        self.value[0] += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        self.value[0] -= amount
+
+    def set(self, value):
+        self.value[0] = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "totals")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.totals = [0, 0.0]  # count, sum
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.totals[0] += 1
+        self.totals[1] += value
+
+
+class _Metric:
+    kind = "untyped"
+    child_class = _CounterChild
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *values):
+        """Child for a label combination; bind it once and reuse it on hot paths."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            # dict.setdefault keeps one child per key if two threads race here
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def samples(self) -> Iterable[Tuple[str, str, object]]:
+        for values, child in list(self._children.items()):
+            yield self.name, _format_labels(self.labelnames, values), child.value[0]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    child_class = _GaugeChild
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, values, le), cumulative
+            yield f"{self.name}_count", _format_labels(self.labelnames, values), child.totals[0]
+            yield f"{self.name}_sum", _format_labels(self.labelnames, values), child.totals[1]
+
+
+class CallbackMetric(_Metric):
+    """
+    Gauge or counter whose values are read at scrape time.
+    `fn` returns an iterable of (label_values_tuple, value).
+    """
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], fn: Callable, kind: str = "gauge"):
+        self.kind = kind
+        self.fn = fn
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        for values, value in self.fn():
+            yield self.name, _format_labels(self.labelnames, values), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def callback(self, *args, **kwargs) -> CallbackMetric:
+        return self.register(CallbackMetric(*args, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # A failing callback must not take down the whole scrape
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Metrics recorded on the request path by several modules
+RESPONSE_CACHE_REQUESTS = REGISTRY.counter(
+    "chatbot_response_cache_requests_total", "ResponseCache lookups by result.", ["result"])
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "chatbot_llm_request_duration_seconds", "Groq chat completion latency by stage.", ["stage", "model"])
+LLM_TOKENS = REGISTRY.counter(
+    "chatbot_llm_tokens_total", "Groq tokens used, by stage and kind (prompt/completion).", ["stage", "model", "kind"])
+LLM_ERRORS = REGISTRY.counter(
+    "chatbot_llm_errors_total", "Failed Groq chat completions by stage.", ["stage"])
+WOO_REQUEST_SECONDS = REGISTRY.histogram(
+    "chatbot_woo_request_duration_seconds", "WooCommerce REST request latency.")
+WOO_REQUEST_ERRORS = REGISTRY.counter(
+    "chatbot_woo_request_errors_total", "WooCommerce requests that failed or returned 5xx.")
+RAG_QUERY_SECONDS = REGISTRY.histogram(
+    "chatbot_rag_query_duration_seconds", "RAGHandler.query latency.")
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "chatbot_http_requests_in_flight", "HTTP requests currently being handled.")
+BACKGROUND_TASKS_PENDING = REGISTRY.gauge(
+    "chatbot_background_tasks_pending", "WhatsApp messages queued or being processed in the background.")
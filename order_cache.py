@@ -0,0 +1,93 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Any, Optional
+
+
+class OrderStatusCache:
+    """
+    Short-TTL cache of trimmed order status dicts (as built by
+    WooCommerceHandler.get_order_by_id), keyed by order ID.
+    Concurrent lookups for the same order share one store request, and
+    `order.updated` webhooks replace or drop entries immediately.
+    `clock` lets replay.py run it on recorded timestamps.
+    """
+    def __init__(self, woo, ttl_seconds: int = 60, max_entries: int = 5000, clock=time.monotonic):
+        self.woo = woo
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (order, expires_at)
+        self._inflight: Dict[str, Future] = {}
+        self._stale_inflight = set()  # keys updated by a webhook while a fetch was running
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    @staticmethod
+    def _key(order_id) -> str:
+        return str(order_id).strip().lstrip("#")
+
+    def get(self, order_id) -> Optional[Dict[str, Any]]:
+        """Return the trimmed order dict, or None if the order does not exist."""
+        key = self._key(order_id)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[1] > self.clock():
+                self.stats["hits"] += 1
+                return cached[0]
+            future = self._inflight.get(key)
+            lead = future is None
+            if lead:
+                self.stats["misses"] += 1
+                future = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not lead:
+            # Another request is already fetching this order
+            return future.result()
+
+        try:
+            order = self.woo.get_order_by_id(key)
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._stale_inflight.discard(key)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            superseded = key in self._stale_inflight
+            self._stale_inflight.discard(key)
+            # Unknown orders are not cached so a corrected ID is looked up again
+            if order and not superseded:
+                self._store(key, order)
+        future.set_result(order)
+        return order
+
+    def _store(self, key: str, order: Dict[str, Any]):
+        # Caller holds the lock
+        self._entries[key] = (order, self.clock() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, order_id, order: Dict[str, Any]):
+        """Replace an entry with fresh data (e.g. from an order webhook)."""
+        key = self._key(order_id)
+        with self._lock:
+            if key in self._inflight:
+                self._stale_inflight.add(key)
+            self._store(key, order)
+
+    def invalidate(self, order_id):
+        key = self._key(order_id)
+        with self._lock:
+            if key in self._inflight:
+                self._stale_inflight.add(key)
+            if self._entries.pop(key, None) is not None:
+                self.stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, entries=len(self._entries))
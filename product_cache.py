@@ -0,0 +1,146 @@
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Any, Optional, Iterable
+
+
+class ProductCache:
+    """
+    Product entity cache keyed by product ID.
+    - Entries are replaced whenever a product with a different `date_modified`
+      is seen (search results, catalog webhooks), and expire after `ttl_seconds`.
+    - Concurrent misses are coalesced: callers arriving within `batch_window`
+      seconds share one `/products?include=1,2,3` request.
+    `clock` lets replay.py run it on recorded timestamps.
+    """
+    MAX_INCLUDE = 100  # REST API per_page limit
+
+    def __init__(self, woo, max_entries: int = 2000, ttl_seconds: int = 600, batch_window: float = 0.005,
+                 clock=time.monotonic):
+        self.woo = woo
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.batch_window = batch_window
+        self.clock = clock
+
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (product, expires_at)
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Future] = {}
+        self._batch_scheduled = False
+        self.stats = {"hits": 0, "misses": 0, "batches": 0, "fetched": 0}
+
+    @staticmethod
+    def _product_id(product_id) -> Optional[int]:
+        try:
+            return int(str(product_id).strip())
+        except (TypeError, ValueError):
+            return None
+
+    def _store(self, product: Dict[str, Any]):
+        # Caller holds the lock
+        self._entries[product["id"]] = (product, self.clock() + self.ttl)
+        self._entries.move_to_end(product["id"])
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, product: Dict[str, Any]):
+        """Cache a product, replacing the entry if its version (date_modified) changed."""
+        if not product or "id" not in product:
+            return
+        with self._lock:
+            cached = self._entries.get(product["id"])
+            if cached and cached[0].get("date_modified") == product.get("date_modified"):
+                self._entries.move_to_end(product["id"])
+                return
+            self._store(product)
+
+    def put_many(self, products: Iterable[Dict[str, Any]]):
+        for product in products or []:
+            self.put(product)
+
+    def invalidate(self, product_id):
+        product_id = self._product_id(product_id)
+        with self._lock:
+            self._entries.pop(product_id, None)
+
+    def _lookup(self, product_id: int):
+        # Caller holds the lock
+        cached = self._entries.get(product_id)
+        if cached and cached[1] > self.clock():
+            self._entries.move_to_end(product_id)
+            return cached[0]
+        return None
+
+    def get(self, product_id) -> Optional[Dict[str, Any]]:
+        """Return the product for an ID, fetching it (batched) on a miss."""
+        product_id = self._product_id(product_id)
+        if product_id is None:
+            return None
+
+        with self._lock:
+            product = self._lookup(product_id)
+            if product is not None:
+                self.stats["hits"] += 1
+                return product
+            self.stats["misses"] += 1
+
+            future = self._pending.get(product_id)
+            if future is None:
+                future = self._pending[product_id] = Future()
+            lead = not self._batch_scheduled
+            if lead:
+                self._batch_scheduled = True
+
+        if lead:
+            # Give concurrent callers a moment to join this batch
+            time.sleep(self.batch_window)
+            self._flush()
+        return future.result()
+
+    def get_many(self, product_ids: Iterable) -> Dict[int, Dict[str, Any]]:
+        """Resolve several IDs with at most one store request per 100 misses."""
+        ids = [pid for pid in (self._product_id(p) for p in product_ids) if pid is not None]
+        found, missing = {}, []
+        with self._lock:
+            for pid in ids:
+                product = self._lookup(pid)
+                if product is not None:
+                    found[pid] = product
+                    self.stats["hits"] += 1
+                else:
+                    missing.append(pid)
+                    self.stats["misses"] += 1
+        if missing:
+            found.update(self._fetch(missing))
+        return found
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._batch_scheduled = False
+        try:
+            products = self._fetch(list(pending))
+        except Exception as e:
+            for future in pending.values():
+                future.set_exception(e)
+            return
+        for pid, future in pending.items():
+            future.set_result(products.get(pid))
+
+    def _fetch(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """One `include=` request per 100 IDs; results are cached."""
+        results = {}
+        for i in range(0, len(ids), self.MAX_INCLUDE):
+            chunk = ids[i:i + self.MAX_INCLUDE]
+            products = self.woo.get_products_by_ids(chunk)
+            with self._lock:
+                self.stats["batches"] += 1
+                self.stats["fetched"] += len(products)
+                for product in products:
+                    self._store(product)
+                    results[product["id"]] = product
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, entries=len(self._entries))
@@ -0,0 +1,208 @@
+"""
+On-demand sampling profiler for individual chat requests.
+
+Disabled unless PROFILE_TOKEN is set. A request is profiled when it carries
+`X-Profile-Token: <PROFILE_TOKEN>`, or at random with PROFILE_SAMPLE_RATE
+(e.g. 0.01). A helper thread samples the request thread's stack every
+PROFILE_INTERVAL_MS (wall clock, so time blocked on Groq / WooCommerce shows
+up under the socket frames) and the result is kept in PROFILE_DIR as JSON,
+downloadable as collapsed stacks (flamegraph.pl, speedscope, Firefox
+profiler) or speedscope JSON.
+"""
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_ID_RE = re.compile(r"^[0-9]{8}-[0-9]{6}-[a-z0-9-]+-[0-9a-f]{8}$")
+MAX_STACK_DEPTH = 200
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's stack from a helper thread, stopping the walk at `boundary`."""
+    def __init__(self, thread_id: int, boundary=None, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.boundary = boundary
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None and len(names) < MAX_STACK_DEPTH:
+                names.append(_frame_name(frame))
+                if frame is self.boundary:
+                    break
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+                self.samples += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+class _NoProfile:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_PROFILE = _NoProfile()
+
+
+class _ProfileRun:
+    """Context manager that profiles the calling thread from enter to exit."""
+    def __init__(self, profiler: "RequestProfiler", endpoint: str):
+        self.profiler = profiler
+        self.endpoint = endpoint
+        self.id = None
+
+    def __enter__(self):
+        # Stacks are rooted at the function containing the `with` block
+        self.sampler = StackSampler(threading.get_ident(), sys._getframe(1), self.profiler.interval).start()
+        self.started = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stacks = self.sampler.stop()
+        duration_ms = (time.time() - self.started) * 1000
+        try:
+            self.id = self.profiler.save(self.endpoint, self.started, duration_ms, stacks,
+                                         error=repr(exc) if exc else None)
+        except Exception as e:
+            logger.error(f"Could not save profile for {self.endpoint}: {e}")
+        return False
+
+
+class RequestProfiler:
+    """
+    Decides which requests to profile and stores the results (newest
+    `max_profiles` are kept).
+    """
+    def __init__(self, token: Optional[str] = None, sample_rate: Optional[float] = None,
+                 directory: Optional[str] = None, interval_ms: Optional[float] = None,
+                 max_profiles: int = 100):
+        self.token = token if token is not None else os.getenv("PROFILE_TOKEN", "")
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self.directory = directory or os.getenv("PROFILE_DIR", "profiles")
+        self.interval = (interval_ms if interval_ms is not None else float(os.getenv("PROFILE_INTERVAL_MS", "5"))) / 1000
+        self.max_profiles = max_profiles
+        self.enabled = bool(self.token)
+
+    def authorized(self, supplied: Optional[str]) -> bool:
+        return self.enabled and bool(supplied) and hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def should_profile(self, header_value: Optional[str]) -> bool:
+        """True for a request carrying the token, or one picked by PROFILE_SAMPLE_RATE."""
+        if not self.enabled:
+            return False
+        if header_value:
+            return self.authorized(header_value)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def maybe(self, endpoint: str, wanted: bool):
+        """`with profiler.maybe(...) as run:` -- run is None (and nothing is sampled) unless wanted."""
+        return _ProfileRun(self, endpoint) if wanted else NO_PROFILE
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def save(self, endpoint: str, started: float, duration_ms: float, stacks: Counter,
+             error: Optional[str] = None) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{datetime.utcfromtimestamp(started):%Y%m%d-%H%M%S}-{endpoint}-{uuid.uuid4().hex[:8]}"
+        record = {
+            "id": profile_id, "endpoint": endpoint,
+            "started": datetime.utcfromtimestamp(started).isoformat(timespec="milliseconds"),
+            "duration_ms": round(duration_ms, 1), "interval_ms": self.interval * 1000,
+            "samples": sum(stacks.values()), "error": error, "stacks": dict(stacks),
+        }
+        with open(self._path(profile_id), "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        self._prune()
+        logger.info(f"🔥 Saved profile {profile_id} ({record['samples']} samples, {record['duration_ms']} ms)")
+        return profile_id
+
+    def _prune(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        for name in names[:-self.max_profiles]:
+            os.remove(os.path.join(self.directory, name))
+
+    def list_profiles(self) -> List[Dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    record = json.load(f)
+                record.pop("stacks", None)
+                profiles.append(record)
+        return profiles
+
+    def load(self, profile_id: str) -> Optional[Dict]:
+        if not PROFILE_ID_RE.match(profile_id) or not os.path.exists(self._path(profile_id)):
+            return None
+        with open(self._path(profile_id), encoding="utf-8") as f:
+            return json.load(f)
+
+
+def to_collapsed(record: Dict) -> str:
+    """Brendan Gregg's folded format: `root;child;leaf count` per line."""
+    return "".join(f"{stack} {count}\n" for stack, count in
+                   sorted(record["stacks"].items(), key=lambda item: -item[1]))
+
+
+def to_speedscope(record: Dict) -> Dict:
+    """Speedscope 'sampled' profile, weighted in milliseconds."""
+    frames, index = [], {}
+    samples, weights = [], []
+    for stack, count in record["stacks"].items():
+        sample = []
+        for name in stack.split(";"):
+            if name not in index:
+                index[name] = len(frames)
+                frames.append({"name": name})
+            sample.append(index[name])
+        samples.append(sample)
+        weights.append(count * record["interval_ms"])
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": record["id"],
+        "exporter": "roze-ai-chat profiler",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled", "name": f"{record['endpoint']} {record['started']}", "unit": "milliseconds",
+            "startValue": 0, "endValue": sum(weights), "samples": samples, "weights": weights,
+        }],
+    }
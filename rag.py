@@ -1,13 +1,50 @@
 import os
+import time
 import chromadb
 from chromadb.utils import embedding_functions
 from dotenv import load_dotenv
 
+from metrics import RAG_QUERY_SECONDS
+
 load_dotenv()
 
+COLLECTION_NAME = "dental_commerce_bot"
+
+# Chroma collection metadata keys for the HNSW index, and the env vars that set them
+HNSW_ENV = {
+    "hnsw:M": "RAG_HNSW_M",
+    "hnsw:construction_ef": "RAG_HNSW_EF_CONSTRUCTION",
+    "hnsw:search_ef": "RAG_HNSW_EF_SEARCH",
+}
+
+
+def hnsw_metadata(M=None, ef_construction=None, ef_search=None):
+    """
+    Collection metadata for the HNSW index. Unset values fall back to the
+    RAG_HNSW_* env vars, then to Chroma's defaults (M=16, ef 100/10).
+    """
+    values = {"hnsw:M": M, "hnsw:construction_ef": ef_construction, "hnsw:search_ef": ef_search}
+    metadata = {}
+    for key, value in values.items():
+        if value is None and os.getenv(HNSW_ENV[key]):
+            value = os.getenv(HNSW_ENV[key])
+        if value is not None:
+            metadata[key] = int(value)
+    return metadata
+
+
 class RAGHandler:
-    def __init__(self, persistence_path="chroma_db"):
-        self.client = chromadb.PersistentClient(path=persistence_path)
+    def __init__(self, persistence_path="chroma_db", collection_name=COLLECTION_NAME,
+                 M=None, ef_construction=None, ef_search=None):
+        """
+        `M` and `ef_construction` only take effect when the collection is
+        created; run clear_db.py and re-ingest to rebuild with new values.
+        persistence_path=None keeps the collection in memory (benchmarks).
+        """
+        if persistence_path:
+            self.client = chromadb.PersistentClient(path=persistence_path)
+        else:
+            self.client = chromadb.EphemeralClient()
         
         # Use Local Embeddings (Sentence Transformers) to save OpenAI quota/avoid 429 errors
         # This uses 'all-MiniLM-L6-v2' by default which is free and runs locally.
@@ -19,66 +56,89 @@ class RAGHandler:
             print(f"Error loading local embeddings: {e}. Fallback to default.")
             self.embedding_fn = None # ChromaDB uses default if None, which is also SentenceTransformer
 
+        self.use_collection(collection_name, M, ef_construction, ef_search)
+
+    def use_collection(self, name, M=None, ef_construction=None, ef_search=None):
+        """
+        Open collection `name`, creating it with the given HNSW parameters
+        if it does not exist yet.
+        """
+        self.collection_name = name
+        self.index_params = hnsw_metadata(M, ef_construction, ef_search)
         self.collection = self.client.get_or_create_collection(
-            name="dental_commerce_bot",
-            embedding_function=self.embedding_fn
+            name=name,
+            embedding_function=self.embedding_fn,
+            metadata=self.index_params or None
         )
+        return self.collection
 
     def reset_collection(self):
         """
-        Deletes the entire collection to start fresh.
+        Deletes the entire collection to start fresh (rebuilt with the
+        current HNSW parameters).
         """
         try:
-            self.client.delete_collection("dental_commerce_bot")
+            self.client.delete_collection(self.collection_name)
             self.collection = self.client.get_or_create_collection(
-                name="dental_commerce_bot",
-                embedding_function=self.embedding_fn
+                name=self.collection_name,
+                embedding_function=self.embedding_fn,
+                metadata=self.index_params or None
             )
             print("Collection reset successfully.")
         except Exception as e:
             print(f"Error resetting collection: {e}")
 
+    def embed(self, documents):
+        """
+        Embed a batch of documents. Returns None when no local embedding
+        function is loaded, in which case Chroma embeds on upsert.
+        """
+        if not self.embedding_fn:
+            return None
+        return self.embedding_fn(documents)
+
+    def upsert_chunks(self, documents, ids, metadatas, embeddings=None):
+        """
+        Bulk upsert pre-split chunks, optionally with precomputed embeddings.
+        """
+        if embeddings is not None:
+            self.collection.upsert(
+                documents=documents,
+                embeddings=embeddings,
+                ids=ids,
+                metadatas=metadatas
+            )
+        else:
+            self.collection.upsert(
+                documents=documents,
+                ids=ids,
+                metadatas=metadatas
+            )
+
+    def delete_source(self, source):
+        """
+        Remove every chunk ingested from `source` (a URL or file tag),
+        e.g. when a crawled page changed or disappeared.
+        """
+        self.collection.delete(where={"source": source})
+
     def ingest_data(self, file_path, tag):
         """
         Ingest data from a text file into the vector store.
         Each paragraph or block is treated as a document.
+        The file is streamed and embedded in batches (see IngestionPipeline).
         """
-        if not os.path.exists(file_path):
-            print(f"File not found: {file_path}")
-            return
+        from ingest_pipeline import IngestionPipeline
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Simple splitting by double newlines for this demo format
-        chunks = content.split('\n\n')
-        
-        ids = [f"{tag}_{i}" for i in range(len(chunks))]
-        metadatas = [{"source": tag} for _ in range(len(chunks))]
-        
-        # Filter empty chunks
-        valid_chunks = []
-        valid_ids = []
-        valid_metadatas = []
-        
-        for i, chunk in enumerate(chunks):
-            if chunk.strip():
-                valid_chunks.append(chunk.strip())
-                valid_ids.append(ids[i])
-                valid_metadatas.append(metadatas[i])
-
-        if valid_chunks:
-            self.collection.upsert(
-                documents=valid_chunks,
-                ids=valid_ids,
-                metadatas=valid_metadatas
-            )
-            print(f"Ingested {len(valid_chunks)} chunks from {file_path}")
+        with IngestionPipeline(self) as pipeline:
+            pipeline.add_file(file_path, tag)
 
     def ingest_text(self, text, metadata):
         """
         Ingest raw text directly.
         metadata: dict, e.g. {"source": "url", "title": "..."}
+        For bulk loads (crawls), prefer IngestionPipeline.add so pages are
+        embedded in batches instead of one page at a time.
         """
         import uuid
         if not text.strip():
@@ -94,11 +154,7 @@ class RAGHandler:
         ids = [str(uuid.uuid4()) for _ in chunks]
         metadatas = [metadata for _ in chunks]
         
-        self.collection.upsert(
-            documents=chunks,
-            ids=ids,
-            metadatas=metadatas
-        )
+        self.upsert_chunks(chunks, ids, metadatas)
         print(f"Ingested {len(chunks)} chunks from {metadata.get('source', 'unknown')}")
 
     def query(self, query_text, n_results=3):
@@ -108,10 +164,12 @@ class RAGHandler:
         if not self.embedding_fn:
             return []
 
+        started = time.perf_counter()
         results = self.collection.query(
             query_texts=[query_text],
             n_results=n_results
         )
+        RAG_QUERY_SECONDS.observe(time.perf_counter() - started)
         
         # Flatten results
         return results['documents'][0] if results['documents'] else []
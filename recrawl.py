@@ -0,0 +1,160 @@
+"""
+Incremental knowledge-base refresh.
+Instead of wiping the collection (clear_db.py) and crawling from scratch, this
+revisits only:
+- tracked pages whose adaptive revisit time has passed,
+- pages whose sitemap.xml <lastmod> is newer than our last visit,
+- URLs newly listed in the sitemap,
+- tracked pages that dropped out of the sitemap (to confirm removal).
+Changed pages are re-embedded and removed pages have their chunks deleted.
+"""
+import time
+import argparse
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+
+import requests
+
+from crawl_state import CrawlStateManager
+from dedup import canonicalize_url
+from crawler import crawl, DEFAULT_START_URL, DEFAULT_DELAY, DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, \
+    DEFAULT_STATE_DB, USER_AGENT
+
+SITEMAP_PATHS = ["/sitemap.xml", "/sitemap_index.xml", "/wp-sitemap.xml"]
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+def parse_lastmod(value):
+    """Parse a W3C datetime (or date) into a UTC timestamp."""
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def fetch_sitemap(start_url, max_sitemaps=50):
+    """
+    Fetch the site's sitemap (following sitemap indexes).
+    Returns {url: lastmod_timestamp_or_None}; empty if no sitemap was found.
+    """
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+
+    pending = [urljoin(start_url, path) for path in SITEMAP_PATHS]
+    found_root = False
+    fetched = 0
+    entries = {}
+
+    while pending and fetched < max_sitemaps:
+        sitemap_url = pending.pop(0)
+        try:
+            response = session.get(sitemap_url, timeout=10)
+        except Exception as e:
+            print(f"Error fetching sitemap {sitemap_url}: {e}")
+            continue
+        if response.status_code != 200:
+            continue
+        fetched += 1
+
+        try:
+            root = ET.fromstring(response.content)
+        except ET.ParseError as e:
+            print(f"Invalid sitemap {sitemap_url}: {e}")
+            continue
+
+        if not found_root:
+            # First root sitemap that answers wins; drop the other candidates
+            found_root = True
+            pending = []
+
+        if root.tag == f"{SITEMAP_NS}sitemapindex":
+            for sitemap in root.findall(f"{SITEMAP_NS}sitemap"):
+                loc = sitemap.findtext(f"{SITEMAP_NS}loc")
+                if loc:
+                    pending.append(loc.strip())
+        else:
+            for url in root.findall(f"{SITEMAP_NS}url"):
+                loc = url.findtext(f"{SITEMAP_NS}loc")
+                if loc:
+                    entries[canonicalize_url(loc.strip())] = parse_lastmod(url.findtext(f"{SITEMAP_NS}lastmod"))
+
+    return entries
+
+
+def plan_recrawl(state, sitemap, now=None):
+    """
+    Decide which URLs to visit. Returns (seeds, counts) where counts breaks
+    the plan down by reason.
+    """
+    index = state.get_index()
+
+    changed, new = [], []
+    for url, lastmod in sitemap.items():
+        page = index.get(url)
+        if page is None:
+            new.append(url)
+        elif page["status"] == "active" and lastmod and lastmod > (page["last_seen"] or 0):
+            changed.append(url)
+    state.mark_due(changed)
+
+    vanished = []
+    if sitemap:
+        # Only pages that dropped out of the sitemap since the last run; pages
+        # found through links alone stay on their normal revisit schedule
+        vanished = [url for url, page in index.items()
+                    if page["status"] == "active" and page["in_sitemap"] and url not in sitemap]
+        state.mark_due(vanished)
+        state.set_sitemap_urls(sitemap)
+
+    due = state.due_urls(now)
+    seeds = list(dict.fromkeys(due + new))
+    counts = {"due": len(due), "sitemap_changed": len(changed), "new": len(new), "vanished": len(vanished)}
+    return seeds, counts
+
+
+def recrawl(start_url=DEFAULT_START_URL, delay=DEFAULT_DELAY, concurrency=DEFAULT_CONCURRENCY,
+            per_host=DEFAULT_PER_HOST, state_db=DEFAULT_STATE_DB, new_page_budget=50):
+    state = CrawlStateManager(state_db)
+    sitemap = fetch_sitemap(start_url)
+    print(f"Sitemap lists {len(sitemap)} URLs")
+
+    seeds, counts = plan_recrawl(state, sitemap)
+    if not state.known_urls():
+        # First run: nothing tracked yet, discover from the start page
+        seeds = seeds or [start_url]
+    print(f"Recrawl plan: {counts}")
+
+    if not seeds:
+        print("Nothing is due. Knowledge base is fresh.")
+        return None
+
+    # Links to tracked pages are not followed; only new pages use the budget
+    return crawl(start_url, len(seeds) + new_page_budget, delay, concurrency, per_host, state_db,
+                 seeds=seeds, skip_known=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally refresh the crawled knowledge base.")
+    parser.add_argument("--start-url", default=DEFAULT_START_URL)
+    parser.add_argument("--delay", type=float, default=DEFAULT_DELAY)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST)
+    parser.add_argument("--state-db", default=DEFAULT_STATE_DB)
+    parser.add_argument("--new-page-budget", type=int, default=50, help="Max newly discovered pages per run")
+    parser.add_argument("--loop", type=float, default=0, help="Re-run every N seconds (0 = run once)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    while True:
+        recrawl(args.start_url, args.delay, args.concurrency, args.per_host, args.state_db, args.new_page_budget)
+        if not args.loop:
+            break
+        time.sleep(args.loop)
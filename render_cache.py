@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List
+
+PLACEHOLDER_IMAGE = "https://placehold.co/100?text=No+Image"
+
+
+def build_product_card(product: Dict[str, Any]) -> Dict[str, Any]:
+    """Slim product card with only what the widget and WhatsApp replies render."""
+    images = product.get("images") or []
+    return {
+        "id": product.get("id"),
+        "name": product.get("name", "Product"),
+        "price": str(product.get("price") or ""),
+        "currency": product.get("currency", "AED"),
+        "image_url": images[0].get("src") if images else PLACEHOLDER_IMAGE,
+        "permalink": product.get("permalink", ""),
+        "stock_status": product.get("stock_status", "")
+    }
+
+
+class ProductRenderCache:
+    """
+    Rendered forms of each product version, keyed by (id, date_modified):
+    the LLM text block (WooCommerceHandler.format_product_for_chat) and the
+    slim UI card. A new date_modified renders again; old versions age out of
+    the bounded LRU.
+    """
+    def __init__(self, woo, max_entries: int = 2000):
+        self.woo = woo
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "renders": 0}
+
+    def _render(self, product: Dict[str, Any]) -> tuple:
+        key = (product.get("id"), product.get("date_modified"))
+        with self._lock:
+            rendered = self._entries.get(key)
+            if rendered is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return rendered
+
+        # Render outside the lock; a duplicate render on a race is harmless
+        rendered = (self.woo.format_product_for_chat(product), build_product_card(product))
+        with self._lock:
+            self._entries[key] = rendered
+            self.stats["renders"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rendered
+
+    def llm_text(self, product: Dict[str, Any]) -> str:
+        return self._render(product)[0]
+
+    def card(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        return self._render(product)[1]
+
+    def llm_block(self, products: List[Dict[str, Any]]) -> str:
+        """Tool output text for a list of products."""
+        return "".join(self.llm_text(p) + "\n---\n" for p in products)
+
+    def cards(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.card(p) for p in products]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, entries=len(self._entries))
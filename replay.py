@@ -0,0 +1,469 @@
+"""
+Offline traffic replay and cache-policy simulator.
+
+Feeds recorded user messages, on their original timestamps (virtual clock),
+through ResponseCache and an optional similarity ("semantic") cache layer for
+every combination of TTL, capacity and similarity threshold, and reports hit
+ratio, peak memory and the LLM calls / tokens a policy would have saved.
+
+Messages that miss both are handed to the tool caches the app really uses
+(ProductCache, OrderStatusCache, ProductRenderCache), on the same clock. The
+stub LLM's tool choice (bench_stubs.pick_tool) decides which tool a message
+triggers, and a real WooCommerceHandler reads bench_stubs' synthetic catalog
+in-process, as when the catalog mirror has not synced. Their hit ratios,
+store requests and peak memory are reported next to the response cache.
+
+Sources: analytics.db `conversations` (plus archived months with
+--archive-dir) and/or JSON Lines files with `message`/`user_message`/`text`
+and an optional `timestamp` (ISO string or epoch seconds).
+
+    python replay.py --ttl 5,30,120 --capacity 0,1000 --similarity 1.0,0.9,0.8
+    python replay.py --jsonl traffic.jsonl --embed --json
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import hashlib
+import sqlite3
+import argparse
+import itertools
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from cache_handler import ResponseCache
+from analytics_retention import iter_archive
+from bench_stubs import pick_tool, query_products, stub_order, synthetic_catalog
+from order_cache import OrderStatusCache
+from product_cache import ProductCache
+from render_cache import ProductRenderCache
+from woo_handler import WooCommerceHandler
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+ENTRY_OVERHEAD_BYTES = 300  # dict entry, key string, expiry datetime
+EPOCH = datetime(1970, 1, 1)
+# LSH signature for the similarity cache: 16 bands of 8 random-hyperplane bits
+SIGNATURE_BANDS = 16
+SIGNATURE_BYTES = SIGNATURE_BANDS  # one byte per band
+
+
+class Event:
+    __slots__ = ("at", "message", "response", "vector", "bands")
+
+    def __init__(self, at: datetime, message: str, response: str = ""):
+        self.at = at
+        self.message = message
+        self.response = response or ""
+        self.vector = None
+        self.bands = None
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+    text = str(value).replace("T", " ").replace("Z", "")[:19]
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def load_db(db_path: str) -> List[Event]:
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT timestamp, user_message, bot_response FROM conversations ORDER BY timestamp, id").fetchall()
+    conn.close()
+    return [Event(_parse_time(ts), message, response) for ts, message, response in rows if _parse_time(ts)]
+
+
+def load_archive(archive_dir: str) -> List[Event]:
+    return [Event(_parse_time(row["timestamp"]), row["user_message"], row.get("bot_response", ""))
+            for row in iter_archive(archive_dir, "conversations") if _parse_time(row["timestamp"])]
+
+
+def load_jsonl(path: str) -> List[Event]:
+    """Messages without timestamps are spaced one second apart in file order."""
+    events, fallback = [], datetime(2000, 1, 1)
+    with open(path, encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            message = record.get("message") or record.get("user_message") or record.get("text") or ""
+            if not message:
+                continue
+            at = _parse_time(record.get("timestamp") or record.get("ts")) or fallback + timedelta(seconds=i)
+            events.append(Event(at, message, record.get("response") or record.get("bot_response") or ""))
+    return events
+
+
+def bow_vector(text: str) -> Dict[str, float]:
+    """L2-normalised bag-of-words vector (stand-in when embeddings are not used)."""
+    counts = Counter(TOKEN_RE.findall(text.lower()))
+    norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {token: c / norm for token, c in counts.items()}
+
+
+def cosine(a, b) -> float:
+    if isinstance(a, dict):
+        if len(a) > len(b):
+            a, b = b, a
+        return sum(v * b.get(k, 0.0) for k, v in a.items())
+    return sum(x * y for x, y in zip(a, b))
+
+
+_token_planes = {}
+
+
+def bow_bands(vector: Dict[str, float]) -> bytes:
+    """
+    LSH signature of a bag-of-words vector (weighted SimHash): every token
+    hashes to a random +-1 per hyperplane, so each bit is the sign of a
+    random projection and similar vectors agree on most bits.
+    """
+    bits = SIGNATURE_BYTES * 8
+    totals = [0.0] * bits
+    for token, weight in vector.items():
+        plane = _token_planes.get(token)
+        if plane is None:
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=SIGNATURE_BYTES).digest(), "big")
+            plane = _token_planes[token] = [1 if (h >> bit) & 1 else -1 for bit in range(bits)]
+        for bit, sign in enumerate(plane):
+            totals[bit] += sign * weight
+    signature = sum(1 << bit for bit, total in enumerate(totals) if total > 0)
+    return signature.to_bytes(SIGNATURE_BYTES, "big")
+
+
+def dense_bands(vectors) -> List[bytes]:
+    """LSH signatures of embedding vectors (random hyperplanes, seeded so runs compare)."""
+    import numpy as np  # installed alongside the embedding model
+    matrix = np.asarray(vectors, dtype=np.float32)
+    planes = np.random.default_rng(7).standard_normal((matrix.shape[1], SIGNATURE_BYTES * 8)).astype(np.float32)
+    return [row.tobytes() for row in np.packbits(matrix @ planes > 0, axis=1)]
+
+
+class SimilarityCacheSim:
+    """
+    Semantic cache model: a miss in the exact cache is a hit if a live entry
+    is similar enough. Entries are indexed by their LSH bands and a lookup
+    only scores entries sharing a band with the query, so replay stays linear
+    in the traffic. Like a real ANN index this can miss a qualifying entry
+    (roughly 5% of pairs at cosine 0.8, under 1% at 0.9).
+    """
+    def __init__(self, threshold: float, ttl: timedelta, max_entries: int = 0):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (vector, bands, size)
+        self._buckets: Dict[tuple, set] = {}
+        self._expiry = deque()  # (expires, id) in insertion order; every entry has the same TTL
+        self._next_id = 0
+
+    def _remove(self, entry_id: int):
+        _, bands, _ = self.entries.pop(entry_id)
+        for band_key in enumerate(bands):
+            bucket = self._buckets[band_key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[band_key]
+
+    def _expire(self, now: datetime):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, entry_id = self._expiry.popleft()
+            if entry_id in self.entries:
+                self._remove(entry_id)
+
+    def lookup(self, vector, bands: bytes, now: datetime) -> bool:
+        self._expire(now)
+        candidates = set()
+        for band_key in enumerate(bands):
+            candidates.update(self._buckets.get(band_key, ()))
+        best_id, best = None, self.threshold
+        for entry_id in candidates:
+            score = cosine(vector, self.entries[entry_id][0])
+            if score >= best:
+                best_id, best = entry_id, score
+        if best_id is None:
+            return False
+        self.entries.move_to_end(best_id)
+        return True
+
+    def add(self, vector, bands: bytes, now: datetime, size: int):
+        entry_id = self._next_id
+        self._next_id += 1
+        self.entries[entry_id] = (vector, bands, size)
+        for band_key in enumerate(bands):
+            self._buckets.setdefault(band_key, set()).add(entry_id)
+        self._expiry.append((now + self.ttl, entry_id))
+        if self.max_entries:
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def memory_bytes(self, vector_bytes: int) -> int:
+        return (sum(size for _, _, size in self.entries.values())
+                + len(self.entries) * (ENTRY_OVERHEAD_BYTES + vector_bytes + SIGNATURE_BYTES))
+
+
+class ReplayStore:
+    """In-process WooCommerce REST API over bench_stubs' synthetic catalog; counts requests."""
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.requests = 0
+
+    def get_json(self, endpoint, params=None):
+        self.requests += 1
+        if endpoint == "products":
+            return query_products(self.catalog, params or {})[0]
+        if endpoint.startswith("orders/"):
+            return stub_order(self.catalog, int(endpoint.split("/", 1)[1]))
+        raise ValueError(f"Unsupported endpoint: {endpoint}")
+
+
+class ToolCacheReplay:
+    """
+    The app's tool caches on the replay clock, called the way main.py calls
+    them (search results fill ProductCache and render through
+    ProductRenderCache; cart adds resolve IDs through ProductCache; order
+    lookups go through OrderStatusCache).
+    """
+    def __init__(self, catalog, clock, product_ttl: float, order_ttl: float):
+        self.store = ReplayStore(catalog)
+        # No credentials or HTTP client: the handler's methods only need `wcapi`
+        self.woo = WooCommerceHandler.__new__(WooCommerceHandler)
+        self.woo.wcapi = self.store
+        self.products = ProductCache(self.woo, ttl_seconds=product_ttl, batch_window=0, clock=clock)
+        self.orders = OrderStatusCache(self.woo, ttl_seconds=order_ttl, clock=clock)
+        self.renders = ProductRenderCache(self.woo)
+        self.tool_calls = 0
+        self._sizes = {}
+
+    def run(self, message: str):
+        tool, args = pick_tool(message)
+        if tool is None:
+            return
+        self.tool_calls += 1
+        if tool == "search_store_products":
+            query = args.get("query", "")
+            products = self.woo.get_products(search_term=query) if query else self.woo.get_products()
+            self.products.put_many(products)
+            self.renders.llm_block(products[:5])
+        elif tool == "check_order_status":
+            self.orders.get(args["order_id"])
+        elif tool == "manage_cart" and args.get("product_id"):
+            self.products.get(args["product_id"])
+
+    def _size(self, key, value) -> int:
+        # Cached objects don't change while cached, so each is measured once
+        if key not in self._sizes:
+            self._sizes[key] = len(json.dumps(value, default=str).encode("utf-8")) + ENTRY_OVERHEAD_BYTES
+        return self._sizes[key]
+
+    def memory_bytes(self) -> int:
+        return (sum(self._size(("product", pid, entry[0].get("date_modified")), entry[0])
+                    for pid, entry in list(self.products._entries.items()))
+                + sum(self._size(("order", key), entry[0]) for key, entry in list(self.orders._entries.items()))
+                + sum(self._size(("render",) + key, rendered) for key, rendered in list(self.renders._entries.items())))
+
+    def results(self) -> Dict:
+        def ratio(hits, total):
+            return round(hits / total, 4) if total else 0
+
+        products, orders, renders = self.products.stats, self.orders.stats, self.renders.stats
+        return {
+            "tool_calls": self.tool_calls,
+            "woo_requests": self.store.requests,
+            "product_hit_ratio": ratio(products["hits"], products["hits"] + products["misses"]),
+            "order_hit_ratio": ratio(orders["hits"] + orders["coalesced"],
+                                     orders["hits"] + orders["coalesced"] + orders["misses"]),
+            "render_hit_ratio": ratio(renders["hits"], renders["hits"] + renders["renders"]),
+        }
+
+
+def simulate(events: List[Event], ttl_minutes: float, capacity: int, threshold: float,
+             llm_calls_per_reply: float, tokens_per_reply: float, catalog=None, product_ttl: float = 600,
+             order_ttl: float = 60, sample_every: int = 500) -> Dict:
+    clock = [events[0].at if events else datetime.utcnow()]
+    exact = ResponseCache(ttl_minutes=ttl_minutes, max_entries=capacity or None, clock=lambda: clock[0])
+    semantic = SimilarityCacheSim(threshold, timedelta(minutes=ttl_minutes), capacity) if threshold < 1.0 else None
+    tools = ToolCacheReplay(catalog if catalog is not None else synthetic_catalog(),
+                            lambda: (clock[0] - EPOCH).total_seconds(), product_ttl, order_ttl)
+    vector_bytes = 0
+    if semantic and events and events[0].vector is not None and not isinstance(events[0].vector, dict):
+        vector_bytes = 4 * len(events[0].vector)
+
+    exact_hits = semantic_hits = 0
+    peak_entries = peak_bytes = peak_tool_bytes = 0
+
+    def measure():
+        size = sum(len(v["response"].encode("utf-8")) for v in exact.cache.values()) + len(exact.cache) * ENTRY_OVERHEAD_BYTES
+        entries = len(exact.cache)
+        if semantic:
+            size += semantic.memory_bytes(vector_bytes)
+            entries += len(semantic.entries)
+        return entries, size
+
+    for i, event in enumerate(events):
+        clock[0] = event.at
+        if exact.get(event.message) is not None:
+            exact_hits += 1
+        elif semantic and semantic.lookup(event.vector, event.bands, event.at):
+            semantic_hits += 1
+        else:
+            # Miss: tools run, the reply is generated (recorded response stands in) and cached
+            tools.run(event.message)
+            exact.set(event.message, event.response)
+            if semantic:
+                semantic.add(event.vector, event.bands, event.at, len(event.response.encode("utf-8")))
+        if i % sample_every == 0 or i == len(events) - 1:
+            entries, size = measure()
+            peak_entries, peak_bytes = max(peak_entries, entries), max(peak_bytes, size)
+            peak_tool_bytes = max(peak_tool_bytes, tools.memory_bytes())
+
+    total = len(events)
+    hits = exact_hits + semantic_hits
+    return {
+        "ttl_minutes": ttl_minutes,
+        "capacity": capacity or "unbounded",
+        "similarity": threshold,
+        "requests": total,
+        "hit_ratio": round(hits / total, 4) if total else 0,
+        "exact_hits": exact_hits,
+        "similarity_hits": semantic_hits,
+        "llm_calls_saved": round(hits * llm_calls_per_reply),
+        "tokens_saved": round(hits * tokens_per_reply),
+        "peak_entries": peak_entries,
+        "peak_memory_kb": round(peak_bytes / 1024, 1),
+        **tools.results(),
+        "tool_cache_peak_kb": round(peak_tool_bytes / 1024, 1),
+    }
+
+
+def usage_profile(db_path: Optional[str]):
+    """LLM calls and tokens per reply from recorded token usage (defaults if none recorded)."""
+    calls_per_reply, tokens_per_reply = 2.0, 1500.0
+    if not db_path:
+        return calls_per_reply, tokens_per_reply
+    try:
+        conn = sqlite3.connect(db_path)
+        conversations = conn.execute("SELECT SUM(total_conversations) FROM daily_stats").fetchone()[0]
+        calls, tokens = conn.execute("SELECT SUM(calls), SUM(prompt_tokens + completion_tokens) FROM token_stats").fetchone()
+        conn.close()
+    except sqlite3.Error:
+        return calls_per_reply, tokens_per_reply
+    if conversations and calls:
+        calls_per_reply, tokens_per_reply = calls / conversations, tokens / conversations
+    return calls_per_reply, tokens_per_reply
+
+
+def sample_retrieval_ms(events: List[Event], sample: int) -> Optional[float]:
+    """Median RAGHandler.query time over distinct recorded messages (what a retrieval-cache hit saves)."""
+    from rag import RAGHandler
+    rag = RAGHandler()
+    messages = list(OrderedDict.fromkeys(e.message for e in events))[:sample]
+    timings = []
+    for message in messages:
+        started = time.perf_counter()
+        rag.query(message)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return round(timings[len(timings) // 2], 1) if timings else None
+
+
+def parse_list(value, cast):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded traffic through cache policies.")
+    parser.add_argument("--db", default="analytics.db", help="analytics.db to read conversations from ('' to skip)")
+    parser.add_argument("--archive-dir", help="Also replay archived months from this directory")
+    parser.add_argument("--jsonl", action="append", default=[], help="JSON Lines traffic file (repeatable)")
+    parser.add_argument("--ttl", default="5,30,120", help="TTLs in minutes")
+    parser.add_argument("--capacity", default="0,1000", help="Max entries (0 = unbounded)")
+    parser.add_argument("--similarity", default="1.0,0.9,0.8", help="Similarity thresholds (1.0 = exact cache only)")
+    parser.add_argument("--product-ttl", type=float, default=600, help="ProductCache TTL in seconds")
+    parser.add_argument("--order-ttl", type=float, default=float(os.getenv("ORDER_CACHE_TTL_SECONDS", "60")),
+                        help="OrderStatusCache TTL in seconds")
+    parser.add_argument("--catalog-size", type=int, default=200, help="Products in the synthetic store")
+    parser.add_argument("--embed", action="store_true", help="Use the RAG embedding model for similarity (default: bag of words)")
+    parser.add_argument("--rag-sample", type=int, default=0, help="Time RAG retrieval on N distinct messages")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    events = []
+    if args.db:
+        try:
+            events += load_db(args.db)
+        except sqlite3.Error as e:
+            print(f"Skipping {args.db}: {e}", file=sys.stderr)
+    if args.archive_dir:
+        events += load_archive(args.archive_dir)
+    for path in args.jsonl:
+        events += load_jsonl(path)
+    events.sort(key=lambda e: e.at)
+    if not events:
+        print("No recorded messages found.")
+        return 1
+
+    thresholds = parse_list(args.similarity, float)
+    if any(t < 1.0 for t in thresholds):
+        vectors = None
+        if args.embed:
+            from rag import RAGHandler
+            vectors = RAGHandler().embed([e.message for e in events])
+            if vectors is None:
+                print("No local embedding model loaded; using bag-of-words similarity.", file=sys.stderr)
+        if vectors is not None:
+            for event, vector, bands in zip(events, vectors, dense_bands(vectors)):
+                norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+                event.vector = [x / norm for x in vector]
+                event.bands = bands
+        else:
+            for event in events:
+                event.vector = bow_vector(event.message)
+                event.bands = bow_bands(event.vector)
+
+    calls_per_reply, tokens_per_reply = usage_profile(args.db)
+    catalog = synthetic_catalog(args.catalog_size)
+    results = [simulate(events, ttl, capacity, threshold, calls_per_reply, tokens_per_reply,
+                        catalog, args.product_ttl, args.order_ttl)
+               for ttl, capacity, threshold in itertools.product(parse_list(args.ttl, float),
+                                                                  parse_list(args.capacity, int), thresholds)]
+    retrieval_ms = sample_retrieval_ms(events, args.rag_sample) if args.rag_sample else None
+
+    if args.json:
+        print(json.dumps({"events": len(events), "llm_calls_per_reply": round(calls_per_reply, 2),
+                          "tokens_per_reply": round(tokens_per_reply), "retrieval_ms_p50": retrieval_ms,
+                          "results": results}, indent=2))
+        return 0
+
+    span = events[-1].at - events[0].at
+    print(f"Replayed {len(events)} messages over {span} "
+          f"({calls_per_reply:.2f} LLM calls, {tokens_per_reply:.0f} tokens per uncached reply)")
+    if retrieval_ms is not None:
+        print(f"RAG retrieval p50: {retrieval_ms} ms per query")
+    header = (f"{'TTL(min)':>8} {'Capacity':>10} {'Sim':>5} {'Hit%':>7} {'Exact':>7} {'Similar':>8} {'LLM saved':>10} "
+              f"{'Tokens saved':>13} {'Peak KB':>9} {'Tools':>7} {'Woo req':>8} {'Prod%':>6} {'Order%':>7} "
+              f"{'Render%':>8} {'Tool KB':>8}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['ttl_minutes']:>8g} {str(r['capacity']):>10} {r['similarity']:>5g} {r['hit_ratio'] * 100:>6.1f}% "
+              f"{r['exact_hits']:>7} {r['similarity_hits']:>8} {r['llm_calls_saved']:>10} {r['tokens_saved']:>13} "
+              f"{r['peak_memory_kb']:>9} {r['tool_calls']:>7} {r['woo_requests']:>8} "
+              f"{r['product_hit_ratio'] * 100:>5.1f}% {r['order_hit_ratio'] * 100:>6.1f}% "
+              f"{r['render_hit_ratio'] * 100:>7.1f}% {r['tool_cache_peak_kb']:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+from typing import Optional, List
+from pydantic import BaseModel
+
+# Response schema for the chat endpoints. Kept deliberately small: the widget
+# renders only these fields and mobile clients download them on every reply
+# (see verify_payload_size.py for the size budget).
+
+class ProductCard(BaseModel):
+    """Slim product card: only what the widget and WhatsApp replies render."""
+    id: Optional[int] = None
+    name: str
+    price: Optional[str] = ""
+    currency: str = "AED"
+    image_url: str
+    permalink: Optional[str] = ""
+    stock_status: Optional[str] = ""
+
+class OrderDetails(BaseModel):
+    id: Optional[int] = None
+    status: str
+    total: Optional[str] = ""
+    currency: str = "AED"
+
+class CartState(BaseModel):
+    count: int = 0
+    total: float = 0
+    currency: str = "USD"
+
+class BotResponse(BaseModel):
+    text: str
+    products: Optional[List[ProductCard]] = []
+    order_details: Optional[OrderDetails] = None
+    quick_replies: Optional[list] = []
+    cart_state: Optional[CartState] = None  # New field for cart UI updates
+    function_call: Optional[str] = None
@@ -1,14 +1,54 @@
 import sqlite3
 import json
-from typing import Dict, Any
+import time
+import hashlib
+import threading
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Tuple
+
+# The only settings the storefront widget reads; everything else stays admin-only
+PUBLIC_WIDGET_KEYS = ("widget_position", "primary_color", "secondary_color", "text_color",
+                      "welcome_message", "auto_open_delay")
+
+
+def _freeze(value):
+    """Read-only view of a decoded JSON value (dicts -> mappingproxy, lists -> tuples)."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class SettingsSnapshot:
+    """Immutable view of all settings at one version."""
+    __slots__ = ("version", "values", "raw")
+
+    def __init__(self, version: int, values: Mapping[str, Any], raw: Mapping[str, str]):
+        self.version = version
+        self.values = values  # key -> frozen value
+        self.raw = raw  # key -> stored JSON text
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.values.get(key, default)
+
 
 class SettingsManager:
     """
     Manages all admin panel settings with SQLite persistence.
+    Reads are served from an in-memory SettingsSnapshot. Every update bumps a
+    version number in the same transaction; other processes notice the new
+    version on their next check (at most every `refresh_interval` seconds)
+    and reload the snapshot.
     """
-    def __init__(self, db_path="config.db"):
+    def __init__(self, db_path="config.db", refresh_interval: float = 1.0):
         self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
         self._initialize_db()
+        self._snapshot = self._load_snapshot()
+        self._next_check = time.monotonic() + refresh_interval
+        self._widget_config = None  # (version, body, etag)
     
     def _initialize_db(self):
         """Create settings table if it doesn't exist."""
@@ -22,6 +62,14 @@ class SettingsManager:
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS settings_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO settings_version (id, version) VALUES (1, 1)")
         
         # Set defaults if first time
         defaults = self.get_default_settings()
@@ -65,57 +113,99 @@ class SettingsManager:
             "after_hours_message": "We're currently offline. Our business hours are 9 AM - 6 PM GST."
         }
     
-    def get_all_settings(self) -> Dict[str, Any]:
-        """Retrieve all settings."""
+    def _load_snapshot(self) -> SettingsSnapshot:
+        """Read all settings and their version in one transaction."""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        
-        cursor.execute("SELECT key, value FROM settings")
-        rows = cursor.fetchall()
+        cursor.execute("BEGIN")
+        version = cursor.execute("SELECT version FROM settings_version WHERE id = 1").fetchone()[0]
+        rows = cursor.execute("SELECT key, value FROM settings").fetchall()
+        conn.rollback()
         conn.close()
-        
-        settings = {}
+
+        values = {}
         for key, value in rows:
+            try:
+                values[key] = _freeze(json.loads(value))
+            except:
+                values[key] = value
+        return SettingsSnapshot(version, MappingProxyType(values), MappingProxyType(dict(rows)))
+
+    def get_version(self) -> int:
+        """Current version stored in the database (one indexed row read)."""
+        conn = sqlite3.connect(self.db_path)
+        version = conn.execute("SELECT version FROM settings_version WHERE id = 1").fetchone()[0]
+        conn.close()
+        return version
+
+    def refresh(self, force: bool = False) -> SettingsSnapshot:
+        """Reload the snapshot if another process (or script) changed the settings."""
+        with self._lock:
+            self._next_check = time.monotonic() + self.refresh_interval
+            if force or self.get_version() != self._snapshot.version:
+                self._snapshot = self._load_snapshot()
+            return self._snapshot
+
+    @property
+    def snapshot(self) -> SettingsSnapshot:
+        """
+        The current immutable settings snapshot. Hot-path reads are a clock
+        check and an attribute load; the database is consulted at most once
+        per refresh_interval.
+        """
+        if time.monotonic() >= self._next_check:
+            return self.refresh()
+        return self._snapshot
+
+    def get_widget_config(self) -> Tuple[bytes, str]:
+        """
+        Public widget config as pre-serialized JSON plus a strong ETag.
+        Built once per settings version.
+        """
+        snapshot = self.snapshot
+        cached = self._widget_config
+        if cached and cached[0] == snapshot.version:
+            return cached[1], cached[2]
+
+        public = {key: json.loads(snapshot.raw[key]) for key in PUBLIC_WIDGET_KEYS if key in snapshot.raw}
+        public["version"] = snapshot.version
+        body = json.dumps(public, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        etag = f'"v{snapshot.version}-{hashlib.sha256(body).hexdigest()[:16]}"'
+        self._widget_config = (snapshot.version, body, etag)
+        return body, etag
+
+    def get_all_settings(self) -> Dict[str, Any]:
+        """Retrieve all settings (a fresh, mutable copy)."""
+        settings = {}
+        for key, value in self.snapshot.raw.items():
             try:
                 settings[key] = json.loads(value)
             except:
                 settings[key] = value
-        
         return settings
     
     def get_setting(self, key: str) -> Any:
-        """Get a specific setting."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            try:
-                return json.loads(row[0])
-            except:
-                return row[0]
-        return None
+        """Get a specific setting (read-only value from the snapshot)."""
+        return self.snapshot.get(key)
     
     def update_setting(self, key: str, value: Any):
         """Update a single setting."""
+        self.update_settings({key: value})
+    
+    def update_settings(self, settings: Dict[str, Any]) -> int:
+        """Bulk update settings in one transaction; returns the new version."""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE settings SET value = ?, updated_at = CURRENT_TIMESTAMP WHERE key = ?",
-            (json.dumps(value), key)
-        )
-        
-        conn.commit()
-        conn.close()
-    
-    def update_settings(self, settings: Dict[str, Any]):
-        """Bulk update settings."""
-        for key, value in settings.items():
-            self.update_setting(key, value)
+        try:
+            cursor.executemany(
+                "UPDATE settings SET value = ?, updated_at = CURRENT_TIMESTAMP WHERE key = ?",
+                [(json.dumps(value), key) for key, value in settings.items()]
+            )
+            cursor.execute("UPDATE settings_version SET version = version + 1 WHERE id = 1")
+            conn.commit()
+        finally:
+            conn.close()
+        return self.refresh(force=True).version
     
     def reset_to_defaults(self):
         """Reset all settings to defaults."""
@@ -0,0 +1,66 @@
+import os
+import hashlib
+from typing import Dict
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from compression import choose_encoding, compress, brotli
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+ETAG_SUFFIXES = {"identity": "", "gzip": "-gz", "br": "-br"}
+
+
+class StaticAsset:
+    """One file loaded into memory with its precompressed variants and fingerprint."""
+    def __init__(self, name: str, path: str, media_type: str):
+        self.name = name
+        self.path = path
+        self.media_type = media_type
+        with open(path, "rb") as f:
+            self.body = f.read()
+        self.fingerprint = hashlib.sha256(self.body).hexdigest()[:12]
+        self.variants = {"identity": self.body, "gzip": compress(self.body, "gzip")}
+        if brotli:
+            self.variants["br"] = brotli.compress(self.body, quality=11)  # built once, so max quality
+        # Strong validators name one exact representation, so each encoding gets its own
+        self.etags = {encoding: f'"{self.fingerprint}{ETAG_SUFFIXES[encoding]}"' for encoding in self.variants}
+
+    @property
+    def fingerprinted_name(self) -> str:
+        stem, ext = os.path.splitext(self.name)
+        return f"{stem}.{self.fingerprint}{ext}"
+
+
+class AssetRegistry:
+    """
+    Widget JS and admin HTML, read and compressed once at startup.
+    Fingerprinted URLs are served with a one-year immutable Cache-Control;
+    the plain URLs revalidate with the ETag.
+    """
+    def __init__(self):
+        self.assets: Dict[str, StaticAsset] = {}
+
+    def load(self, name: str, path: str, media_type: str) -> StaticAsset:
+        asset = StaticAsset(name, path, media_type)
+        self.assets[name] = asset
+        return asset
+
+    def get(self, name: str) -> StaticAsset:
+        return self.assets[name]
+
+    def manifest(self, prefix: str = "") -> Dict[str, str]:
+        """Logical name -> fingerprinted URL path."""
+        return {name: f"{prefix}/{asset.fingerprinted_name}" for name, asset in self.assets.items()}
+
+    @staticmethod
+    def response(request: Request, asset: StaticAsset, cache_control: str) -> Response:
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        headers = {"ETag": asset.etags[encoding], "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if asset.etags[encoding] in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=asset.variants[encoding], media_type=asset.media_type, headers=headers)
@@ -1,13 +1,10 @@
-import sqlite3
-import json
+from settings_manager import SettingsManager
 
 def update_db():
-    conn = sqlite3.connect('config.db')
-    c = conn.cursor()
+    # Goes through SettingsManager so the settings version is bumped and
+    # running servers pick the change up
     new_welcome = "Hello! I am from Roze BioHealth. How can I help you today?"
-    c.execute("UPDATE settings SET value = ? WHERE key = 'welcome_message'", (json.dumps(new_welcome),))
-    conn.commit()
-    conn.close()
+    SettingsManager().update_setting("welcome_message", new_welcome)
     print("Welcome message updated in config.db")
 
 if __name__ == "__main__":
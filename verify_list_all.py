@@ -4,7 +4,7 @@ woo = WooCommerceHandler()
 print("Testing LIST_ALL functionality (fetching latest products)...")
 
 try:
-    products = woo.get_products() # No search term
+    products = woo.get_all_products() # Whole catalog, all pages
     if products:
         print(f"Success! Found {len(products)} products.")
         for p in products[:5]:
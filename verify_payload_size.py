@@ -0,0 +1,75 @@
+"""
+Size budget check for chat responses.
+Builds a worst-case /api/test-chat reply (long answer, 5 product cards, order,
+cart) from full WooCommerce-shaped products and fails if the serialized or
+compressed payload exceeds the budget.
+"""
+import sys
+import json
+import gzip
+
+from fastapi.encoders import jsonable_encoder
+
+from schemas import BotResponse
+from render_cache import build_product_card
+from compression import compress, brotli
+
+BUDGET_RAW_BYTES = 6 * 1024
+BUDGET_GZIP_BYTES = 3 * 1024
+
+
+def full_woo_product(i):
+    """A product shaped like the unprojected REST response."""
+    return {
+        "id": 1000 + i,
+        "name": f"Roze Herbal Toothpaste Family Pack {i}",
+        "price": "49.00",
+        "regular_price": "59.00",
+        "permalink": f"https://yourwebsite.com/product/roze-herbal-toothpaste-{i}/",
+        "stock_status": "instock",
+        "description": "<p>" + "Natural ingredients for daily oral care. " * 60 + "</p>",
+        "short_description": "<p>" + "Fluoride-free formula. " * 10 + "</p>",
+        "images": [{"id": j, "src": f"https://yourwebsite.com/wp-content/uploads/toothpaste-{i}-{j}.jpg",
+                    "name": f"toothpaste-{i}-{j}", "alt": ""} for j in range(6)],
+        "variations": list(range(2000 + i * 20, 2020 + i * 20)),
+        "meta_data": [{"id": j, "key": f"_meta_{j}", "value": "x" * 40} for j in range(25)],
+        "categories": [{"id": 1, "name": "Oral Care", "slug": "oral-care"}],
+    }
+
+
+def main():
+    products = [full_woo_product(i) for i in range(5)]
+    response = BotResponse(
+        text="Here are our most popular oral care products. " * 30,
+        products=[build_product_card(p) for p in products],
+        order_details={"id": 12345, "status": "processing", "total": "245.00", "currency": "AED",
+                       "date_created": "2025-01-01T10:00:00", "line_items": ["Toothpaste x 5"]},
+        quick_replies=["Most Popular", "Bundles", "Bathroom Essentials", "Search More"],
+        cart_state={"items": [], "count": 3, "total": 147.0, "currency": "AED"}
+    )
+
+    raw = json.dumps(jsonable_encoder(response, exclude_none=True), separators=(",", ":")).encode("utf-8")
+    gz = gzip.compress(raw, compresslevel=6)
+    legacy = json.dumps(products).encode("utf-8")
+
+    print(f"Full product JSON (old payload, products only): {len(legacy)} bytes")
+    print(f"Slim response: {len(raw)} bytes raw, {len(gz)} bytes gzip", end="")
+    if brotli:
+        print(f", {len(compress(raw, 'br'))} bytes brotli")
+    else:
+        print(" (brotli not installed)")
+
+    failures = []
+    if len(raw) > BUDGET_RAW_BYTES:
+        failures.append(f"raw {len(raw)} > {BUDGET_RAW_BYTES}")
+    if len(gz) > BUDGET_GZIP_BYTES:
+        failures.append(f"gzip {len(gz)} > {BUDGET_GZIP_BYTES}")
+
+    if failures:
+        print("Payload budget exceeded: " + ", ".join(failures))
+        sys.exit(1)
+    print("Payload within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,12 @@
         botAvatar: 'https://cdn-icons-png.flaticon.com/512/4712/4712035.png' // Professional Icon Placeholder
     };
 
+    // Host page overrides (e.g. the WordPress plugin sets apiEndpoint and may inline settings)
+    const hostConfig = window.RozeChatConfig || {};
+    if (hostConfig.apiEndpoint) {
+        config.apiEndpoint = hostConfig.apiEndpoint.replace(/\/$/, '');
+    }
+
     // State
     let isOpen = false;
     let isRecording = false;
@@ -51,8 +57,13 @@
 
     async function loadConfig() {
         try {
-            const response = await fetch(`${config.apiEndpoint}/admin/settings`);
-            const settings = await response.json();
+            // Inlined settings skip the round trip; otherwise the public config is
+            // served with an ETag, so repeat visits revalidate with a 304
+            let settings = hostConfig.settings;
+            if (!settings) {
+                const response = await fetch(`${config.apiEndpoint}/api/widget-config`);
+                settings = await response.json();
+            }
 
             // Merge settings
             if (settings) {
@@ -0,0 +1,261 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import WOO_REQUEST_SECONDS, WOO_REQUEST_ERRORS
+
+RETRY_STATUSES = (500, 502, 503, 504)
+_REQUEST_SECONDS = WOO_REQUEST_SECONDS.labels()
+_REQUEST_ERRORS = WOO_REQUEST_ERRORS.labels()
+
+
+class CircuitOpenError(Exception):
+    """Raised when the WooCommerce circuit breaker is open and calls are short-circuited."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    closed -> open after `failure_threshold` failures in a row; after
+    `reset_timeout` seconds one trial call is let through (half-open), and its
+    outcome closes or re-opens the circuit.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Give back a half-open trial whose call ended without a recorded outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class WooHTTPClient:
+    """
+    Pooled HTTP client for the WooCommerce REST API.
+    - One keep-alive requests.Session with a bounded connection pool.
+    - Explicit connect/read timeouts.
+    - Retries with backoff on idempotent GETs (connection errors and 5xx).
+    - A circuit breaker: while the store is failing, calls fail fast.
+    - A bounded stale cache of the last good GET responses, served by
+      `get_json` when the store is down or the breaker is open.
+    `get()` mirrors woocommerce.API.get so existing call sites keep working.
+    """
+    def __init__(self, url, consumer_key, consumer_secret, version="wc/v3", connect_timeout=3.05,
+                 read_timeout=10, pool_size=10, retries=2, failure_threshold=5, reset_timeout=30,
+                 stale_entries=500, query_string_auth=False, user_agent="RozeAI-WooClient/1.0"):
+        self.base_url = f"{url.rstrip('/')}/wp-json/{version}/"
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.version = version
+        self.timeout = (connect_timeout, read_timeout)
+        self.is_ssl = url.startswith("https")
+        self.query_string_auth = query_string_auth
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff_factor = 0.3
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False
+        )
+        # OAuth-signed URLs (plain HTTP) carry a single-use nonce, so replaying
+        # them from the adapter would only earn 401s; _send re-signs instead
+        self._adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size,
+                                    max_retries=retry if self.is_ssl else 0)
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self.session.headers.update({"User-Agent": user_agent, "Accept": "application/json"})
+        if self.is_ssl and not query_string_auth:
+            self.session.auth = (consumer_key, consumer_secret)
+
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._stale = OrderedDict()
+        self._stale_entries = stale_entries
+        self._stale_lock = threading.Lock()
+
+        self._latencies = deque(maxlen=1000)
+        self._metrics_lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0, "short_circuited": 0, "stale_served": 0}
+
+    def _signed_request(self, endpoint, params):
+        url = self.base_url + endpoint
+        params = dict(params or {})
+        if self.is_ssl:
+            if self.query_string_auth:
+                params.update({"consumer_key": self.consumer_key, "consumer_secret": self.consumer_secret})
+            return url, params
+        # Plain HTTP stores require OAuth 1.0a signed URLs
+        from woocommerce.oauth import OAuth
+        url = f"{url}?{urlencode(params)}" if params else url
+        oauth = OAuth(url=url, consumer_key=self.consumer_key, consumer_secret=self.consumer_secret,
+                      version=self.version, method="GET")
+        return oauth.get_oauth_url(), {}
+
+    def _send(self, endpoint, params, **kwargs):
+        """One GET. Over plain HTTP, retries happen here with a freshly signed URL each attempt."""
+        attempts = 1 if self.is_ssl else self.retries + 1
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+            url, query = self._signed_request(endpoint, params)
+            try:
+                response = self.session.get(url, params=query, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == attempts - 1:
+                    raise
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                return response
+            response.close()
+
+    def get(self, endpoint, params=None, **kwargs):
+        """GET an API endpoint. Raises CircuitOpenError while the breaker is open."""
+        if not self.breaker.allow():
+            with self._metrics_lock:
+                self.counters["short_circuited"] += 1
+            raise CircuitOpenError("WooCommerce circuit breaker is open")
+
+        recorded = False
+        try:
+            started = time.perf_counter()
+            try:
+                response = self._send(endpoint, params, **kwargs)
+            except requests.RequestException:
+                self._record(started, failed=True)
+                recorded = True
+                raise
+
+            # 5xx (after retries) counts against the breaker; 4xx is the caller's problem
+            self._record(started, failed=response.status_code >= 500)
+            recorded = True
+            return response
+        finally:
+            if not recorded:
+                # Any other exception: don't leave a half-open trial claimed forever
+                self.breaker.release_trial()
+
+    def _record(self, started, failed):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _REQUEST_SECONDS.observe(elapsed_ms / 1000)
+        if failed:
+            _REQUEST_ERRORS.inc()
+        with self._metrics_lock:
+            self.counters["requests"] += 1
+            if failed:
+                self.counters["errors"] += 1
+            self._latencies.append(elapsed_ms)
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    @staticmethod
+    def _stale_key(endpoint, params):
+        return endpoint, tuple(sorted((params or {}).items()))
+
+    def get_json(self, endpoint, params=None):
+        """
+        GET and decode JSON. Returns None on 404. On errors, timeouts or an
+        open breaker, returns the last good response for the same request if
+        one is cached, otherwise re-raises.
+        """
+        key = self._stale_key(endpoint, params)
+        try:
+            response = self.get(endpoint, params=params)
+            if response.status_code == 404:
+                return None
+            if response.status_code != 200:
+                raise RuntimeError(f"{endpoint}: {response.status_code} - {response.text[:200]}")
+            data = response.json()
+        except Exception:
+            with self._stale_lock:
+                if key in self._stale:
+                    with self._metrics_lock:
+                        self.counters["stale_served"] += 1
+                    return self._stale[key]
+            raise
+
+        with self._stale_lock:
+            self._stale[key] = data
+            self._stale.move_to_end(key)
+            while len(self._stale) > self._stale_entries:
+                self._stale.popitem(last=False)
+        return data
+
+    def _pool_stats(self):
+        in_pool = 0
+        opened = 0
+        for pool in list(self._adapter.poolmanager.pools.values()) if self._adapter.poolmanager else []:
+            opened += getattr(pool, "num_connections", 0)
+            if pool.pool is not None:
+                in_pool += pool.pool.qsize()
+        return {"max_size": self.pool_size, "connections_opened": opened, "idle_slots": in_pool}
+
+    def get_metrics(self):
+        """Pool, latency and circuit-breaker metrics."""
+        with self._metrics_lock:
+            counters = dict(self.counters)
+            latencies = sorted(self._latencies)
+
+        def pct(p):
+            if not latencies:
+                return 0
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1)
+
+        return {
+            **counters,
+            "breaker": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.failures,
+                "times_opened": self.breaker.times_opened
+            },
+            "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "samples": len(latencies)},
+            "pool": self._pool_stats(),
+            "stale_entries": len(self._stale)
+        }
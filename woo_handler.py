@@ -1,10 +1,24 @@
 import os
-from woocommerce import API
-import requests
+import re
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from woo_client import WooHTTPClient
+
 load_dotenv()
 
+# Product fields the chat, widget, cart and catalog mirror actually read.
+# Passed as `_fields` so the store skips variations, meta_data, etc.
+PRODUCT_FIELDS = ",".join([
+    "id", "name", "slug", "sku", "status", "type", "permalink",
+    "price", "regular_price", "sale_price", "on_sale", "stock_status",
+    "short_description", "description", "categories", "tags", "images",
+    "date_created", "date_modified"
+])
+
+HTML_TAG_RE = re.compile('<.*?>')
+WHITESPACE_RE = re.compile(r'\s+')
+
 class WooCommerceHandler:
     def __init__(self):
         self.url = os.getenv("WOO_URL")
@@ -12,20 +26,29 @@ class WooCommerceHandler:
         self.consumer_secret = os.getenv("WOO_SECRET")
         
         if self.url and self.consumer_key and self.consumer_secret:
-            self.wcapi = API(
+            # Pooled client with timeouts, GET retries, circuit breaker and stale fallback
+            self.wcapi = WooHTTPClient(
                 url=self.url,
                 consumer_key=self.consumer_key,
                 consumer_secret=self.consumer_secret,
-                version="wc/v3"
+                version="wc/v3",
+                connect_timeout=float(os.getenv("WOO_CONNECT_TIMEOUT", "3.05")),
+                read_timeout=float(os.getenv("WOO_READ_TIMEOUT", "10")),
+                pool_size=int(os.getenv("WOO_POOL_SIZE", "10")),
+                retries=int(os.getenv("WOO_RETRIES", "2")),
+                failure_threshold=int(os.getenv("WOO_BREAKER_THRESHOLD", "5")),
+                reset_timeout=float(os.getenv("WOO_BREAKER_RESET_SECONDS", "30"))
             )
         else:
             self.wcapi = None
             print("Warning: WooCommerce credentials not found. Running in mock mode or limited functionality.")
 
-    def get_products(self, search_term=None):
+    def get_products(self, search_term=None, slim=True, per_page=None):
         """
         Fetch products from WooCommerce.
         If search_term is provided, filters by that term.
+        With `slim`, only PRODUCT_FIELDS are requested (no variations,
+        meta_data, etc.). Returns one page; use get_all_products for the catalog.
         """
         if not self.wcapi:
             return []
@@ -33,42 +56,121 @@ class WooCommerceHandler:
         params = {"status": "publish"}
         if search_term:
             params["search"] = search_term
+        if slim:
+            params["_fields"] = PRODUCT_FIELDS
+        if per_page:
+            params["per_page"] = per_page
 
         try:
-            response = self.wcapi.get("products", params=params)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Error fetching products: {response.status_code} - {response.text}")
-                return []
+            # Served from the stale cache if the store is down or the breaker is open
+            return self.get_json("products", params) or []
         except Exception as e:
             print(f"Exception fetching products: {e}")
             return []
 
+    def get_all_products(self, slim=True):
+        """Fetch the whole published catalog (all pages)."""
+        try:
+            return list(self.iter_products(slim=slim))
+        except Exception as e:
+            print(f"Exception fetching catalog: {e}")
+            return []
+
+    def get_json(self, endpoint, params=None):
+        """JSON GET through the resilient client (see WooHTTPClient.get_json)."""
+        return self.wcapi.get_json(endpoint, params)
+
+    def get_metrics(self):
+        """Pool, latency and breaker metrics for the store connection."""
+        if not self.wcapi:
+            return {"configured": False}
+        return dict(self.wcapi.get_metrics(), configured=True)
+
+    def _get_products_page(self, params, page):
+        """Fetch one page of /products. Returns (products, total_pages or None)."""
+        response = self.wcapi.get("products", params=dict(params, page=page))
+        if response.status_code != 200:
+            raise RuntimeError(f"Error fetching products page {page}: {response.status_code} - {response.text}")
+        total_pages = response.headers.get("X-WP-TotalPages")
+        return response.json(), int(total_pages) if total_pages else None
+
+    def iter_products(self, status="publish", modified_after=None, per_page=100, slim=True, concurrency=4):
+        """
+        Yield every product (the REST API caps per_page at 100).
+        Page 1 reports X-WP-TotalPages; the remaining pages are fetched
+        concurrently and yielded in order.
+        `modified_after` is an ISO-8601 UTC timestamp for incremental syncs.
+        Raises on HTTP errors so callers can tell a failed sync from an empty one.
+        """
+        if not self.wcapi:
+            return
+
+        params = {"status": status, "per_page": per_page}
+        if slim:
+            params["_fields"] = PRODUCT_FIELDS
+        if modified_after:
+            params["modified_after"] = modified_after
+            params["dates_are_gmt"] = "true"
+
+        products, total_pages = self._get_products_page(params, 1)
+        yield from products
+
+        if total_pages is not None:
+            if total_pages > 1:
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    pages = executor.map(lambda page: self._get_products_page(params, page)[0], range(2, total_pages + 1))
+                    for products in pages:
+                        yield from products
+            return
+
+        # No pagination headers (some proxies strip them): walk until a short page
+        page = 1
+        while len(products) == per_page:
+            page += 1
+            products, _ = self._get_products_page(params, page)
+            yield from products
+
     def get_product_by_id(self, product_id):
         if not self.wcapi:
             return None
         
         try:
-            response = self.wcapi.get(f"products/{product_id}")
-            if response.status_code == 200:
-                return response.json()
-            return None
+            return self.get_json(f"products/{product_id}")
         except Exception as e:
             print(f"Error fetching product {product_id}: {e}")
             return None
 
+    def get_products_by_ids(self, product_ids):
+        """
+        Fetch several products in one request (`/products?include=1,2,3`).
+        Up to 100 IDs per call. Only published products are returned, so
+        drafts and private products can't reach the cart.
+        """
+        if not self.wcapi or not product_ids:
+            return []
+
+        params = {
+            "include": ",".join(str(pid) for pid in product_ids),
+            "status": "publish",
+            "per_page": len(product_ids),
+            "_fields": PRODUCT_FIELDS
+        }
+        try:
+            return self.get_json("products", params) or []
+        except Exception as e:
+            print(f"Error fetching products {params['include']}: {e}")
+            return []
+
     def format_product_for_chat(self, product):
         """
         Helper to format a product JSON object into a readable string for the LLM/User.
         Includes detailed info for professional responses.
+        Hot paths should go through ProductRenderCache, which calls this once
+        per product version.
         """
-        import re
-        
         def clean_html(raw_html):
-            cleanr = re.compile('<.*?>')
-            cleantext = re.sub(cleanr, '', raw_html)
-            return cleantext.strip()
+            # Strip tags and collapse the whitespace they leave behind
+            return WHITESPACE_RE.sub(' ', HTML_TAG_RE.sub('', raw_html)).strip()
 
         name = product.get("name", "Unknown Product")
         price = product.get("price", "N/A")
@@ -101,6 +203,21 @@ class WooCommerceHandler:
             f"Link: {permalink}"
         )
 
+    @staticmethod
+    def trim_order(order):
+        """Reduce a full order resource to the status fields the chat uses."""
+        return {
+            "id": order.get("id"),
+            "status": order.get("status"),
+            "total": order.get("total"),
+            "currency": order.get("currency", "AED"),  # Default to AED
+            "date_created": order.get("date_created"),
+            "line_items": [
+                f"{item['name']} x {item['quantity']}" 
+                for item in order.get("line_items", [])
+            ]
+        }
+
     def get_order_by_id(self, order_id):
         """
         Fetch order details by ID.
@@ -109,21 +226,8 @@ class WooCommerceHandler:
             return None
         
         try:
-            response = self.wcapi.get(f"orders/{order_id}")
-            if response.status_code == 200:
-                order = response.json()
-                return {
-                    "id": order.get("id"),
-                    "status": order.get("status"),
-                    "total": order.get("total"),
-                    "currency": order.get("currency", "AED"),  # Default to AED
-                    "date_created": order.get("date_created"),
-                    "line_items": [
-                        f"{item['name']} x {item['quantity']}" 
-                        for item in order.get("line_items", [])
-                    ]
-                }
-            return None
+            order = self.get_json(f"orders/{order_id}")
+            return self.trim_order(order) if order else None
         except Exception as e:
             print(f"Error fetching order {order_id}: {e}")
             return None
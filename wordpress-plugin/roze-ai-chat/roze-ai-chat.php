@@ -44,17 +44,68 @@ class Roze_AI_Chat {
             return;
         }
         
+        $settings = $this->get_widget_settings();
+        
         ?>
         <!-- Roze AI Chat Widget -->
         <script>
             window.RozeChatConfig = {
-                apiEndpoint: '<?php echo esc_js($this->api_endpoint); ?>'
+                apiEndpoint: '<?php echo esc_js($this->api_endpoint); ?>'<?php if ($settings) : ?>,
+                settings: <?php echo wp_json_encode($settings); ?><?php endif; ?>
             };
         </script>
-        <script src="<?php echo esc_url($this->api_endpoint . '/widget/chat-widget.js'); ?>" defer></script>
+        <script src="<?php echo esc_url($this->get_widget_script_url()); ?>" defer></script>
         <?php
     }
     
+    /**
+     * Public widget settings from the backend, cached in a transient so they
+     * can be inlined into the page (the widget then skips its config request).
+     * Returns null if the backend can't be reached; the widget fetches it itself.
+     * Failures are cached for a minute so a backend outage doesn't add a
+     * blocking request to every page render.
+     */
+    private function get_widget_settings() {
+        $cached = get_transient('roze_chat_widget_config');
+        if ($cached !== false) {
+            return is_array($cached) ? $cached : null;
+        }
+        
+        $response = wp_remote_get($this->api_endpoint . '/api/widget-config', array('timeout' => 2));
+        $settings = null;
+        if (!is_wp_error($response) && wp_remote_retrieve_response_code($response) === 200) {
+            $settings = json_decode(wp_remote_retrieve_body($response), true);
+        }
+        if (!is_array($settings)) {
+            set_transient('roze_chat_widget_config', 'unavailable', MINUTE_IN_SECONDS);
+            return null;
+        }
+        
+        set_transient('roze_chat_widget_config', $settings, 5 * MINUTE_IN_SECONDS);
+        return $settings;
+    }
+    
+    /**
+     * Fingerprinted widget URL from the backend manifest (served with immutable
+     * caching, so browsers and CDNs keep it until the widget changes).
+     * Falls back to the plain URL if the manifest can't be fetched.
+     */
+    private function get_widget_script_url() {
+        $path = get_transient('roze_chat_widget_script');
+        if ($path === false) {
+            $path = '/widget/chat-widget.js';
+            $response = wp_remote_get($this->api_endpoint . '/widget/manifest.json', array('timeout' => 2));
+            if (!is_wp_error($response) && wp_remote_retrieve_response_code($response) === 200) {
+                $manifest = json_decode(wp_remote_retrieve_body($response), true);
+                if (is_array($manifest) && !empty($manifest['chat-widget.js'])) {
+                    $path = $manifest['chat-widget.js'];
+                }
+            }
+            set_transient('roze_chat_widget_script', $path, 5 * MINUTE_IN_SECONDS);
+        }
+        return $this->api_endpoint . $path;
+    }
+    
     /**
      * Add admin menu
      */